@@ -0,0 +1,102 @@
+"""Measure ``/stream/ping`` latency while heavy ``/media/`` listings run.
+
+Run from the repository root::
+
+    python benchmarks/bench_event_loop.py --items 20000 --listers 4
+
+The script creates a throwaway SQLite database, fills it with media items, and
+samples ``/stream/ping`` while several clients repeatedly fetch the full
+catalog. Because every handler dispatches database work to ``db.DB_EXECUTOR``,
+ping latency should stay close to its idle value instead of queueing behind
+the listings on the event loop.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--listers", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=200)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Return the ``fraction`` percentile of ``values`` in milliseconds."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def sample_pings(client, headers, samples: int) -> list[float]:
+    """Return ``samples`` sequential ``/stream/ping`` latencies in seconds."""
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        response = await client.get("/stream/ping", headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main() -> None:
+    """Populate the catalog and report idle versus loaded ping latency."""
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="shamash-bench-")
+    os.environ["SHAMASH_DB_PATH"] = str(Path(workdir) / "bench.db")
+
+    import httpx
+
+    from server import db, migrations
+    from server.app import create_app
+    from server.auth import create_token
+
+    migrations.migrate()
+    db.upsert_media_items(
+        [
+            {"title": f"Channel {i}", "path": f"http://iptv.test/{i}.ts"}
+            for i in range(args.items)
+        ]
+    )
+    headers = {"Authorization": f"Bearer {create_token('bench', 'user')}"}
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        idle = await sample_pings(client, headers, args.samples)
+
+        stop = asyncio.Event()
+
+        async def lister() -> None:
+            while not stop.is_set():
+                (await client.get("/media/", headers=headers)).raise_for_status()
+
+        listers = [asyncio.create_task(lister()) for _ in range(args.listers)]
+        await asyncio.sleep(0.1)
+        loaded = await sample_pings(client, headers, args.samples)
+        stop.set()
+        await asyncio.gather(*listers)
+
+    for label, values in (("idle", idle), ("loaded", loaded)):
+        print(
+            f"{label:>6}: p50={percentile(values, 0.5):7.2f} ms  "
+            f"p99={percentile(values, 0.99):7.2f} ms  "
+            f"mean={statistics.mean(values) * 1000:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Compare ORM helpers with the Core row helpers used on hot read paths.
+
+Run from the repository root::
+
+    python benchmarks/bench_read_paths.py --items 20000 --lookups 5000
+
+The script creates a throwaway SQLite database and times the lookups behind
+``/stream/{id}`` (media item by id) and ``/auth/login`` (user by name) in two
+ways:
+
+* ``orm``: ``db.get_media_item``/``db.get_user``, a new session and a hydrated
+  ORM instance per call.
+* ``rows``: ``db.get_media_row``/``db.get_user_row`` on one shared session, as
+  the request-scoped dependency does, returning named tuples.
+
+For each variant it reports microseconds per lookup and, via ``tracemalloc``,
+the peak memory allocated while a lookup runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    return parser.parse_args()
+
+
+def measure(lookup, keys: list) -> tuple[float, float]:
+    """Return microseconds and peak transient KiB per call of ``lookup``."""
+    for key in keys[:100]:
+        lookup(key)
+    started = time.perf_counter()
+    for key in keys:
+        lookup(key)
+    elapsed = time.perf_counter() - started
+
+    sample = keys[:500]
+    peaks = 0
+    tracemalloc.start()
+    for key in sample:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        lookup(key)
+        peaks += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return elapsed / len(keys) * 1e6, peaks / len(sample) / 1024
+
+
+def main() -> None:
+    """Populate the database and print per-lookup cost of both variants."""
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="shamash-bench-")
+    os.environ["SHAMASH_DB_PATH"] = str(Path(workdir) / "bench.db")
+
+    import bcrypt
+
+    from server import db, migrations
+
+    migrations.migrate()
+    db.insert_media_items(
+        [
+            {"title": f"Channel {i}", "path": f"http://iptv.test/{i}.ts"}
+            for i in range(args.items)
+        ]
+    )
+    password_hash = bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()
+    with db.engine.begin() as conn:
+        conn.execute(
+            db.User.__table__.insert(),
+            [
+                {"username": f"user{i}", "password_hash": password_hash}
+                for i in range(1000)
+            ],
+        )
+
+    rng = random.Random(42)
+    item_ids = [rng.randint(1, args.items) for _ in range(args.lookups)]
+    usernames = [f"user{rng.randrange(1000)}" for _ in range(args.lookups)]
+
+    session = db.get_session()
+    variants = {
+        "media orm": (db.get_media_item, item_ids),
+        "media rows": (lambda key: db.get_media_row(key, session), item_ids),
+        "user orm": (db.get_user, usernames),
+        "user rows": (lambda key: db.get_user_row(key, session), usernames),
+    }
+    for label, (lookup, keys) in variants.items():
+        micros, kib = measure(lookup, keys)
+        print(f"{label:>10}: {micros:8.1f} us/lookup  {kib:7.1f} KiB peak/lookup")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
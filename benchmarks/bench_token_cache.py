@@ -0,0 +1,74 @@
+"""Measure what the verified-token cache saves per authenticated request.
+
+Run from the repository root::
+
+    python benchmarks/bench_token_cache.py --requests 2000
+
+The script reports, with the cache disabled and enabled:
+
+* ``verify``: microseconds per ``auth.verify_token`` call for one token, as
+  when a player fetches segment after segment with the same bearer token.
+* ``ping``: microseconds per ``GET /stream/ping`` served in-process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    return parser.parse_args()
+
+
+async def time_pings(client, headers, requests: int) -> float:
+    """Return microseconds per sequential ``/stream/ping`` request."""
+    started = time.perf_counter()
+    for _ in range(requests):
+        (await client.get("/stream/ping", headers=headers)).raise_for_status()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main() -> None:
+    """Time token verification and pings without and with the cache."""
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="shamash-bench-")
+    os.environ["SHAMASH_DB_PATH"] = str(Path(workdir) / "bench.db")
+
+    import httpx
+
+    from server import auth, cache, migrations
+    from server.app import create_app
+
+    migrations.migrate()
+    token = auth.create_token("bench", "user")
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=create_app())
+    capacity = cache.verified_tokens.max_entries
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for label, max_entries in (("uncached", 0), ("cached", capacity)):
+            cache.verified_tokens.clear()
+            cache.verified_tokens.max_entries = max_entries
+            auth.verify_token(token)
+            started = time.perf_counter()
+            for _ in range(args.requests * 10):
+                auth.verify_token(token)
+            verify = (time.perf_counter() - started) / (args.requests * 10) * 1e6
+            ping = await time_pings(client, headers, args.requests)
+            print(f"{label:>8}: verify={verify:7.2f} us  ping={ping:8.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,13 @@
 """CLI entry point for the Shamash media client."""
 
 import argparse
+import base64
 import json
 import logging
+import os
 import shutil
 import subprocess
+import time
 import urllib.request
 from pathlib import Path
 
@@ -14,6 +17,8 @@ import yaml
 
 
 CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "client.yaml"
+# Refresh saved access tokens this many seconds before they expire.
+REFRESH_MARGIN_SECONDS = 60
 
 
 logging.basicConfig(level=logging.INFO)
@@ -39,7 +44,7 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--token",
-        help="JWT token for authenticated endpoints",
+        help="JWT token for authenticated endpoints (default: the saved token)",
     )
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -54,7 +59,8 @@ def parse_args() -> argparse.Namespace:
     login_parser.add_argument(
         "--save-token",
         action="store_true",
-        help="Persist token to $HOME/.shamash_token",
+        help="Persist tokens to $HOME/.shamash_token and "
+        "$HOME/.shamash_refresh_token",
     )
     play_parser = subparsers.add_parser("play", help="Stream a media item")
     play_parser.add_argument("item_id", type=int, help="ID of media item")
@@ -96,8 +102,100 @@ def sync_metadata(url: str) -> None:
         print(f"Failed to sync metadata: {exc.reason}")
 
 
-def list_media(url: str, token: str | None) -> None:
-    """Fetch and display media items from the server."""
+def token_path() -> Path:
+    """Return the file holding the saved access token."""
+    return Path.home() / ".shamash_token"
+
+
+def refresh_token_path() -> Path:
+    """Return the file holding the saved refresh token."""
+    return Path.home() / ".shamash_refresh_token"
+
+
+def save_tokens(token: str, refresh_token: str | None) -> None:
+    """Persist the access token and, when issued, the refresh token."""
+    for path, value in ((token_path(), token), (refresh_token_path(), refresh_token)):
+        if not value:
+            continue
+        try:
+            # Create the file owner-only so the token is never readable under
+            # the umask, and tighten files left by older versions before
+            # writing.
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                path.chmod(0o600)
+                handle.write(value)
+        except OSError as exc:
+            logger.error("Token save failed", exc_info=exc)
+            print(f"Could not save token to {path}: {exc}")
+
+
+def _read_saved(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def token_expires_soon(token: str, margin: int = REFRESH_MARGIN_SECONDS) -> bool:
+    """Return whether ``token`` expires within ``margin`` seconds.
+
+    The payload is only decoded, not verified; the server does that.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+        return float(claims["exp"]) - time.time() < margin
+    except (IndexError, KeyError, TypeError, ValueError):
+        return False
+
+
+def refresh_access_token(url: str) -> str | None:
+    """Renew the saved tokens through ``/auth/refresh`` and return the new one.
+
+    Returns ``None`` when no refresh token is saved or the server rejects it,
+    in which case ``login`` must be run again.
+    """
+    refresh_token = _read_saved(refresh_token_path())
+    if refresh_token is None:
+        return None
+    req = urllib.request.Request(
+        f"{url.rstrip('/')}/auth/refresh",
+        data=json.dumps({"refresh_token": refresh_token}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req) as response:
+            data = json.load(response)
+    except HTTPError as exc:
+        logger.error("Token refresh HTTP error", exc_info=exc)
+        print(f"Failed to refresh token: HTTP {exc.code}; please login again")
+        return None
+    except (URLError, json.JSONDecodeError) as exc:
+        logger.error("Token refresh failed", exc_info=exc)
+        return None
+    token = data.get("access_token")
+    if token:
+        save_tokens(token, data.get("refresh_token"))
+    return token
+
+
+def current_token(url: str) -> str | None:
+    """Return the saved access token, refreshing it first if it is expiring."""
+    token = _read_saved(token_path())
+    if token is not None and token_expires_soon(token):
+        token = refresh_access_token(url) or token
+    return token
+
+
+def list_media(url: str, token: str | None, retry: bool = True) -> None:
+    """Fetch and display media items from the server.
+
+    On ``401`` the saved tokens are refreshed once and the request retried.
+    """
     endpoint = f"{url.rstrip('/')}/media/"
     headers: dict[str, str] = {}
     if token:
@@ -109,6 +207,11 @@ def list_media(url: str, token: str | None) -> None:
         for item in items:
             print(f"{item['id']}: {item['title']}")
     except HTTPError as exc:
+        if exc.code == 401 and retry:
+            refreshed = refresh_access_token(url)
+            if refreshed:
+                list_media(url, refreshed, retry=False)
+                return
         logger.error("List media HTTP error", exc_info=exc)
         print(f"Failed to list media: HTTP {exc.code}")
     except URLError as exc:
@@ -137,12 +240,7 @@ def login_user(url: str, username: str, password: str, save_token: bool) -> None
             raise ValueError("No token returned")
         print(token)
         if save_token:
-            token_path = Path.home() / ".shamash_token"
-            try:
-                token_path.write_text(token, encoding="utf-8")
-            except OSError as exc:
-                logger.error("Token save failed", exc_info=exc)
-                print(f"Could not save token to {token_path}: {exc}")
+            save_tokens(token, data.get("refresh_token"))
     except HTTPError as exc:
         logger.error("Login HTTP error", exc_info=exc)
         print(f"Failed to login: HTTP {exc.code}")
@@ -157,15 +255,37 @@ def login_user(url: str, username: str, password: str, save_token: bool) -> None
         print(f"Failed to login: {exc}")
 
 
+def signed_stream_url(url: str, item_id: int, token: str) -> str | None:
+    """Return a signed, expiring URL for ``item_id`` or ``None`` on failure."""
+    req = urllib.request.Request(
+        f"{url.rstrip('/')}/stream/{item_id}/url",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    try:
+        with urllib.request.urlopen(req) as response:
+            return json.load(response).get("url")
+    except (HTTPError, URLError, json.JSONDecodeError) as exc:
+        logger.error("Signed stream URL request failed", exc_info=exc)
+        return None
+
+
 def play_media(url: str, item_id: int, token: str | None, player: str) -> None:
-    """Stream a media item using an external player."""
+    """Stream a media item using an external player.
+
+    With a token the player is given a signed URL, so players that cannot
+    send headers (VLC) work too. If signing fails, ffplay falls back to
+    sending the bearer token as a header.
+    """
     endpoint = f"{url.rstrip('/')}/stream/{item_id}"
     player_path = shutil.which(player)
     if player_path is None:
         print(f"Player '{player}' not found")
         return
     cmd = [player_path]
-    if player == "ffplay" and token:
+    signed = signed_stream_url(url, item_id, token) if token else None
+    if signed:
+        endpoint = signed
+    elif player == "ffplay" and token:
         cmd.extend(["-headers", f"Authorization: Bearer {token}\r\n"])
     cmd.append(endpoint)
     try:
@@ -183,9 +303,14 @@ if __name__ == "__main__":
     elif args.command == "sync":
         sync_metadata(args.server_url)
     elif args.command == "list":
-        list_media(args.server_url, args.token)
+        list_media(args.server_url, args.token or current_token(args.server_url))
     elif args.command == "play":
-        play_media(args.server_url, args.item_id, args.token, args.player)
+        play_media(
+            args.server_url,
+            args.item_id,
+            args.token or current_token(args.server_url),
+            args.player,
+        )
     elif args.command == "login":
         login_user(
             args.server_url,
@@ -1,21 +1,62 @@
 """FastAPI application for the Shamash media server."""
 
 import asyncio
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from urllib.parse import urlparse
 
+import anyio
 import httpx
-from fastapi import APIRouter, Depends, FastAPI, HTTPException
-from fastapi.responses import FileResponse, RedirectResponse
-from pydantic import BaseModel, field_validator
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import RedirectResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator
 from sqlalchemy import text
-
-from . import db
-from .auth import TokenClaims, auth_router, require_role, token_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import cache, db, epg, migrations, passwords, probe, stream_urls
+from .auth import (
+    TokenClaims,
+    auth_router,
+    hashing_busy_error,
+    require_role,
+    stream_access,
+    token_required,
+)
 from .config import resolve_jwt_secret, warn_if_default_jwt_secret
-from .integrations.radarr import RADARR_API_KEY, RADARR_URL, async_refresh_movies
-from .integrations.sonarr import SONARR_API_KEY, SONARR_URL, async_refresh_series
+from .integrations import clients as integration_clients
+from .integrations.base import sync_all
+from .integrations.radarr import RADARR_API_KEY, RADARR_URL
+from .integrations.sonarr import SONARR_API_KEY, SONARR_URL
+from .playlists import ingest_configured_playlists
+from .relay import RelayUnavailable, is_playlist, relay_enabled, relay_hub
+from .revocation import REVOCATIONS, start_refresher, stop_refresher
+from .streaming import RangeFileResponse, stat_regular_file
+
 
+LOGGER = logging.getLogger(__name__)
+
+BATCH_CHUNK_SIZE = 1000
+MEDIA_PAGE_SIZE = 1000
+MEDIA_MAX_LIMIT = 5000
+# Smaller listing bodies are not worth a gzip copy.
+MEDIA_GZIP_MIN_BYTES = 1024
+
+_search_rebuild: asyncio.Task | None = None
 
 # Placeholder routers for future modules
 media_ingestion_router = APIRouter(
@@ -31,9 +72,15 @@ metadata_sync_router = APIRouter(
 user_management_router = APIRouter(prefix="/users", tags=["users"])
 streaming_router = APIRouter(prefix="/stream", tags=["stream"])
 media_router = APIRouter(prefix="/media", tags=["media"])
+epg_router = APIRouter(prefix="/epg", tags=["epg"])
+channel_health_router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+    dependencies=[Depends(require_role("admin"))],
+)
 
 
-async def _check_service(base_url: str, api_key: str | None) -> str:
+async def _check_service(name: str, base_url: str, api_key: str | None) -> str:
     """Probe an external service and return its health status string.
 
     A service is considered ``"ok"`` when the authenticated status endpoint
@@ -46,8 +93,12 @@ async def _check_service(base_url: str, api_key: str | None) -> str:
     status_url = f"{base_url.rstrip('/')}/api/v3/system/status"
     headers = {"X-Api-Key": api_key} if api_key else {}
     try:
-        async with httpx.AsyncClient(timeout=2) as client:
-            response = await client.get(status_url, headers=headers)
+        async with integration_clients.client_for(name) as client:
+            response = await client.get(
+                status_url,
+                headers=headers,
+                timeout=integration_clients.PING_TIMEOUT,
+            )
     except httpx.RequestError:
         return "unreachable"
 
@@ -72,7 +123,7 @@ def _check_database() -> str:
 @media_ingestion_router.get("/ping")
 async def ingestion_ping() -> dict[str, str]:
     """Check database connectivity for media ingestion."""
-    return {"status": _check_database()}
+    return {"status": await db.run(_check_database)}
 
 
 class IngestionRequest(BaseModel):
@@ -123,7 +174,14 @@ class IngestionRequest(BaseModel):
 @media_ingestion_router.post("/")
 async def ingest_media(item: IngestionRequest) -> dict[str, int | str | None]:
     """Create a new media item entry."""
-    created = db.create_media_item(item.title, item.path, item.description)
+    try:
+        created = await db.run(
+            db.create_media_item, item.title, item.path, item.description
+        )
+    except IntegrityError as exc:
+        raise HTTPException(
+            status_code=409, detail="A media item with this path already exists"
+        ) from exc
     return {
         "id": created.id,
         "title": created.title,
@@ -131,51 +189,472 @@ async def ingest_media(item: IngestionRequest) -> dict[str, int | str | None]:
     }
 
 
+def _validate_batch(
+    payloads: list[tuple[int, object]],
+) -> tuple[list[int], list[dict], list[dict]]:
+    """Validate raw batch items and split them into rows and per-item errors.
+
+    Returns the indexes and column dictionaries of the valid items, plus an
+    error entry for every item that failed validation. Runs on a worker thread
+    because local path validation touches the filesystem.
+    """
+
+    indexes: list[int] = []
+    rows: list[dict] = []
+    errors: list[dict] = []
+    for index, payload in payloads:
+        if isinstance(payload, Exception):
+            errors.append({"index": index, "error": str(payload)})
+            continue
+        try:
+            item = IngestionRequest.model_validate(payload)
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc']) or 'item'}: "
+                f"{err['msg']}"
+                for err in exc.errors()
+            )
+            errors.append({"index": index, "error": detail})
+            continue
+        indexes.append(index)
+        rows.append(item.model_dump())
+    return indexes, rows, errors
+
+
+async def _iter_batch_payloads(request: Request):
+    """Yield ``(index, item)`` pairs from a JSON array or NDJSON request body.
+
+    NDJSON bodies are parsed line by line as they arrive; a line that is not
+    valid JSON is yielded as the decoding exception so it can be reported
+    against its index without aborting the batch.
+    """
+
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    yield index, json.loads(line)
+                except ValueError as exc:
+                    yield index, exc
+                index += 1
+        if buffer.strip():
+            try:
+                yield index, json.loads(buffer)
+            except ValueError as exc:
+                yield index, exc
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid JSON: {exc}") from exc
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array of items")
+    for index, item in enumerate(items):
+        yield index, item
+
+
+async def _insert_batch_chunk(indexes: list[int], rows: list[dict]) -> list[dict]:
+    """Insert one validated chunk and return its per-item results."""
+
+    try:
+        ids = await db.run(db.insert_media_items, rows)
+    except Exception as exc:
+        return [{"index": index, "error": str(exc)} for index in indexes]
+    return [
+        (
+            {"index": index, "id": item_id}
+            if item_id is not None
+            else {"index": index, "error": "path already exists"}
+        )
+        for index, item_id in zip(indexes, ids)
+    ]
+
+
+@media_ingestion_router.post("/batch")
+async def ingest_media_batch(request: Request) -> dict:
+    """Create many media items from a JSON array or an NDJSON stream.
+
+    Items are validated in chunks of ``BATCH_CHUNK_SIZE`` on a worker thread
+    while the previous chunk is inserted, and every chunk is written with one
+    executemany statement in its own transaction. The response lists the new
+    id or the validation error of every item by its position in the input.
+    """
+
+    results: list[dict] = []
+    pending: asyncio.Task | None = None
+
+    async def flush(chunk: list[tuple[int, object]]) -> None:
+        nonlocal pending
+        indexes, rows, errors = await anyio.to_thread.run_sync(_validate_batch, chunk)
+        results.extend(errors)
+        if pending is not None:
+            results.extend(await pending)
+        pending = asyncio.create_task(_insert_batch_chunk(indexes, rows))
+
+    chunk: list[tuple[int, object]] = []
+    try:
+        async for entry in _iter_batch_payloads(request):
+            chunk.append(entry)
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        await flush(chunk)
+        results.extend(await pending)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+    results.sort(key=lambda result: result["index"])
+    created = sum(1 for result in results if "id" in result)
+    return {"created": created, "failed": len(results) - created, "items": results}
+
+
+@media_ingestion_router.post("/playlists")
+async def ingest_playlists(force: bool = False) -> dict[str, dict[str, int | str]]:
+    """Refresh every playlist listed under ``server.playlists``.
+
+    Unchanged playlists are skipped via conditional requests unless ``force``
+    is set.
+    """
+    return await ingest_configured_playlists(force=force)
+
+
 @metadata_sync_router.get("/ping")
 async def metadata_ping() -> dict[str, str]:
     """Check connectivity and authentication with Sonarr, Radarr, and the database."""
 
     sonarr_status, radarr_status = await asyncio.gather(
-        _check_service(SONARR_URL, SONARR_API_KEY),
-        _check_service(RADARR_URL, RADARR_API_KEY),
+        _check_service("sonarr", SONARR_URL, SONARR_API_KEY),
+        _check_service("radarr", RADARR_URL, RADARR_API_KEY),
     )
     return {
         "sonarr": sonarr_status,
         "radarr": radarr_status,
-        "database": _check_database(),
+        "database": await db.run(_check_database),
     }
 
 
 @metadata_sync_router.post("/sync")
-async def metadata_sync() -> dict[str, str]:
-    """Synchronize metadata with Sonarr and Radarr."""
-    try:
-        await async_refresh_series()
-    except httpx.RequestError as exc:
-        return {"status": "sonarr_error", "detail": str(exc)}
-    try:
-        await async_refresh_movies()
-    except httpx.RequestError as exc:
-        return {"status": "radarr_error", "detail": str(exc)}
-    except Exception as exc:  # pragma: no cover - catch unexpected errors
-        return {"status": f"failed: {exc}"}
-    return {"status": "synchronized"}
+async def metadata_sync() -> dict:
+    """Refresh Sonarr, Radarr and any other registered integration concurrently.
+
+    Each service runs under its own timeout and is reported separately, so
+    one failure does not hide the others' results.
+    """
+    return await sync_all()
+
+
+def _media_fields(fields: str | None) -> tuple[str, ...]:
+    """Parse ``?fields=`` into a column tuple that always starts with ``id``."""
+
+    if not fields:
+        return ("id", "title", "description")
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(db.MEDIA_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(unknown)}; "
+            f"choose from {', '.join(db.MEDIA_FIELDS)}",
+        )
+    return ("id", *dict.fromkeys(name for name in requested if name != "id"))
+
+
+def _media_etag(version: str, *variant) -> str:
+    """Return a strong ETag for one listing variant at catalog ``version``."""
+
+    key = json.dumps([version, *variant])
+    return '"%s"' % hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def _gzip_etag(etag: str) -> str:
+    """Return the ETag of the gzip-encoded representation of ``etag``."""
+
+    return etag[:-1] + '-gz"'
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    """Return whether an ``If-None-Match`` header names ``etag`` or ``*``."""
+
+    if not header:
+        return False
+    bare = etag.strip('"')
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/").strip('"')
+        if candidate in ("*", bare):
+            return True
+    return False
+
+
+def _accepts_gzip(request: Request) -> bool:
+    """Return whether the client accepts gzip-encoded responses."""
+
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _compress_media_body(body: bytes) -> bytes | None:
+    """Return the gzip copy kept next to a cached body, if one is worth it."""
+
+    if not cache.MEDIA_BODY_GZIP or len(body) < MEDIA_GZIP_MIN_BYTES:
+        return None
+    return gzip.compress(body, compresslevel=6)
+
+
+def _keep_media_body(etag: str, version: str, body: bytes) -> None:
+    """Cache a streamed ``body`` under ``etag`` if its version is current."""
+
+    if len(body) > cache.MEDIA_BODY_MAX_BYTES or cache.catalog_version() != version:
+        return
+    cache.media_bodies.set(etag, (body, _compress_media_body(body), {}))
+
+
+def _media_body_response(
+    body: bytes,
+    compressed: bytes | None,
+    etag: str,
+    use_gzip: bool,
+    media_type: str,
+    headers: dict[str, str],
+) -> Response:
+    """Return cached listing bytes, gzip-encoded when the client allows."""
+
+    headers = {**headers, "ETag": etag, "Vary": "Accept-Encoding"}
+    if use_gzip and compressed is not None:
+        headers["ETag"] = _gzip_etag(etag)
+        headers["Content-Encoding"] = "gzip"
+        body = compressed
+    return Response(body, media_type=media_type, headers=headers)
+
+
+async def _stream_media(
+    fields: tuple[str, ...],
+    after: int,
+    hide_dead: bool,
+    ndjson: bool,
+    etag: str | None = None,
+    version: str | None = None,
+):
+    """Yield the catalog from ``after`` onwards one encoded page at a time.
+
+    With ``etag`` the streamed bytes are collected, up to
+    :data:`cache.MEDIA_BODY_MAX_BYTES`, and cached once the stream completes
+    so later requests for the same catalog version skip the database.
+    """
+
+    collected: list[bytes] | None = [] if etag else None
+    size = 0
+
+    def emit(chunk: bytes) -> bytes:
+        nonlocal collected, size
+        if collected is not None:
+            size += len(chunk)
+            if size > cache.MEDIA_BODY_MAX_BYTES:
+                collected = None
+            else:
+                collected.append(chunk)
+        return chunk
+
+    separator = b"" if ndjson else b"["
+    while True:
+        page = await db.run(
+            db.list_media_page, fields, after, MEDIA_PAGE_SIZE, hide_dead
+        )
+        if not page:
+            break
+        encoded = [json.dumps(dict(zip(fields, row))) for row in page]
+        if ndjson:
+            yield emit(("\n".join(encoded) + "\n").encode())
+        else:
+            yield emit(separator + ",".join(encoded).encode())
+            separator = b","
+        after = page[-1][0]
+        if len(page) < MEDIA_PAGE_SIZE:
+            break
+    if not ndjson:
+        yield emit(b"]" if separator == b"," else b"[]")
+    if collected is not None:
+        await anyio.to_thread.run_sync(
+            _keep_media_body, etag, version, b"".join(collected)
+        )
 
 
 @media_router.get("/")
-async def list_media(_: TokenClaims = Depends(token_required)) -> list[dict]:
-    """Return all available media items."""
-    items = db.list_media_items()
-    return [
-        {"id": item.id, "title": item.title, "description": item.description}
-        for item in items
-    ]
+async def list_media(
+    request: Request,
+    hide_dead: bool = False,
+    after: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=MEDIA_MAX_LIMIT),
+    fields: str | None = None,
+    output: str | None = Query(None, alias="format", pattern="^(json|ndjson)$"),
+    session: Session = Depends(db.request_session),
+    _: TokenClaims = Depends(token_required),
+) -> Response:
+    """Return media items ordered by id.
+
+    ``after`` is a keyset cursor: pass the last id already received to get the
+    items that follow it. With ``limit`` a single page is returned and, when
+    more items exist, a ``Link: <...>; rel="next"`` header points at the next
+    page. Without it the rest of the catalog is streamed page by page, so
+    memory stays flat regardless of its size. ``fields`` selects a comma
+    separated subset of :data:`db.MEDIA_FIELDS` (``id`` is always included).
+    NDJSON is produced for ``format=ndjson`` or ``Accept: application/x-ndjson``.
+    With ``hide_dead`` set, items whose latest health probe failed are omitted.
+
+    Responses carry a strong ``ETag`` derived from the catalog version, which
+    changes on every media or health write. ``If-None-Match`` with a current
+    tag is answered with ``304``. Encoded bodies are cached per version, along
+    with a gzip copy served to clients that send ``Accept-Encoding: gzip``.
+    """
+    columns = _media_fields(fields)
+    ndjson = output == "ndjson" or (
+        output is None and "application/x-ndjson" in request.headers.get("accept", "")
+    )
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    version = await db.run(cache.catalog_version)
+    etag = _media_etag(version, columns, after, limit, hide_dead, ndjson)
+    if_none_match = request.headers.get("if-none-match")
+    for tag in (etag, _gzip_etag(etag)):
+        if _etag_matches(if_none_match, tag):
+            return Response(
+                status_code=304, headers={"ETag": tag, "Vary": "Accept-Encoding"}
+            )
+
+    use_gzip = _accepts_gzip(request)
+    cached = cache.media_bodies.get(etag)
+    if cached is not None:
+        body, compressed, headers = cached
+        return _media_body_response(
+            body, compressed, etag, use_gzip, media_type, headers
+        )
+    if limit is None:
+        return StreamingResponse(
+            _stream_media(columns, after, hide_dead, ndjson, etag, version),
+            media_type=media_type,
+            headers={"ETag": etag, "Vary": "Accept-Encoding"},
+        )
+
+    page = await db.run(
+        db.list_media_page, columns, after, limit + 1, hide_dead, session
+    )
+    headers = {}
+    if len(page) > limit:
+        page = page[:limit]
+        next_url = request.url.include_query_params(after=page[-1][0])
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    encoded = [json.dumps(dict(zip(columns, row))) for row in page]
+    if ndjson:
+        body = "".join(line + "\n" for line in encoded)
+    else:
+        body = "[" + ",".join(encoded) + "]"
+    body = body.encode()
+    compressed = await anyio.to_thread.run_sync(_compress_media_body, body)
+    if len(body) <= cache.MEDIA_BODY_MAX_BYTES:
+        cache.media_bodies.set(etag, (body, compressed, headers))
+    return _media_body_response(body, compressed, etag, use_gzip, media_type, headers)
+
+
+@media_router.get("/search")
+async def search_media(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=500),
+    _: TokenClaims = Depends(token_required),
+) -> list[dict]:
+    """Return media whose title or description matches every word of ``q``.
+
+    Words match as prefixes and results are ranked by bm25, with title hits
+    weighted above description hits.
+    """
+    try:
+        return await db.run(db.search_media_items, q, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+@media_router.post(
+    "/search/rebuild",
+    status_code=202,
+    dependencies=[Depends(require_role("admin"))],
+)
+async def rebuild_media_search() -> dict[str, str]:
+    """Rebuild the full-text search index in the background."""
+    global _search_rebuild
+    if _search_rebuild is not None and not _search_rebuild.done():
+        return {"status": "running"}
+    _search_rebuild = asyncio.create_task(db.run(db.rebuild_media_search))
+    return {"status": "started"}
+
+
+@channel_health_router.post("/sweep", status_code=202)
+async def start_channel_sweep() -> dict[str, str]:
+    """Start probing every remote media item in the background."""
+    started = probe.start_sweep()
+    return {"status": "started" if started else "running"}
+
+
+@channel_health_router.get("/metrics")
+async def runtime_metrics() -> dict:
+    """Return cache, password pool, revocation and integration metrics."""
+    return {
+        "cache": cache.cache_stats(),
+        "passwords": passwords.hashing_stats(),
+        "revocation": REVOCATIONS.stats(),
+        "integrations": integration_clients.client_stats(),
+    }
+
+
+@channel_health_router.get("/channels")
+async def channel_health(status: str | None = None) -> dict:
+    """Return the latest probe result per item plus the last sweep summary."""
+    return {
+        "sweep": probe.last_sweep,
+        "channels": await db.run(db.list_channel_health, status),
+    }
+
+
+@epg_router.post("/refresh")
+async def refresh_epg(
+    force: bool = False, _: str = Depends(require_role("admin"))
+) -> dict[str, dict[str, int | str]]:
+    """Ingest every XMLTV guide listed under ``server.epg``."""
+    return await anyio.to_thread.run_sync(
+        lambda: epg.refresh_configured_guides(force=force)
+    )
+
+
+@epg_router.get("/now")
+async def epg_now(_: TokenClaims = Depends(token_required)) -> list[dict]:
+    """Return the programme currently airing on every channel."""
+    return await db.run(epg.programmes_now)
+
+
+@epg_router.get("/{channel}")
+async def epg_channel(
+    channel: str,
+    start: datetime.datetime | None = Query(None, alias="from"),
+    stop: datetime.datetime | None = Query(None, alias="to"),
+    _: TokenClaims = Depends(token_required),
+) -> list[dict]:
+    """Return programmes for an XMLTV channel id (``MediaItem.tvg_id``).
+
+    The window defaults to the next 24 hours.
+    """
+    try:
+        return await db.run(epg.channel_programmes, channel, start, stop)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
 
 
 @user_management_router.get("/ping")
 async def users_ping() -> dict[str, str]:
     """Check database connectivity for user management."""
-    return {"status": _check_database()}
+    return {"status": await db.run(_check_database)}
 
 
 class UserCreateRequest(BaseModel):
@@ -197,7 +676,11 @@ async def create_user(
     request: UserCreateRequest, _: str = Depends(require_role("admin"))
 ) -> dict[str, str | int]:
     """Create a new user account."""
-    user = db.add_user(request.username, request.password, request.role)
+    try:
+        password_hash = await passwords.hash_password(request.password)
+    except passwords.HashingPoolBusy as exc:
+        raise hashing_busy_error(exc) from exc
+    user = await db.run(db.insert_user, request.username, password_hash, request.role)
     return {"id": user.id, "username": user.username, "role": user.role}
 
 
@@ -206,7 +689,7 @@ async def get_user(
     username: str, _: str = Depends(require_role("admin"))
 ) -> dict[str, str | int]:
     """Retrieve information about a user."""
-    user = db.get_user(username)
+    user = await db.run(db.get_user, username)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return {"id": user.id, "username": user.username, "role": user.role}
@@ -219,7 +702,11 @@ async def update_user(
     _: str = Depends(require_role("admin")),
 ) -> dict[str, str]:
     """Update a user's password."""
-    success = db.update_user_password(username, request.password)
+    try:
+        password_hash = await passwords.hash_password(request.password)
+    except passwords.HashingPoolBusy as exc:
+        raise hashing_busy_error(exc) from exc
+    success = await db.run(db.set_user_password_hash, username, password_hash)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"status": "updated"}
@@ -230,43 +717,146 @@ async def delete_user(
     username: str, _: str = Depends(require_role("admin"))
 ) -> dict[str, str]:
     """Remove a user account."""
-    success = db.delete_user(username)
+    success = await db.run(db.delete_user, username)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    # Deletion also revoked the user's tokens; apply it here without waiting.
+    await db.run(REVOCATIONS.refresh)
     return {"status": "deleted"}
 
 
 @streaming_router.get("/ping")
 async def stream_ping(_: TokenClaims = Depends(token_required)) -> dict[str, str]:
     """Check database connectivity for streaming. Requires a valid token."""
-    return {"status": _check_database()}
+    return {"status": await db.run(_check_database)}
+
+
+@streaming_router.get("/{item_id}/url")
+async def stream_url(
+    item_id: int,
+    request: Request,
+    ttl: int = Query(stream_urls.DEFAULT_TTL, ge=1, le=stream_urls.MAX_TTL),
+    bind_ip: bool = False,
+    session: Session = Depends(db.request_session),
+    claims: TokenClaims = Depends(token_required),
+) -> dict[str, str | int]:
+    """Return a signed URL for ``item_id`` that works without a token.
 
+    It expires after ``ttl`` seconds and, with ``bind_ip``, only works from
+    the requesting client's address.
+    """
+    if await db.run(db.get_media_row, item_id, session) is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    client_ip = request.client.host if bind_ip and request.client else None
+    params = stream_urls.sign(item_id, claims.username, ttl, client_ip)
+    url = request.url_for("stream_media", item_id=item_id)
+    return {
+        "url": str(url.include_query_params(**params)),
+        "expires": int(params["exp"]),
+    }
 
-@streaming_router.get("/{item_id}")
-async def stream_media(item_id: int, _: TokenClaims = Depends(token_required)):
-    """Stream a media file or redirect to a remote URL."""
-    item = db.get_media_item(item_id)
+
+@streaming_router.api_route("/{item_id}", methods=["GET", "HEAD"])
+async def stream_media(
+    item_id: int,
+    request: Request,
+    exp: int | None = None,
+    ip: bool = False,
+    session: Session = Depends(db.request_session),
+    signed: bool = Depends(stream_access),
+):
+    """Stream a media file or redirect to a remote URL.
+
+    Requests are authorized by a bearer token or by a signed URL from
+    ``/stream/{item_id}/url``. Local files honour ``Range``/``If-Range`` so
+    players can seek without restarting the transfer from the first byte;
+    when served for a signed URL they may be cached until it expires,
+    publicly unless the URL is bound to the client's address. Remote items
+    are redirected unless relay mode is enabled, in which case every viewer
+    of a URL shares a single upstream connection.
+    """
+    item = await db.run(db.get_media_row, item_id, session)
+    # Release the pooled connection now; streams may outlive the request scope.
+    await db.run(session.close)
     if item is None:
         raise HTTPException(status_code=404, detail="Media not found")
     if item.path.startswith("http://") or item.path.startswith("https://"):
-        return RedirectResponse(item.path)
+        if not relay_enabled() or is_playlist(item.path):
+            return RedirectResponse(item.path)
+        if request.method == "HEAD":
+            return Response(status_code=200, media_type=relay_hub.media_type(item.path))
+        try:
+            relay, subscriber = await relay_hub.open(item.path)
+        except RelayUnavailable as exc:
+            raise HTTPException(status_code=502, detail="Upstream unavailable") from exc
+        if is_playlist(item.path, relay.media_type):
+            relay.unsubscribe(subscriber)
+            return RedirectResponse(item.path)
+        return StreamingResponse(
+            relay_hub.iter_chunks(relay, subscriber), media_type=relay.media_type
+        )
     file_path = Path(item.path)
-    if not file_path.exists():
+    stat_result = await anyio.to_thread.run_sync(stat_regular_file, file_path)
+    if stat_result is None:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, media_type="application/octet-stream")
+    response = RangeFileResponse(file_path, stat_result)
+    if signed:
+        max_age = max(0, exp - int(time.time()))
+        # An IP-bound URL must not be replayed to other clients by a shared cache.
+        scope = "private" if ip else "public"
+        response.headers["Cache-Control"] = f"{scope}, max-age={max_age}"
+    return response
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Check the schema and report storage settings on start, release on stop.
+
+    Startup fails while migrations are pending unless
+    ``server.storage.allow_pending_migrations`` is set.
+    """
+    pending = await db.run(migrations.pending_migrations)
+    if pending and not db.STORAGE_CONFIG.get("allow_pending_migrations", False):
+        raise RuntimeError(
+            f"Database schema is {len(pending)} migration(s) behind; "
+            "run `python -m server.main migrate` or set "
+            "server.storage.allow_pending_migrations"
+        )
+    if pending:
+        LOGGER.warning(
+            "Database schema is %d migration(s) behind; serving anyway because "
+            "server.storage.allow_pending_migrations is set",
+            len(pending),
+        )
+    else:
+        await db.run(db.purge_refresh_tokens)
+    # Also runs with pending migrations: revocations read as none until the
+    # table exists.
+    start_refresher()
+    await db.run(db.log_storage_report)
+    await db.run(cache.start_invalidation_listener)
+    await integration_clients.open_clients()
+    yield
+    await integration_clients.close_clients()
+    await stop_refresher()
+    await probe.stop_sweep()
+    await relay_hub.aclose()
+    await db.run(cache.stop_invalidation_listener)
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
     warn_if_default_jwt_secret(resolve_jwt_secret())
 
-    app = FastAPI(title="Shamash Media Server")
+    app = FastAPI(title="Shamash Media Server", lifespan=lifespan)
 
     app.include_router(media_ingestion_router)
     app.include_router(metadata_sync_router)
     app.include_router(user_management_router)
     app.include_router(media_router)
     app.include_router(streaming_router)
+    app.include_router(epg_router)
+    app.include_router(channel_health_router)
     app.include_router(auth_router)
 
     return app
@@ -3,24 +3,33 @@
 from __future__ import annotations
 
 import datetime
+import hashlib
+import secrets
+import time
 from dataclasses import dataclass
 
-import bcrypt
 import jwt
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 
-from . import db
-from .config import resolve_jwt_secret
+from . import cache, db, keys, passwords, stream_urls
+from .revocation import REVOCATIONS
 
 
-SECRET_KEY = resolve_jwt_secret()
-ALGORITHM = "HS256"
+# Signs and verifies tokens: HS256 with the shared jwt_secret unless
+# server.jwt selects EdDSA or RS256 keys (see server/keys.py).
+KEYRING = keys.load_keyring()
 TOKEN_EXPIRE_SECONDS = 3600
+# Refresh tokens let long-lived clients renew access tokens without
+# presenting (and bcrypt-verifying) the password again.
+REFRESH_TOKEN_EXPIRE_SECONDS = 30 * 24 * 3600
 
 
 security = HTTPBearer()
+# For routes that also accept other credentials, such as signed stream URLs.
+optional_security = HTTPBearer(auto_error=False)
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -40,21 +49,51 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    """Schema for refresh and logout requests."""
+
+    refresh_token: str
+
+
 def create_token(username: str, role: str) -> str:
     """Generate a JWT token for the specified user and role."""
+    now = datetime.datetime.now(datetime.UTC)
     payload = {
         "sub": username,
         "role": role,
-        "exp": datetime.datetime.now(datetime.UTC)
-        + datetime.timedelta(seconds=TOKEN_EXPIRE_SECONDS),
+        "jti": secrets.token_hex(12),
+        "iat": now,
+        "exp": now + datetime.timedelta(seconds=TOKEN_EXPIRE_SECONDS),
     }
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    return KEYRING.encode(payload)
 
 
-def verify_token(token: str) -> TokenClaims:
-    """Verify a JWT token and return the embedded claims."""
+def _refresh_digest(refresh_token: str) -> str:
+    """Return the digest under which a refresh token is stored."""
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _refresh_expiry() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC).replace(
+        tzinfo=None
+    ) + datetime.timedelta(seconds=REFRESH_TOKEN_EXPIRE_SECONDS)
+
+
+def _token_response(access_token: str, refresh_token: str) -> dict[str, str | int]:
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": TOKEN_EXPIRE_SECONDS,
+    }
+
+
+def _decode_token(
+    token: str,
+) -> tuple[TokenClaims, float | None, str | None, float | None]:
+    """Verify ``token`` and return its claims, ``exp``, ``jti`` and ``iat``."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = KEYRING.decode(token)
     except jwt.PyJWTError as exc:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
@@ -65,7 +104,35 @@ def verify_token(token: str) -> TokenClaims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload"
         )
-    return TokenClaims(username=username, role=role)
+    expires = float(payload["exp"]) if "exp" in payload else None
+    issued_at = float(payload["iat"]) if "iat" in payload else None
+    return TokenClaims(username, role), expires, payload.get("jti"), issued_at
+
+
+def verify_token(token: str) -> TokenClaims:
+    """Verify a JWT token and return the embedded claims.
+
+    Verified claims are kept in :data:`cache.verified_tokens`, keyed by a
+    digest of the token, until the token expires. Repeated requests with the
+    same bearer token, such as a player fetching segments, skip decoding.
+    Every call, cached or not, is checked against the revocation list, which
+    costs no I/O unless the token is (probably) revoked.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    entry = cache.verified_tokens.get(key)
+    if entry is not None and entry[1] <= time.time():
+        cache.verified_tokens.invalidate(key)
+        entry = None
+    if entry is None:
+        entry = _decode_token(token)
+        if entry[1] is not None:
+            cache.verified_tokens.set(key, entry)
+    claims, _, jti, issued_at = entry
+    if REVOCATIONS.is_revoked(jti, claims.username, issued_at):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked"
+        )
+    return claims
 
 
 def token_required(
@@ -75,6 +142,57 @@ def token_required(
     return verify_token(credentials.credentials)
 
 
+def stream_access(
+    item_id: int,
+    request: Request,
+    exp: int | None = None,
+    iat: int | None = None,
+    u: str | None = None,
+    sig: str | None = None,
+    ip: bool = False,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+) -> bool:
+    """Authorize streaming ``item_id`` by signed URL or bearer token.
+
+    Returns ``True`` when the request was authorized by a signed URL. See
+    :mod:`server.stream_urls`. Signed URLs of a user whose tokens were
+    revoked, such as a deleted user, stop working with those tokens.
+    """
+    if sig is not None and exp is not None:
+        client_ip = request.client.host if ip and request.client else None
+        if (
+            iat is not None
+            and u is not None
+            and (not ip or client_ip)
+            and stream_urls.verify(item_id, exp, iat, u, sig, client_ip)
+        ):
+            if REVOCATIONS.is_revoked(None, u, iat):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Stream URL revoked",
+                )
+            return True
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired stream URL",
+        )
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated"
+        )
+    verify_token(credentials.credentials)
+    return False
+
+
+def hashing_busy_error(exc: passwords.HashingPoolBusy) -> HTTPException:
+    """Translate a saturated hashing pool into ``503`` with ``Retry-After``."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password operations in progress; retry shortly",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 def require_role(role: str):
     """Return a dependency that ensures the authenticated user has ``role``."""
 
@@ -90,18 +208,82 @@ def require_role(role: str):
 
 
 @auth_router.post("/login")
-async def login(credentials: LoginRequest) -> dict[str, str]:
-    """Authenticate user credentials and return a JWT token."""
+async def login(
+    credentials: LoginRequest, session: Session = Depends(db.request_session)
+) -> dict[str, str | int]:
+    """Authenticate user credentials and return access and refresh tokens."""
     username = credentials.username
     password = credentials.password
-    user = db.get_user(username)
+    user = await db.run(db.get_user_row, username, session)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
-    if not bcrypt.checkpw(password.encode(), user.password_hash.encode()):
+    try:
+        valid = await passwords.check_password(password, user.password_hash)
+    except passwords.HashingPoolBusy as exc:
+        raise hashing_busy_error(exc) from exc
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
-    token = create_token(user.username, user.role)
-    return {"access_token": token}
+    refresh_token = secrets.token_urlsafe(32)
+    await db.run(
+        db.store_refresh_token,
+        _refresh_digest(refresh_token),
+        user.username,
+        secrets.token_hex(16),
+        _refresh_expiry(),
+    )
+    return _token_response(create_token(user.username, user.role), refresh_token)
+
+
+@auth_router.post("/refresh")
+async def refresh(request: RefreshRequest) -> dict[str, str | int]:
+    """Exchange a refresh token for a new access token and refresh token.
+
+    No password check is involved. The presented refresh token is single-use:
+    it is replaced by the returned one, and presenting it again revokes every
+    token descended from the same login.
+    """
+    refresh_token = secrets.token_urlsafe(32)
+    user = await db.run(
+        db.rotate_refresh_token,
+        _refresh_digest(request.refresh_token),
+        _refresh_digest(refresh_token),
+        _refresh_expiry(),
+    )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+        )
+    return _token_response(create_token(user.username, user.role), refresh_token)
+
+
+@auth_router.post("/logout")
+async def logout(
+    request: RefreshRequest,
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_security),
+) -> dict[str, str]:
+    """Revoke the refresh token and every token rotated from the same login.
+
+    The access token sent as ``Authorization: Bearer``, if any, is revoked too.
+    """
+    await db.run(
+        db.revoke_refresh_tokens, token_hash=_refresh_digest(request.refresh_token)
+    )
+    if credentials is not None:
+        _, expires, jti, _ = _decode_token(credentials.credentials)
+        if jti is not None and expires is not None:
+            await db.run(REVOCATIONS.revoke, jti, expires)
+    return {"status": "logged_out"}
+
+
+@auth_router.get("/jwks")
+async def jwks() -> dict[str, list[dict]]:
+    """Publish the public token verification keys as a JWK Set.
+
+    Verify-only nodes point ``server.jwt.jwks_url`` here. The set is empty
+    while tokens are signed with the shared HS256 secret.
+    """
+    return KEYRING.jwks()
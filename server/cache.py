@@ -0,0 +1,545 @@
+"""Bounded caches for hot catalog reads, local or shared across workers.
+
+The ``memory`` backend keeps every cache inside the process. The ``redis``
+backend stores values on a Redis-protocol server shared by every worker and
+broadcasts invalidations over pub/sub so per-process copies stay coherent.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Protocol
+
+from .config import CONFIG
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("cache", {}) or {}
+BACKEND = os.environ.get("SHAMASH_CACHE_BACKEND") or CACHE_CONFIG.get(
+    "backend", "memory"
+)
+REDIS_URL = os.environ.get("SHAMASH_REDIS_URL") or CACHE_CONFIG.get(
+    "redis_url", "redis://localhost:6379/0"
+)
+# Lifetime of the per-process copy of a shared value. It bounds staleness if
+# an invalidation message is lost while the pub/sub connection is down.
+LOCAL_TTL = float(CACHE_CONFIG.get("local_ttl", 5))
+# Seconds between attempts to subscribe while Redis is unreachable.
+RECONNECT_INTERVAL = float(CACHE_CONFIG.get("reconnect_interval", 5))
+KEY_PREFIX = "shamash:cache"
+INVALIDATION_CHANNEL = "shamash:cache:invalidate"
+
+
+class CacheBackend(Protocol):
+    """Operations every cache backend provides."""
+
+    name: str
+    generation: int
+
+    def get(self, key: Hashable) -> Any: ...
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None) -> None: ...
+
+    def invalidate(self, key: Hashable) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def version(self) -> str: ...
+
+    def stats(self) -> dict[str, float]: ...
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    The least recently used entry is evicted once ``max_entries`` is reached.
+    ``None`` values are never stored, so ``get`` returning ``None`` always
+    means a miss.
+
+    Readers that load a value from the database should capture
+    :attr:`generation` before querying and pass it to :meth:`set`. Any
+    invalidation in between bumps the generation and the stale value is
+    discarded instead of being cached.
+    """
+
+    def __init__(self, name: str, max_entries: int = 10000, ttl: float = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self.token = uuid.uuid4().hex[:8]
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for ``key``, or ``None`` on a miss."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None) -> None:
+        """Store ``value`` unless the cache was invalidated since ``generation``."""
+
+        if value is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` and reject values loaded before this call."""
+
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry and reject values loaded before this call."""
+
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def version(self) -> str:
+        """Return a token that changes on every invalidation of this cache.
+
+        It is unique to this process, since generations restart at zero.
+        """
+
+        return f"{self.token}.{self.generation}"
+
+    def stats(self) -> dict[str, float]:
+        """Return the entry count, hit/miss/eviction counters and hit rate."""
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turn JSON-decoded lists back into the tuples used as cache keys."""
+
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class InvalidationBus:
+    """Relay cache invalidations between worker processes over Redis pub/sub.
+
+    Every message carries the sender id so a worker ignores its own echoes.
+    Listening happens on a background thread started from the app lifespan.
+    If Redis is unreachable at that point the bus keeps retrying in the
+    background instead of failing startup.
+    """
+
+    def __init__(self, client: Any, channel: str = INVALIDATION_CHANNEL) -> None:
+        self.client = client
+        self.channel = channel
+        self.sender = uuid.uuid4().hex
+        self.caches: dict[str, RedisCache] = {}
+        self._pubsub = None
+        self._thread = None
+        self._retry: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def register(self, cache: RedisCache) -> None:
+        """Route messages addressed to ``cache.name`` to ``cache``."""
+
+        self.caches[cache.name] = cache
+
+    def publish(self, message: dict[str, Any]) -> None:
+        """Broadcast ``message`` to the other workers."""
+
+        self.client.publish(
+            self.channel, json.dumps({**message, "sender": self.sender})
+        )
+
+    def handle(self, raw: bytes | str) -> None:
+        """Apply one received invalidation message to the local caches."""
+
+        message = json.loads(raw)
+        if message.get("sender") == self.sender:
+            return
+        cache = self.caches.get(message.get("cache"))
+        if cache is not None:
+            cache.apply(message)
+
+    def _subscribe(self) -> None:
+        """Subscribe to the channel and dispatch messages on a daemon thread."""
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self.channel: lambda m: self.handle(m["data"])})
+        except BaseException:
+            pubsub.close()
+            raise
+        self._pubsub = pubsub
+        self._thread = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._on_error
+        )
+
+    def _resync(self) -> None:
+        """Drop local state that may have missed invalidations while offline."""
+
+        for cache in self.caches.values():
+            cache.resync()
+
+    def _retry_forever(self) -> None:
+        while not self._stopping.wait(RECONNECT_INTERVAL):
+            try:
+                self._subscribe()
+            except redis.RedisError as exc:
+                LOGGER.debug("Cache invalidation listener still offline: %s", exc)
+                continue
+            LOGGER.info("Cache invalidation listener connected")
+            self._resync()
+            return
+
+    def start(self) -> None:
+        """Start listening, retrying in the background if Redis is down."""
+
+        if self._thread is not None or self._retry is not None:
+            return
+        self._stopping.clear()
+        try:
+            self._subscribe()
+        except redis.RedisError as exc:
+            LOGGER.warning(
+                "Cache invalidation listener unavailable (%s); retrying every %gs",
+                exc,
+                RECONNECT_INTERVAL,
+            )
+            self._retry = threading.Thread(
+                target=self._retry_forever, name="cache-bus-retry", daemon=True
+            )
+            self._retry.start()
+
+    def stop(self) -> None:
+        """Stop listening and close the subscription."""
+
+        self._stopping.set()
+        if self._retry is not None:
+            self._retry.join(timeout=RECONNECT_INTERVAL)
+            self._retry = None
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _on_error(self, exc: Exception, pubsub: Any, thread: Any) -> None:
+        """Log listener failures; local copies expire after ``LOCAL_TTL``."""
+
+        LOGGER.warning("Cache invalidation listener error: %s", exc)
+        time.sleep(1)
+
+
+class RedisCache:
+    """Cache whose values are shared by every worker through Redis.
+
+    Values are JSON-encoded under ``shamash:cache:<name>:<version>:<key>`` and
+    expire after ``ttl`` seconds. :meth:`clear` bumps the shared version, so
+    old keys are simply never read again and age out. A local
+    :class:`LRUCache` with a short TTL answers repeated reads without a round
+    trip; other workers drop their local copies when the invalidation is
+    broadcast. Redis failures are counted and degrade to local-only caching.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bus: InvalidationBus,
+        max_entries: int = 10000,
+        ttl: float = 300,
+        local_ttl: float = LOCAL_TTL,
+    ) -> None:
+        self.name = name
+        self.bus = bus
+        self.client = bus.client
+        self.ttl = ttl
+        self.local = LRUCache(name, max_entries=max_entries, ttl=min(ttl, local_ttl))
+        self.shared_hits = self.shared_misses = self.errors = 0
+        self._version_key = f"{KEY_PREFIX}:{name}:version"
+        self._version: int | None = None
+        self._version_read_at = 0.0
+        bus.register(self)
+
+    @property
+    def generation(self) -> int:
+        """Generation of the local copy; see :class:`LRUCache`."""
+
+        return self.local.generation
+
+    def _shared_version(self) -> int:
+        """Return the shared version, re-reading it once per local TTL.
+
+        Broadcasts update it immediately; the periodic read bounds how long a
+        lost broadcast can leave this worker on an old version.
+        """
+
+        now = time.monotonic()
+        if self._version is None or now - self._version_read_at >= self.local.ttl:
+            version = int(self.client.get(self._version_key) or 0)
+            if self._version is not None and version != self._version:
+                self.local.clear()
+            self._version = version
+            self._version_read_at = now
+        return self._version
+
+    def _key(self, key: Hashable) -> str:
+        """Return the shared Redis key for ``key`` under the current version."""
+
+        encoded = json.dumps(key, separators=(",", ":"))
+        return f"{KEY_PREFIX}:{self.name}:{self._shared_version()}:{encoded}"
+
+    def _failed(self, exc: Exception) -> None:
+        """Record a Redis failure without failing the caller."""
+
+        self.errors += 1
+        LOGGER.warning("Shared cache %s unavailable: %s", self.name, exc)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the value for ``key`` from the local copy or Redis."""
+
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        generation = self.local.generation
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError as exc:
+            self._failed(exc)
+            return None
+        if raw is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        value = json.loads(raw)
+        self.local.set(key, value, generation)
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None) -> None:
+        """Store ``value`` locally and in Redis unless it is already stale."""
+
+        if value is None or (generation is not None and generation != self.generation):
+            return
+        self.local.set(key, value, generation)
+        try:
+            self.client.set(self._key(key), json.dumps(value), ex=math.ceil(self.ttl))
+        except redis.RedisError as exc:
+            self._failed(exc)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` in Redis and in every worker's local copy."""
+
+        self.local.invalidate(key)
+        try:
+            self.client.delete(self._key(key))
+            self.bus.publish({"cache": self.name, "key": key})
+        except redis.RedisError as exc:
+            self._failed(exc)
+
+    def clear(self) -> None:
+        """Retire every shared entry and clear every worker's local copy."""
+
+        self.local.clear()
+        try:
+            self._version = int(self.client.incr(self._version_key))
+            self._version_read_at = time.monotonic()
+            self.bus.publish({"cache": self.name, "version": self._version})
+        except redis.RedisError as exc:
+            self._version = None
+            self._failed(exc)
+
+    def version(self) -> str:
+        """Return the shared version, identical on every worker.
+
+        Falls back to the local copy's process-specific version while Redis
+        is unreachable.
+        """
+
+        try:
+            return f"shared.{self._shared_version()}"
+        except redis.RedisError as exc:
+            self._failed(exc)
+            return self.local.version()
+
+    def apply(self, message: dict[str, Any]) -> None:
+        """Apply an invalidation broadcast by another worker."""
+
+        if "version" in message:
+            self._version = int(message["version"])
+            self._version_read_at = time.monotonic()
+            self.local.clear()
+        elif "key" in message:
+            self.local.invalidate(_freeze(message["key"]))
+
+    def resync(self) -> None:
+        """Forget the local copy and re-read the shared version on next use."""
+
+        self._version = None
+        self.local.clear()
+
+    def stats(self) -> dict[str, float]:
+        """Return local counters plus shared hits, misses, and errors."""
+
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "errors": self.errors,
+        }
+
+
+_bus: InvalidationBus | None = None
+
+
+def _redis_bus() -> InvalidationBus:
+    """Return the process-wide invalidation bus, creating its client lazily."""
+
+    global _bus
+    if _bus is None:
+        if redis is None:
+            raise RuntimeError(
+                "server.cache.backend is 'redis' but the redis package is not "
+                "installed; run `pip install redis`"
+            )
+        _bus = InvalidationBus(
+            redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        )
+    return _bus
+
+
+def _build(
+    name: str, max_entries: int, ttl: float, backend: str = BACKEND
+) -> CacheBackend:
+    """Create the cache ``name`` on ``backend``, the configured one by default.
+
+    Sizes and TTLs can be overridden per cache under ``server.cache.<name>``.
+    """
+
+    settings = CACHE_CONFIG.get(name) or {}
+    max_entries = int(settings.get("max_entries", max_entries))
+    ttl = float(settings.get("ttl", ttl))
+    if backend == "memory":
+        return LRUCache(name, max_entries=max_entries, ttl=ttl)
+    if backend == "redis":
+        return RedisCache(name, _redis_bus(), max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unsupported cache backend: {backend}")
+
+
+# Single media items by id, as served by /stream/{id}.
+media_rows = _build("media_rows", max_entries=10000, ttl=300)
+# Listing pages keyed by their query; cleared by any catalog or health write.
+media_pages = _build("media_pages", max_entries=256, ttl=60)
+# Encoded /media/ response bodies keyed by ETag. Always per process: they are
+# large and cheap to rebuild from the shared pages.
+media_bodies = _build("media_bodies", max_entries=32, ttl=300, backend="memory")
+_BODY_CONFIG = CACHE_CONFIG.get("media_bodies") or {}
+# Larger listings are streamed without being kept.
+MEDIA_BODY_MAX_BYTES = int(_BODY_CONFIG.get("max_bytes", 16 * 1024 * 1024))
+# Also keep a gzip copy of cached bodies for clients that accept it.
+MEDIA_BODY_GZIP = bool(_BODY_CONFIG.get("gzip", True))
+# Verified bearer tokens keyed by digest. Per process: verification is cheap
+# enough that sharing would cost more than it saves.
+verified_tokens = _build(
+    "verified_tokens", max_entries=10000, ttl=900, backend="memory"
+)
+
+
+def start_invalidation_listener() -> None:
+    """Start receiving invalidations from other workers (shared backends only)."""
+
+    if _bus is not None:
+        _bus.start()
+
+
+def stop_invalidation_listener() -> None:
+    """Stop receiving invalidations from other workers."""
+
+    if _bus is not None:
+        _bus.stop()
+
+
+def invalidate_media(item_id: int | None = None) -> None:
+    """Forget cached catalog reads after a write.
+
+    With ``item_id`` only that item's row is dropped; otherwise every row is.
+    Listing pages are always cleared since any write can change them. Shared
+    backends propagate the invalidation to every worker.
+    """
+
+    if item_id is None:
+        media_rows.clear()
+    else:
+        media_rows.invalidate(item_id)
+    invalidate_listings()
+
+
+def invalidate_listings() -> None:
+    """Forget cached listings and move on to the next catalog version."""
+
+    media_pages.clear()
+    media_bodies.clear()
+
+
+def catalog_version() -> str:
+    """Return a token that changes after every catalog or health write.
+
+    Listing pages are cleared by exactly those writes, so their cache version
+    doubles as the catalog version. With a shared backend it is the same on
+    every worker.
+    """
+
+    return media_pages.version()
+
+
+def cache_stats() -> dict[str, Any]:
+    """Return the backend name and counters for every cache."""
+
+    return {
+        "backend": BACKEND,
+        **{
+            cache.name: cache.stats()
+            for cache in (media_rows, media_pages, media_bodies, verified_tokens)
+        },
+    }
@@ -2,39 +2,154 @@
 
 from __future__ import annotations
 
-import bcrypt
+import asyncio
+import datetime
+import functools
+import logging
 import os
+import re
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
 
+from . import cache, passwords
 from .config import CONFIG
 
-from sqlalchemy import create_engine, select, text
+from sqlalchemy import (
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, sessionmaker
 
-from .models import Base, User, MediaItem
+from .models import (
+    ChannelHealth,
+    EpgSource,
+    MediaItem,
+    PlaylistSource,
+    Programme,
+    RefreshToken,
+    RevokedToken,
+    User,
+)
 
 DEFAULT_DB_PATH = Path(
     CONFIG.get("server", {}).get("database", Path(__file__).with_name("shamash.db"))
 )
 DB_PATH = Path(os.environ.get("SHAMASH_DB_PATH", DEFAULT_DB_PATH))
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+STORAGE_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("storage", {}) or {}
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
-Base.metadata.create_all(bind=engine)
+def _database_url() -> str:
+    """Resolve the database URL from the environment and configuration.
 
-# Migration: ensure the `role` column exists on the users table
-with engine.begin() as conn:  # pragma: no cover - executed at import time
-    existing = [row[1] for row in conn.execute(text("PRAGMA table_info(users)"))]
-    if "role" not in existing:
-        conn.execute(
-            text("ALTER TABLE users ADD COLUMN role STRING NOT NULL DEFAULT 'user'")
-        )
+    ``SHAMASH_DATABASE_URL`` wins, then ``SHAMASH_DB_PATH`` (a SQLite file),
+    then ``server.storage.url``, and finally the SQLite file configured under
+    ``server.database``.
+    """
+    url = os.environ.get("SHAMASH_DATABASE_URL")
+    if url:
+        return url
+    if "SHAMASH_DB_PATH" in os.environ or not STORAGE_CONFIG.get("url"):
+        return f"sqlite:///{DB_PATH}"
+    return str(STORAGE_CONFIG["url"])
+
+
+DATABASE_URL = _database_url()
+DIALECT = make_url(DATABASE_URL).get_backend_name()
+if DIALECT not in {"sqlite", "postgresql"}:
+    raise ValueError(f"Unsupported database backend: {DIALECT}")
+
+LOGGER = logging.getLogger(__name__)
+
+# Defaults favour concurrent readers during bulk ingestion: WAL lets readers
+# proceed while a writer commits, and ``synchronous=NORMAL`` is durable across
+# application crashes in WAL mode while avoiding an fsync per transaction.
+DEFAULT_SQLITE_PRAGMAS: dict[str, str | int] = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -65536,
+    "mmap_size": 268435456,
+    "temp_store": "memory",
+    "busy_timeout": 5000,
+}
+SQLITE_PRAGMAS: dict[str, str | int] = {
+    **DEFAULT_SQLITE_PRAGMAS,
+    **(STORAGE_CONFIG.get("sqlite") or {}),
+}
+POSTGRES_CONFIG: dict[str, Any] = STORAGE_CONFIG.get("postgres") or {}
+POOL_CONFIG: dict[str, Any] = STORAGE_CONFIG.get("pool") or {}
+EXECUTOR_WORKERS = int(STORAGE_CONFIG.get("executor_workers", 8))
+_PRAGMA_VALUE_RE = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+for _name, _value in SQLITE_PRAGMAS.items():
+    if _name not in DEFAULT_SQLITE_PRAGMAS or not _PRAGMA_VALUE_RE.match(str(_value)):
+        raise ValueError(f"Unsupported SQLite pragma setting: {_name}={_value!r}")
+
+
+def _engine_options() -> dict[str, Any]:
+    """Return pool and connection settings suited to the configured backend.
+
+    SQLite files live on local disk, so connections never go stale and are
+    not pinged or recycled. PostgreSQL connections cross the network: they
+    are pinged on checkout, recycled periodically, and every statement is
+    bounded by ``server.storage.postgres.statement_timeout_ms``.
+    """
+    remote = DIALECT != "sqlite"
+    options: dict[str, Any] = {
+        "pool_size": int(POOL_CONFIG.get("size", EXECUTOR_WORKERS)),
+        "max_overflow": int(POOL_CONFIG.get("max_overflow", 4 if remote else 8)),
+        "pool_timeout": float(POOL_CONFIG.get("timeout", 30)),
+        "pool_pre_ping": bool(POOL_CONFIG.get("pre_ping", remote)),
+        "pool_recycle": int(POOL_CONFIG.get("recycle", 1800 if remote else -1)),
+    }
+    if remote:
+        timeout = int(POSTGRES_CONFIG.get("statement_timeout_ms", 30000))
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    else:
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+engine = create_engine(DATABASE_URL, **_engine_options())
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """Apply the configured storage pragmas to every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+if DIALECT == "sqlite":
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+_SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
 
 
 def get_session() -> Session:
@@ -42,14 +157,166 @@ def get_session() -> Session:
     return SessionLocal()
 
 
+def storage_report() -> dict[str, Any]:
+    """Return the effective backend settings and pool sizing of the engine."""
+    with engine.connect() as conn:
+        if DIALECT == "sqlite":
+            settings = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in SQLITE_PRAGMAS
+            }
+        else:
+            settings = {
+                name: conn.exec_driver_sql(f"SHOW {name}").scalar()
+                for name in ("server_version", "statement_timeout")
+            }
+    return {
+        "database": engine.url.render_as_string(hide_password=True),
+        "backend": DIALECT,
+        "settings": settings,
+        "pool_size": engine.pool.size(),
+        "max_overflow": engine.pool._max_overflow,
+        "executor_workers": DB_EXECUTOR._max_workers,
+    }
+
+
+def log_storage_report() -> None:
+    """Log the effective storage settings once at startup."""
+    LOGGER.info("Storage settings: %s", storage_report())
+
+
+def has_table(name: str) -> bool:
+    """Return whether the table ``name`` exists, e.g. before its migration ran."""
+    with engine.connect() as conn:
+        return inspect(conn).has_table(name)
+
+
+# Blocking helpers below are dispatched through a dedicated, bounded executor
+# so a slow query never runs on the event loop and database work cannot
+# exhaust the default thread pool shared with file streaming.
+DB_EXECUTOR = ThreadPoolExecutor(
+    max_workers=EXECUTOR_WORKERS,
+    thread_name_prefix="shamash-db",
+)
+
+T = TypeVar("T")
+
+
+async def run(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking database helper on :data:`DB_EXECUTOR` and await it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        DB_EXECUTOR, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def request_session() -> AsyncIterator[Session]:
+    """FastAPI dependency providing one session for every query of a request.
+
+    Pass the session to the ``*_row`` helpers through :func:`run`. It is
+    closed, returning its connection to the pool, once the request is done.
+    """
+    session = get_session()
+    try:
+        yield session
+    finally:
+        await run(session.close)
+
+
+@contextmanager
+def _session_scope(session: Session | None) -> Iterator[Session]:
+    """Yield ``session``, or a short-lived session when none is given."""
+    if session is not None:
+        yield session
+        return
+    owned = get_session()
+    try:
+        yield owned
+    finally:
+        owned.close()
+
+
+# Lightweight read rows --------------------------------------------------------
+#
+# Hot read paths select plain columns with Core statements and wrap them in
+# named tuples, skipping ORM hydration and the identity map entirely.
+
+
+class MediaRow(NamedTuple):
+    """Media item columns needed to serve a stream."""
+
+    id: int
+    title: str
+    path: str
+    description: str | None
+
+
+class UserRow(NamedTuple):
+    """User columns needed to check credentials."""
+
+    id: int
+    username: str
+    password_hash: str
+    role: str
+
+
+_media_table = MediaItem.__table__
+_user_table = User.__table__
+_MEDIA_ROW_SELECT = select(*(_media_table.c[name] for name in MediaRow._fields))
+_USER_ROW_SELECT = select(*(_user_table.c[name] for name in UserRow._fields))
+
+
+def get_media_row(item_id: int, session: Session | None = None) -> MediaRow | None:
+    """Fetch the columns of media item ``item_id`` as a :class:`MediaRow`.
+
+    Rows are served from :data:`cache.media_rows` when present, so repeated
+    lookups of a hot channel never reach the database.
+    """
+    cached = cache.media_rows.get(item_id)
+    if cached is not None:
+        # Shared backends hand back the JSON-decoded list.
+        return MediaRow(*cached)
+    generation = cache.media_rows.generation
+    with _session_scope(session) as active:
+        row = (
+            active.connection()
+            .execute(_MEDIA_ROW_SELECT.where(_media_table.c.id == item_id))
+            .first()
+        )
+    if row is None:
+        return None
+    media = MediaRow(*row)
+    cache.media_rows.set(item_id, media, generation)
+    return media
+
+
+def get_user_row(username: str, session: Session | None = None) -> UserRow | None:
+    """Fetch the credentials of ``username`` as a :class:`UserRow`."""
+    with _session_scope(session) as active:
+        row = (
+            active.connection()
+            .execute(_USER_ROW_SELECT.where(_user_table.c.username == username))
+            .first()
+        )
+    return UserRow(*row) if row is not None else None
+
+
 # User management CRUD -------------------------------------------------------
 
 
 def add_user(username: str, password: str, role: str = "user") -> User:
-    """Create a new user with a hashed password and role."""
+    """Create a new user with a hashed password and role.
+
+    Hashes on the calling thread; request handlers hash through
+    :mod:`server.passwords` and call :func:`insert_user` instead.
+    """
+    return insert_user(username, passwords.hash_password_blocking(password), role)
+
+
+def insert_user(username: str, password_hash: str, role: str = "user") -> User:
+    """Create a new user from an already computed password hash."""
     session = get_session()
     try:
-        password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
         user = User(username=username, password_hash=password_hash, role=role)
         session.add(user)
         session.commit()
@@ -73,13 +340,18 @@ def get_user(username: str) -> Optional[User]:
 
 
 def update_user_password(username: str, password: str) -> bool:
-    """Update a user's password hash."""
+    """Hash ``password`` on the calling thread and store it for ``username``."""
+    return set_user_password_hash(username, passwords.hash_password_blocking(password))
+
+
+def set_user_password_hash(username: str, password_hash: str) -> bool:
+    """Store an already computed password hash for ``username``."""
     session = get_session()
     try:
         user = session.scalar(select(User).where(User.username == username))
         if user is None:
             return False
-        user.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        user.password_hash = password_hash
         session.commit()
         return True
     except Exception:
@@ -90,13 +362,22 @@ def update_user_password(username: str, password: str) -> bool:
 
 
 def delete_user(username: str) -> bool:
-    """Delete a user from the database."""
+    """Delete a user, their refresh tokens, and every access token issued."""
     session = get_session()
     try:
         user = session.scalar(select(User).where(User.username == username))
         if user is None:
             return False
         session.delete(user)
+        session.execute(delete(RefreshToken).where(RefreshToken.username == username))
+        now = _utcnow()
+        session.add(
+            RevokedToken(
+                key=f"sub:{username}",
+                revoked_at=now,
+                expires_at=now + USER_REVOCATION_TTL,
+            )
+        )
         session.commit()
         return True
     except Exception:
@@ -106,6 +387,226 @@ def delete_user(username: str) -> bool:
         session.close()
 
 
+# Refresh tokens ---------------------------------------------------------------
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def store_refresh_token(
+    token_hash: str, username: str, family: str, expires_at: datetime.datetime
+) -> None:
+    """Record a newly issued refresh token (by digest) in ``family``."""
+    session = get_session()
+    try:
+        session.add(
+            RefreshToken(
+                token_hash=token_hash,
+                username=username,
+                family=family,
+                issued_at=_utcnow(),
+                expires_at=expires_at,
+            )
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def rotate_refresh_token(
+    token_hash: str, new_hash: str, expires_at: datetime.datetime
+) -> Optional[UserRow]:
+    """Replace a live refresh token with ``new_hash`` and return its user.
+
+    The old token is claimed with a conditional ``UPDATE``, so of two
+    concurrent refreshes with the same token only one succeeds. Returns
+    ``None`` for unknown, expired, or revoked tokens and for deleted users.
+    Presenting a token that was already replaced means it leaked, so its
+    whole family is revoked.
+    """
+    now = _utcnow()
+    table = RefreshToken.__table__
+    session = get_session()
+    try:
+        claimed = session.execute(
+            update(table)
+            .where(
+                table.c.token_hash == token_hash,
+                table.c.replaced_by.is_(None),
+                table.c.revoked_at.is_(None),
+                table.c.expires_at > now,
+            )
+            .values(replaced_by=new_hash)
+        )
+        row = session.execute(
+            select(table.c.username, table.c.family).where(
+                table.c.token_hash == token_hash
+            )
+        ).first()
+        if row is None:
+            return None
+        if claimed.rowcount != 1:
+            if session.scalar(
+                select(table.c.replaced_by).where(table.c.token_hash == token_hash)
+            ):
+                session.execute(
+                    update(table)
+                    .where(table.c.family == row.family, table.c.revoked_at.is_(None))
+                    .values(revoked_at=now)
+                )
+                session.commit()
+            return None
+        user = get_user_row(row.username, session)
+        if user is None:
+            session.rollback()
+            return None
+        session.execute(
+            table.insert().values(
+                token_hash=new_hash,
+                username=row.username,
+                family=row.family,
+                issued_at=now,
+                expires_at=expires_at,
+            )
+        )
+        session.commit()
+        return user
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def revoke_refresh_tokens(
+    *, username: Optional[str] = None, token_hash: Optional[str] = None
+) -> int:
+    """Revoke every live refresh token of ``username`` or of ``token_hash``'s family.
+
+    Returns the number of tokens revoked.
+    """
+    table = RefreshToken.__table__
+    if token_hash is not None:
+        scope = table.c.family == (
+            select(table.c.family)
+            .where(table.c.token_hash == token_hash)
+            .scalar_subquery()
+        )
+    elif username is not None:
+        scope = table.c.username == username
+    else:
+        raise ValueError("username or token_hash is required")
+    session = get_session()
+    try:
+        result = session.execute(
+            update(table)
+            .where(scope, table.c.revoked_at.is_(None))
+            .values(revoked_at=_utcnow())
+        )
+        session.commit()
+        return result.rowcount
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def purge_refresh_tokens(before: Optional[datetime.datetime] = None) -> int:
+    """Delete refresh tokens that expired before ``before`` (default: now)."""
+    session = get_session()
+    try:
+        result = session.execute(
+            delete(RefreshToken).where(RefreshToken.expires_at < (before or _utcnow()))
+        )
+        session.commit()
+        return result.rowcount
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Access token revocations -----------------------------------------------------
+
+# How long a user-wide revocation is kept; it must outlive any access token.
+USER_REVOCATION_TTL = datetime.timedelta(days=1)
+
+
+def add_revocation(key: str, expires_at: datetime.datetime) -> int:
+    """Record a revocation ``key`` (``jti:<id>`` or ``sub:<name>``)."""
+    session = get_session()
+    try:
+        row = RevokedToken(key=key, revoked_at=_utcnow(), expires_at=expires_at)
+        session.add(row)
+        session.commit()
+        return row.id
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def revocations_since(
+    since: Optional[datetime.datetime] = None,
+) -> list[tuple[int, str, datetime.datetime]]:
+    """Return ``(id, key, revoked_at)`` of live revocations.
+
+    With ``since``, only revocations made at or after it are returned.
+    """
+    table = RevokedToken.__table__
+    query = select(table.c.id, table.c.key, table.c.revoked_at).where(
+        table.c.expires_at > _utcnow()
+    )
+    if since is not None:
+        query = query.where(table.c.revoked_at >= since)
+    with _session_scope(None) as session:
+        rows = session.execute(query.order_by(table.c.revoked_at))
+        return [tuple(row) for row in rows]
+
+
+def is_token_revoked(
+    jti: Optional[str], username: str, issued_at: Optional[datetime.datetime]
+) -> bool:
+    """Return whether a token is revoked, by its ``jti`` or by its user.
+
+    A user-wide revocation covers tokens issued at or before it; tokens
+    without an ``issued_at`` are always covered.
+    """
+    table = RevokedToken.__table__
+    user_scope = table.c.key == f"sub:{username}"
+    if issued_at is not None:
+        user_scope = user_scope & (table.c.revoked_at >= issued_at)
+    scope = or_(table.c.key == f"jti:{jti}", user_scope) if jti else user_scope
+    with _session_scope(None) as session:
+        row = session.execute(
+            select(table.c.id).where(scope, table.c.expires_at > _utcnow()).limit(1)
+        ).first()
+    return row is not None
+
+
+def purge_revocations() -> int:
+    """Delete revocations whose tokens have all expired."""
+    session = get_session()
+    try:
+        result = session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= _utcnow())
+        )
+        session.commit()
+        return result.rowcount
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 def get_password_hash(username: str) -> Optional[str]:
     """Retrieve the stored password hash for a user."""
     user = get_user(username)
@@ -125,6 +626,7 @@ def create_media_item(
         session.add(item)
         session.commit()
         session.refresh(item)
+        cache.invalidate_media(item.id)
         return item
     except Exception:
         session.rollback()
@@ -133,6 +635,182 @@ def create_media_item(
         session.close()
 
 
+def insert_media_items(rows: list[dict]) -> list[int | None]:
+    """Insert ``rows`` in one transaction and return their ids in input order.
+
+    The rows are sent as a single executemany statement with ``RETURNING``,
+    so a chunk of thousands of items costs one round trip and one commit.
+    Rows whose ``path`` already exists, in the table or earlier in ``rows``,
+    are skipped and reported as ``None``.
+    """
+    if not rows:
+        return []
+    session = get_session()
+    try:
+        taken = set(
+            session.scalars(
+                select(MediaItem.path).where(
+                    MediaItem.path.in_({row["path"] for row in rows})
+                )
+            )
+        )
+        fresh: list[int] = []
+        for position, row in enumerate(rows):
+            if row["path"] not in taken:
+                taken.add(row["path"])
+                fresh.append(position)
+        ids: list[int | None] = [None] * len(rows)
+        if fresh:
+            stmt = insert(MediaItem).returning(
+                MediaItem.id, sort_by_parameter_order=True
+            )
+            new_ids = session.scalars(stmt, [rows[i] for i in fresh]).all()
+            for position, item_id in zip(fresh, new_ids):
+                ids[position] = item_id
+        session.commit()
+        cache.invalidate_media()
+        return ids
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _dialect_insert(model) -> Any:
+    """Return an ``INSERT`` supporting ``ON CONFLICT`` for the active backend."""
+    if DIALECT == "postgresql":
+        return postgresql.insert(model)
+    return sqlite_insert(model)
+
+
+def upsert_media_items(rows: list[dict]) -> tuple[int, int]:
+    """Insert or update media items keyed by ``path`` in one transaction.
+
+    ``rows`` are dictionaries of :class:`MediaItem` column values sharing the
+    same keys. They are written with a single executemany
+    ``INSERT ... ON CONFLICT (path) DO UPDATE`` statement. Returns the number
+    of inserted and updated rows.
+    """
+    by_path = {row["path"]: row for row in rows}
+    if not by_path:
+        return 0, 0
+    session = get_session()
+    try:
+        updated = session.scalar(
+            select(func.count())
+            .select_from(MediaItem)
+            .where(MediaItem.path.in_(list(by_path)))
+        )
+        stmt = _dialect_insert(MediaItem)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaItem.path],
+            set_={
+                column: stmt.excluded[column]
+                for column in next(iter(by_path.values()))
+                if column != "path"
+            },
+        )
+        session.execute(stmt, list(by_path.values()))
+        session.commit()
+        cache.invalidate_media()
+        return len(by_path) - updated, updated
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def list_source_media_rows(source: str) -> list[dict]:
+    """Return the playlist-managed columns of every item from ``source``."""
+    session = get_session()
+    try:
+        stmt = (
+            select(
+                MediaItem.id,
+                MediaItem.title,
+                MediaItem.path,
+                MediaItem.tvg_id,
+                MediaItem.group_title,
+                MediaItem.logo,
+            )
+            .where(MediaItem.source == source)
+            .order_by(MediaItem.id)
+        )
+        return [dict(row._mapping) for row in session.execute(stmt)]
+    finally:
+        session.close()
+
+
+def _without_path_clashes(session: Session, rows: list[dict]) -> list[dict]:
+    """Drop updates that would move an item onto a path owned by another."""
+    owners = dict(
+        session.execute(
+            select(MediaItem.path, MediaItem.id).where(
+                MediaItem.path.in_({row["path"] for row in rows})
+            )
+        ).all()
+    )
+    kept = []
+    for row in rows:
+        if owners.setdefault(row["path"], row["id"]) == row["id"]:
+            kept.append(row)
+    return kept
+
+
+def apply_media_diff(
+    inserts: list[dict],
+    updates: list[dict],
+    deletes: list[int],
+    batch_size: int = 500,
+) -> tuple[int, int, int]:
+    """Apply precomputed media item changes in chunked transactions.
+
+    ``updates`` must carry the primary key under ``id``. Each chunk commits
+    separately so long refreshes never hold the write lock for the whole run.
+    Deletes run first to free their paths and take the items' health results
+    with them. Inserts whose ``path`` already
+    belongs to another item (e.g. a stream listed in two playlists) are
+    skipped, as are updates that would move an item onto such a path.
+    Returns the number of rows actually inserted, updated and deleted.
+    """
+    inserted = updated = deleted = 0
+    session = get_session()
+    try:
+        for start in range(0, len(deletes), batch_size):
+            ids = deletes[start : start + batch_size]
+            session.execute(
+                delete(ChannelHealth).where(ChannelHealth.media_item_id.in_(ids))
+            )
+            result = session.execute(delete(MediaItem).where(MediaItem.id.in_(ids)))
+            session.commit()
+            deleted += result.rowcount
+        for start in range(0, len(updates), batch_size):
+            chunk = _without_path_clashes(session, updates[start : start + batch_size])
+            if chunk:
+                session.execute(update(MediaItem), chunk)
+            session.commit()
+            updated += len(chunk)
+        for start in range(0, len(inserts), batch_size):
+            added = session.scalars(
+                _dialect_insert(MediaItem)
+                .on_conflict_do_nothing(index_elements=[MediaItem.path])
+                .returning(MediaItem.id),
+                inserts[start : start + batch_size],
+            ).all()
+            session.commit()
+            inserted += len(added)
+        return inserted, updated, deleted
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        # Earlier chunks may have committed even when a later one failed.
+        cache.invalidate_media()
+
+
 def get_media_item(item_id: int) -> Optional[MediaItem]:
     """Fetch a media item by ID."""
     session = get_session()
@@ -142,16 +820,131 @@ def get_media_item(item_id: int) -> Optional[MediaItem]:
         session.close()
 
 
-def list_media_items() -> list[MediaItem]:
-    """Return all media items."""
+def list_media_items(hide_dead: bool = False) -> list[MediaItem]:
+    """Return all media items, optionally skipping ones that failed a probe."""
     session = get_session()
     try:
-        items = session.scalars(select(MediaItem)).all()
+        stmt = select(MediaItem)
+        if hide_dead:
+            stmt = stmt.outerjoin(
+                ChannelHealth, ChannelHealth.media_item_id == MediaItem.id
+            ).where(or_(ChannelHealth.status.is_(None), ChannelHealth.status == "ok"))
+        items = session.scalars(stmt).all()
         return list(items)
     finally:
         session.close()
 
 
+# Columns clients may request through ``/media/?fields=``. Paths are omitted on
+# purpose: local items expose filesystem locations.
+MEDIA_FIELDS = ("id", "title", "description", "tvg_id", "group_title", "logo")
+
+
+def list_media_page(
+    fields: Iterable[str] = ("id", "title", "description"),
+    after: int = 0,
+    limit: int = 1000,
+    hide_dead: bool = False,
+    session: Session | None = None,
+) -> list[tuple]:
+    """Return up to ``limit`` media rows with ``id > after`` ordered by id.
+
+    Only the requested ``fields`` are selected and rows are returned as plain
+    tuples, so a page costs neither ORM object construction nor unused
+    columns. Callers page through the catalog by passing the id of the last
+    row they received as ``after``. Pages are cached in
+    :data:`cache.media_pages` until the next catalog or health write.
+    """
+    fields = tuple(fields)
+    key = (fields, after, limit, hide_dead)
+    cached = cache.media_pages.get(key)
+    if cached is not None:
+        return cached
+    generation = cache.media_pages.generation
+    columns = [_media_table.c[field] for field in fields]
+    stmt = (
+        select(*columns)
+        .where(_media_table.c.id > after)
+        .order_by(_media_table.c.id)
+        .limit(limit)
+    )
+    if hide_dead:
+        health = ChannelHealth.__table__
+        stmt = stmt.outerjoin(
+            health, health.c.media_item_id == _media_table.c.id
+        ).where(or_(health.c.status.is_(None), health.c.status == "ok"))
+    with _session_scope(session) as active:
+        page = [tuple(row) for row in active.connection().execute(stmt)]
+    cache.media_pages.set(key, page, generation)
+    return page
+
+
+def build_search_query(query: str) -> str:
+    """Turn free text into a full-text query matching every word as a prefix.
+
+    Words are quoted so operators typed by users (``AND``, ``NEAR``, ``-``,
+    ``:``, ``&``) are treated as plain text. FTS5 syntax is produced for
+    SQLite and ``tsquery`` syntax for PostgreSQL. Raises ``ValueError`` when
+    ``query`` contains no searchable words.
+    """
+    tokens = _SEARCH_TOKEN_RE.findall(query)
+    if not tokens:
+        raise ValueError("query must contain at least one word")
+    if DIALECT == "postgresql":
+        return " & ".join(f"'{token.lower()}':*" for token in tokens)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+_SEARCH_SQL = {
+    "sqlite": """
+        SELECT m.id, m.title, m.description
+        FROM media_items_fts
+        JOIN media_items AS m ON m.id = media_items_fts.rowid
+        WHERE media_items_fts MATCH :query
+        ORDER BY bm25(media_items_fts, 10.0, 1.0)
+        LIMIT :limit
+    """,
+    "postgresql": """
+        SELECT id, title, description
+        FROM media_items, to_tsquery('simple', :query) AS query
+        WHERE search_vector @@ query
+        ORDER BY ts_rank(search_vector, query) DESC, id
+        LIMIT :limit
+    """,
+}
+
+
+def search_media_items(query: str, limit: int = 50) -> list[dict]:
+    """Return media items matching ``query`` ranked by relevance.
+
+    SQLite ranks with bm25 and PostgreSQL with ``ts_rank``; both weigh title
+    matches well above description matches.
+    """
+    session = get_session()
+    try:
+        rows = session.execute(
+            text(_SEARCH_SQL[DIALECT]),
+            {"query": build_search_query(query), "limit": limit},
+        )
+        return [dict(row._mapping) for row in rows]
+    finally:
+        session.close()
+
+
+def rebuild_media_search() -> None:
+    """Rebuild the full-text index from ``media_items`` and compact it."""
+    with engine.begin() as conn:
+        if DIALECT == "postgresql":
+            conn.execute(text("REINDEX INDEX ix_media_items_search"))
+            return
+        conn.execute(
+            text("INSERT INTO media_items_fts(media_items_fts) VALUES ('rebuild')")
+        )
+        conn.execute(
+            text("INSERT INTO media_items_fts(media_items_fts) VALUES ('optimize')")
+        )
+
+
 def update_media_item(item_id: int, **fields: str) -> bool:
     """Update fields on a media item."""
     session = get_session()
@@ -162,6 +955,7 @@ def update_media_item(item_id: int, **fields: str) -> bool:
         for key, value in fields.items():
             setattr(item, key, value)
         session.commit()
+        cache.invalidate_media(item_id)
         return True
     except Exception:
         session.rollback()
@@ -171,17 +965,253 @@ def update_media_item(item_id: int, **fields: str) -> bool:
 
 
 def delete_media_item(item_id: int) -> bool:
-    """Remove a media item from the database."""
+    """Remove a media item and its health result from the database.
+
+    The health row must go too: SQLite may hand the freed id to the next item,
+    which would otherwise inherit a stale probe status.
+    """
     session = get_session()
     try:
         item = session.get(MediaItem, item_id)
         if item is None:
             return False
+        session.execute(
+            delete(ChannelHealth).where(ChannelHealth.media_item_id == item_id)
+        )
         session.delete(item)
         session.commit()
+        cache.invalidate_media(item_id)
         return True
     except Exception:
         session.rollback()
         raise
     finally:
         session.close()
+
+
+# Playlist sources -----------------------------------------------------------
+
+
+def get_playlist_source(url: str) -> Optional[PlaylistSource]:
+    """Return stored HTTP validators for a playlist URL."""
+    session = get_session()
+    try:
+        return session.get(PlaylistSource, url)
+    finally:
+        session.close()
+
+
+def save_playlist_source(url: str, etag: str | None, last_modified: str | None) -> None:
+    """Record the validators of the most recently applied playlist response."""
+    session = get_session()
+    try:
+        source = session.get(PlaylistSource, url) or PlaylistSource(url=url)
+        source.etag = etag
+        source.last_modified = last_modified
+        source.refreshed_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        session.add(source)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Programme guide ------------------------------------------------------------
+
+
+def replace_programmes(source: str, batches: Iterable[list[dict]]) -> tuple[int, int]:
+    """Atomically swap the programmes of ``source`` for freshly parsed ones.
+
+    ``batches`` is consumed lazily and each list is written with a single
+    executemany insert, so a guide is never held in memory as a whole.
+    Readers keep seeing the previous guide until the transaction commits.
+    Returns the number of programmes stored and the longest duration seen.
+    """
+    session = get_session()
+    try:
+        session.execute(delete(Programme).where(Programme.source == source))
+        count = max_duration = 0
+        for batch in batches:
+            if not batch:
+                continue
+            session.execute(insert(Programme), batch)
+            count += len(batch)
+            max_duration = max(
+                max_duration, *(row["stop"] - row["start"] for row in batch)
+            )
+        session.commit()
+        return count, max_duration
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_epg_source(url: str) -> Optional[EpgSource]:
+    """Return stored HTTP validators for an XMLTV guide URL."""
+    session = get_session()
+    try:
+        return session.get(EpgSource, url)
+    finally:
+        session.close()
+
+
+def save_epg_source(
+    url: str, etag: str | None, last_modified: str | None, max_duration: int
+) -> None:
+    """Record validators and the longest programme of the applied guide."""
+    session = get_session()
+    try:
+        source = session.get(EpgSource, url) or EpgSource(url=url)
+        source.etag = etag
+        source.last_modified = last_modified
+        source.max_duration = max_duration
+        source.refreshed_at = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        session.add(source)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _programme_columns():
+    """Return the programme columns exposed by guide queries."""
+    return (
+        Programme.channel,
+        Programme.start,
+        Programme.stop,
+        Programme.title,
+        Programme.description,
+        Programme.category,
+    )
+
+
+def list_programmes_airing(at: int) -> list[dict]:
+    """Return programmes running at epoch second ``at`` on every channel.
+
+    The ``start`` index bounds the scan to programmes that began within the
+    longest known programme duration, instead of every past programme.
+    """
+    session = get_session()
+    try:
+        window = session.scalar(select(func.max(EpgSource.max_duration))) or 86400
+        stmt = (
+            select(*_programme_columns())
+            .where(Programme.start > at - window - 1)
+            .where(Programme.start <= at)
+            .where(Programme.stop > at)
+            .order_by(Programme.channel)
+        )
+        return [dict(row._mapping) for row in session.execute(stmt)]
+    finally:
+        session.close()
+
+
+def list_channel_programmes(channel: str, start: int, stop: int) -> list[dict]:
+    """Return programmes on ``channel`` overlapping ``[start, stop)``."""
+    session = get_session()
+    try:
+        window = session.scalar(select(func.max(EpgSource.max_duration))) or 86400
+        stmt = (
+            select(*_programme_columns())
+            .where(Programme.channel == channel)
+            .where(Programme.start > start - window - 1)
+            .where(Programme.start < stop)
+            .where(Programme.stop > start)
+            .order_by(Programme.start)
+        )
+        return [dict(row._mapping) for row in session.execute(stmt)]
+    finally:
+        session.close()
+
+
+def media_ids_by_tvg_id(tvg_ids: Iterable[str]) -> dict[str, list[int]]:
+    """Map XMLTV channel ids to the ids of media items carrying them."""
+    wanted = list(set(tvg_ids))
+    mapping: dict[str, list[int]] = {}
+    session = get_session()
+    try:
+        for start in range(0, len(wanted), 500):
+            stmt = select(MediaItem.tvg_id, MediaItem.id).where(
+                MediaItem.tvg_id.in_(wanted[start : start + 500])
+            )
+            for tvg_id, item_id in session.execute(stmt):
+                mapping.setdefault(tvg_id, []).append(item_id)
+        return mapping
+    finally:
+        session.close()
+
+
+# Channel health -------------------------------------------------------------
+
+
+def list_remote_media_page(after_id: int, limit: int) -> list[tuple[int, str]]:
+    """Return ``(id, path)`` of remote items with ``id > after_id`` in id order."""
+    session = get_session()
+    try:
+        stmt = (
+            select(MediaItem.id, MediaItem.path)
+            .where(MediaItem.id > after_id)
+            .where(
+                or_(MediaItem.path.like("http://%"), MediaItem.path.like("https://%"))
+            )
+            .order_by(MediaItem.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in session.execute(stmt)]
+    finally:
+        session.close()
+
+
+def save_channel_health(rows: list[dict]) -> None:
+    """Insert or replace probe results keyed by ``media_item_id``."""
+    if not rows:
+        return
+    session = get_session()
+    try:
+        stmt = _dialect_insert(ChannelHealth)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ChannelHealth.media_item_id],
+            set_={
+                "status": stmt.excluded.status,
+                "http_status": stmt.excluded.http_status,
+                "latency_ms": stmt.excluded.latency_ms,
+                "checked_at": stmt.excluded.checked_at,
+            },
+        )
+        session.execute(stmt, rows)
+        session.commit()
+        cache.invalidate_listings()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def list_channel_health(status: str | None = None) -> list[dict]:
+    """Return probe results joined with media titles, optionally by status."""
+    session = get_session()
+    try:
+        stmt = (
+            select(
+                ChannelHealth.media_item_id,
+                MediaItem.title,
+                ChannelHealth.status,
+                ChannelHealth.http_status,
+                ChannelHealth.latency_ms,
+                ChannelHealth.checked_at,
+            )
+            .join(MediaItem, MediaItem.id == ChannelHealth.media_item_id)
+            .order_by(ChannelHealth.media_item_id)
+        )
+        if status is not None:
+            stmt = stmt.where(ChannelHealth.status == status)
+        return [dict(row._mapping) for row in session.execute(stmt)]
+    finally:
+        session.close()
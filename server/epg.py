@@ -0,0 +1,247 @@
+"""XMLTV programme guide ingestion with incremental parsing."""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import tempfile
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any
+from xml.etree.ElementTree import XMLPullParser
+
+import httpx
+
+from . import db
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+EPG_URLS: list[str] = list(CONFIG.get("server", {}).get("epg", []) or [])
+BATCH_SIZE = 2000
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def parse_xmltv_time(value: str) -> int:
+    """Convert an XMLTV timestamp such as ``20240101120000 +0100`` to epoch UTC.
+
+    Seconds, minutes, and the offset are optional in the format; a missing
+    offset is interpreted as UTC.
+    """
+
+    stamp, _, offset = value.strip().partition(" ")
+    stamp = stamp.ljust(14, "0")[:14]
+    moment = datetime.datetime.strptime(stamp, "%Y%m%d%H%M%S")
+    if offset:
+        moment = datetime.datetime.strptime(f"{stamp} {offset}", "%Y%m%d%H%M%S %z")
+    else:
+        moment = moment.replace(tzinfo=datetime.UTC)
+    return int(moment.timestamp())
+
+
+def _decompressed(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield ``chunks`` inflated on the fly when they carry a gzip header."""
+
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            if not chunk:
+                continue
+            compressed = chunk[:2] == _GZIP_MAGIC
+            decompressor = zlib.decompressobj(wbits=31) if compressed else False
+        yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        yield decompressor.flush()
+        if not decompressor.eof:
+            raise zlib.error("truncated gzip stream")
+
+
+def _time(value: str | None) -> int | None:
+    """Parse an XMLTV timestamp, returning ``None`` when it is invalid."""
+
+    try:
+        return parse_xmltv_time(value or "")
+    except ValueError:
+        return None
+
+
+def _text(element, tag: str) -> str | None:
+    """Return the stripped text of the first ``tag`` child, if any."""
+
+    child = element.find(tag)
+    if child is None or child.text is None:
+        return None
+    return child.text.strip() or None
+
+
+def iter_programmes(chunks: Iterable[bytes], source: str) -> Iterator[dict[str, Any]]:
+    """Parse XMLTV bytes incrementally and yield ``Programme`` row dictionaries.
+
+    Elements are discarded as soon as they have been converted, so memory use
+    stays constant regardless of the guide size. Programmes with unparsable
+    timestamps or without a title are skipped. ``stop`` is optional in
+    XMLTV; a programme without one ends when the next programme on its
+    channel starts, and is dropped when no later programme follows.
+    """
+
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    # Per channel, the last programme still waiting for its end time.
+    open_ended: dict[str, dict[str, Any]] = {}
+    for data in _decompressed(chunks):
+        parser.feed(data)
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            if element.tag == "programme":
+                title = _text(element, "title")
+                channel = element.get("channel")
+                start = _time(element.get("start"))
+                stop_value = element.get("stop")
+                stop = _time(stop_value) if stop_value else None
+                malformed = start is None or (stop_value and stop is None)
+                if title and channel and not malformed:
+                    previous = open_ended.pop(channel, None)
+                    if previous is not None and start > previous["start"]:
+                        yield {**previous, "stop": start}
+                    row = {
+                        "source": source,
+                        "channel": channel,
+                        "start": start,
+                        "stop": stop,
+                        "title": title,
+                        "description": _text(element, "desc"),
+                        "category": _text(element, "category"),
+                    }
+                    if stop is None:
+                        open_ended[channel] = row
+                    elif stop > start:
+                        yield row
+            if element.tag in {"programme", "channel"} and root is not None:
+                root.clear()
+    parser.close()
+
+
+def _batched(rows: Iterator[dict[str, Any]], size: int) -> Iterator[list[dict]]:
+    """Group ``rows`` into lists of at most ``size`` items."""
+
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_guide(
+    url: str, client: httpx.Client, force: bool = False
+) -> dict[str, int | str]:
+    """Download ``url`` and replace its programmes when the guide changed.
+
+    Download, decompression and parsing are pipelined over one streamed
+    response into a temporary file. Only once the whole guide has been
+    parsed are the stored programmes replaced, so the write transaction
+    never waits on the network. This runs synchronously and is meant to be
+    called on a worker thread.
+    """
+
+    headers: dict[str, str] = {}
+    source = None if force else db.get_epg_source(url)
+    if source is not None:
+        if source.etag:
+            headers["If-None-Match"] = source.etag
+        if source.last_modified:
+            headers["If-Modified-Since"] = source.last_modified
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as staged:
+        with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                LOGGER.info("Guide %s unchanged", url)
+                return {"status": "unchanged"}
+            response.raise_for_status()
+            for row in iter_programmes(response.iter_bytes(), url):
+                staged.write(json.dumps(row, separators=(",", ":")))
+                staged.write("\n")
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+        staged.seek(0)
+        rows = (json.loads(line) for line in staged)
+        count, max_duration = db.replace_programmes(url, _batched(rows, BATCH_SIZE))
+    db.save_epg_source(url, etag, last_modified, max_duration)
+    LOGGER.info("Guide %s: %d programmes", url, count)
+    return {"status": "refreshed", "programmes": count}
+
+
+def refresh_configured_guides(
+    urls: Iterable[str] | None = None, force: bool = False
+) -> dict[str, dict[str, int | str]]:
+    """Ingest every guide listed under ``server.epg`` and report per URL."""
+
+    results: dict[str, dict[str, int | str]] = {}
+    with httpx.Client(timeout=60, follow_redirects=True) as client:
+        for url in EPG_URLS if urls is None else urls:
+            try:
+                results[url] = ingest_guide(url, client, force=force)
+            except (httpx.HTTPError, SyntaxError, zlib.error) as exc:
+                LOGGER.error("Guide %s failed: %s", url, exc)
+                results[url] = {"error": str(exc)}
+    return results
+
+
+def _serialize(row: dict[str, Any], item_ids: dict[str, list[int]]) -> dict:
+    """Render a programme row with ISO timestamps and linked media item ids."""
+
+    return {
+        **row,
+        "start": _iso(row["start"]),
+        "stop": _iso(row["stop"]),
+        "item_ids": item_ids.get(row["channel"], []),
+    }
+
+
+def _iso(epoch: int) -> str:
+    """Format epoch seconds as an ISO 8601 UTC timestamp."""
+
+    return datetime.datetime.fromtimestamp(epoch, datetime.UTC).isoformat()
+
+
+def _epoch(moment: datetime.datetime) -> int:
+    """Return epoch seconds for ``moment``, treating naive values as UTC."""
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.UTC)
+    return int(moment.timestamp())
+
+
+def programmes_now(at: datetime.datetime | None = None) -> list[dict]:
+    """Return programmes airing at ``at`` (default: now) on every channel."""
+
+    moment = at or datetime.datetime.now(datetime.UTC)
+    rows = db.list_programmes_airing(_epoch(moment))
+    item_ids = db.media_ids_by_tvg_id(row["channel"] for row in rows)
+    return [_serialize(row, item_ids) for row in rows]
+
+
+def channel_programmes(
+    channel: str,
+    start: datetime.datetime | None = None,
+    stop: datetime.datetime | None = None,
+) -> list[dict]:
+    """Return programmes on ``channel`` overlapping ``[start, stop)``.
+
+    The window defaults to the 24 hours following ``start`` (default: now).
+    Raises ``ValueError`` when ``stop`` is not after ``start``.
+    """
+
+    begin = _epoch(start or datetime.datetime.now(datetime.UTC))
+    end = _epoch(stop) if stop is not None else begin + 86400
+    if end <= begin:
+        raise ValueError("'to' must be after 'from'")
+    rows = db.list_channel_programmes(channel, begin, end)
+    item_ids = db.media_ids_by_tvg_id([channel]) if rows else {}
+    return [_serialize(row, item_ids) for row in rows]
@@ -0,0 +1,108 @@
+"""Common interface for services refreshed by ``POST /metadata/sync``.
+
+Each integration module registers an :class:`Integration` naming its refresh
+coroutine. :func:`sync_all` runs every registered refresh concurrently, each
+under its own deadline, so the sync takes as long as the slowest service
+rather than the sum of all of them. A failing or slow service no longer
+prevents the others from being refreshed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from .clients import INTEGRATIONS_CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+SYNC_TIMEOUT = float(INTEGRATIONS_CONFIG.get("sync_timeout", 30))
+SYNC_TIMEOUTS: dict[str, float] = {
+    name: float(seconds)
+    for name, seconds in (INTEGRATIONS_CONFIG.get("sync_timeouts") or {}).items()
+}
+
+
+@dataclass(frozen=True)
+class Integration:
+    """An external service that ``/metadata/sync`` asks to refresh.
+
+    ``timeout`` defaults to ``server.integrations.sync_timeouts[name]`` or,
+    failing that, ``server.integrations.sync_timeout``.
+    """
+
+    name: str
+    refresh: Callable[[], Awaitable[Any]]
+    timeout: float | None = None
+
+    @property
+    def sync_timeout(self) -> float:
+        if self.timeout is not None:
+            return self.timeout
+        return SYNC_TIMEOUTS.get(self.name, SYNC_TIMEOUT)
+
+
+REGISTRY: dict[str, Integration] = {}
+
+
+def register(integration: Integration) -> Integration:
+    """Add ``integration`` to the services refreshed by a sync."""
+
+    REGISTRY[integration.name] = integration
+    return integration
+
+
+async def _sync_one(integration: Integration) -> dict[str, Any]:
+    """Refresh one service and describe the outcome."""
+
+    timeout = integration.sync_timeout
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(integration.refresh(), timeout)
+    except asyncio.TimeoutError:
+        result = {"status": "timeout", "detail": f"No response within {timeout:g}s"}
+    except httpx.HTTPError as exc:
+        result = {"status": "error", "detail": str(exc)}
+    except Exception as exc:
+        LOGGER.exception("Refreshing %s failed", integration.name)
+        result = {"status": "error", "detail": str(exc)}
+    else:
+        result = {"status": "ok"}
+    result["duration_ms"] = int((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def sync_all(
+    integrations: list[Integration] | None = None,
+) -> dict[str, Any]:
+    """Refresh ``integrations`` (default: all registered) concurrently.
+
+    ``status`` is ``"synchronized"`` when every service succeeded, ``"failed"``
+    when none did and ``"partial"`` otherwise. ``services`` maps each name to
+    its own ``status`` (``ok``, ``error`` or ``timeout``), ``duration_ms`` and,
+    on failure, ``detail``.
+    """
+
+    if integrations is None:
+        integrations = list(REGISTRY.values())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_sync_one(item) for item in integrations))
+    services = {item.name: result for item, result in zip(integrations, results)}
+    succeeded = sum(result["status"] == "ok" for result in results)
+    if succeeded == len(results):
+        status = "synchronized"
+    elif succeeded:
+        status = "partial"
+    else:
+        status = "failed"
+    return {
+        "status": status,
+        "duration_ms": int((time.perf_counter() - started) * 1000),
+        "services": services,
+    }
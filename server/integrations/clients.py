@@ -0,0 +1,159 @@
+"""Pooled HTTP clients shared by the Sonarr and Radarr integrations.
+
+The app lifespan opens one :class:`httpx.AsyncClient` per integration, so
+health pings and refresh commands reuse kept-alive connections instead of
+paying TCP (and TLS) setup on every call. Pool limits, timeouts and HTTP/2
+come from ``server.integrations``. Each client counts the requests it sends
+and the connections it had to open; the difference is the number of reused
+connections reported by ``GET /health/metrics``.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import httpx
+
+from ..config import CONFIG
+
+try:
+    import h2
+except ImportError:  # pragma: no cover - optional dependency
+    h2 = None
+
+LOGGER = logging.getLogger(__name__)
+
+INTEGRATIONS_CONFIG: dict[str, Any] = (
+    CONFIG.get("server", {}).get("integrations", {}) or {}
+)
+_TIMEOUT_CONFIG: dict[str, Any] = INTEGRATIONS_CONFIG.get("timeout", {}) or {}
+TIMEOUT = httpx.Timeout(
+    float(_TIMEOUT_CONFIG.get("read", 10)),
+    connect=float(_TIMEOUT_CONFIG.get("connect", 2)),
+    pool=float(_TIMEOUT_CONFIG.get("pool", 5)),
+)
+# Deadline for the status requests made by /metadata/ping.
+PING_TIMEOUT = float(INTEGRATIONS_CONFIG.get("ping_timeout", 2))
+LIMITS = httpx.Limits(
+    max_connections=int(INTEGRATIONS_CONFIG.get("max_connections", 10)),
+    max_keepalive_connections=int(
+        INTEGRATIONS_CONFIG.get("max_keepalive_connections", 5)
+    ),
+    keepalive_expiry=float(INTEGRATIONS_CONFIG.get("keepalive_expiry", 30)),
+)
+HTTP2 = bool(INTEGRATIONS_CONFIG.get("http2", False))
+NAMES = ("sonarr", "radarr")
+
+
+class ConnectionStats:
+    """Requests sent and connections opened by one integration client."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.http2_responses = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_response(self, response: httpx.Response) -> None:
+        if response.http_version == "HTTP/2":
+            self.http2_responses += 1
+
+    async def trace(self, event: str, info: dict[str, Any]) -> None:
+        """Count connection setups reported by httpcore."""
+
+        if event == "connection.connect_tcp.complete":
+            self.connections += 1
+        elif event == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        reused = max(0, self.requests - self.connections)
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reused": reused,
+            "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+            "http2_responses": self.http2_responses,
+        }
+
+
+CLIENTS: dict[str, httpx.AsyncClient] = {}
+STATS: dict[str, ConnectionStats] = {}
+
+
+def create_client(
+    name: str,
+    *,
+    http2: bool = HTTP2,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncClient:
+    """Return a pooled client for ``name`` whose traffic is counted in ``STATS``."""
+
+    if http2 and h2 is None:
+        raise RuntimeError(
+            "server.integrations.http2 needs the h2 package; "
+            "run `pip install httpx[http2]`"
+        )
+    stats = STATS.setdefault(name, ConnectionStats())
+    return httpx.AsyncClient(
+        timeout=TIMEOUT,
+        limits=LIMITS,
+        http2=http2,
+        transport=transport,
+        event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+    )
+
+
+async def open_clients(names: tuple[str, ...] = NAMES) -> None:
+    """Create the shared client of every integration in ``names``."""
+
+    for name in names:
+        if name not in CLIENTS:
+            CLIENTS[name] = create_client(name)
+    LOGGER.info(
+        "Integration clients ready: %s (max %d connections, http2=%s)",
+        ", ".join(names),
+        LIMITS.max_connections,
+        HTTP2,
+    )
+
+
+async def close_clients() -> None:
+    """Close every shared client and drop its idle connections."""
+
+    while CLIENTS:
+        _, client = CLIENTS.popitem()
+        await client.aclose()
+
+
+@asynccontextmanager
+async def client_for(
+    name: str, client: httpx.AsyncClient | None = None
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield ``client``, the shared client for ``name``, or a one-off client.
+
+    The one-off client only happens outside the app lifespan, for example in
+    scripts, and is closed on exit.
+    """
+
+    if client is None:
+        client = CLIENTS.get(name)
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=TIMEOUT) as one_off:
+        yield one_off
+
+
+def client_stats() -> dict[str, dict[str, Any]]:
+    """Return connection reuse counters for every integration client."""
+
+    return {name: stats.as_dict() for name, stats in STATS.items()}
@@ -8,6 +8,9 @@ import os
 import httpx
 from httpx import RequestError
 
+from .base import Integration, register
+from .clients import client_for
+
 RADARR_URL = os.environ.get("RADARR_URL", "http://localhost:7878")
 RADARR_API_KEY = os.environ.get("RADARR_API_KEY", "")
 
@@ -46,23 +49,22 @@ def refresh_movies() -> None:
 async def async_refresh_movies(
     client: httpx.AsyncClient | None = None,
 ) -> None:
-    """Trigger a Radarr refresh command without blocking the event loop."""
+    """Trigger a Radarr refresh command without blocking the event loop.
+
+    Uses ``client`` when given, otherwise the shared Radarr client.
+    """
 
     url = f"{RADARR_URL}/api/v3/command"
     payload = {"name": "RefreshMovie"}
     headers = _headers()
 
     try:
-        if client is None:
-            async with httpx.AsyncClient() as async_client:
-                response = await async_client.post(
-                    url, json=payload, headers=headers, timeout=10
-                )
-        else:
-            response = await client.post(
-                url, json=payload, headers=headers, timeout=10
-            )
+        async with client_for("radarr", client) as async_client:
+            response = await async_client.post(url, json=payload, headers=headers)
         response.raise_for_status()
     except RequestError as exc:
         logging.getLogger(__name__).error("Radarr request failed: %s", exc)
         raise
+
+
+INTEGRATION = register(Integration("radarr", async_refresh_movies))
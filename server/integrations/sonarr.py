@@ -8,6 +8,9 @@ import os
 import httpx
 from httpx import RequestError
 
+from .base import Integration, register
+from .clients import client_for
+
 SONARR_URL = os.environ.get("SONARR_URL", "http://localhost:8989")
 SONARR_API_KEY = os.environ.get("SONARR_API_KEY", "")
 
@@ -46,23 +49,22 @@ def refresh_series() -> None:
 async def async_refresh_series(
     client: httpx.AsyncClient | None = None,
 ) -> None:
-    """Trigger a Sonarr refresh command without blocking the event loop."""
+    """Trigger a Sonarr refresh command without blocking the event loop.
+
+    Uses ``client`` when given, otherwise the shared Sonarr client.
+    """
 
     url = f"{SONARR_URL}/api/v3/command"
     payload = {"name": "RefreshSeries"}
     headers = _headers()
 
     try:
-        if client is None:
-            async with httpx.AsyncClient() as async_client:
-                response = await async_client.post(
-                    url, json=payload, headers=headers, timeout=10
-                )
-        else:
-            response = await client.post(
-                url, json=payload, headers=headers, timeout=10
-            )
+        async with client_for("sonarr", client) as async_client:
+            response = await async_client.post(url, json=payload, headers=headers)
         response.raise_for_status()
     except RequestError as exc:
         logging.getLogger(__name__).error("Sonarr request failed: %s", exc)
         raise
+
+
+INTEGRATION = register(Integration("sonarr", async_refresh_series))
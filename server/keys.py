@@ -0,0 +1,228 @@
+"""JWT signing and verification keys.
+
+By default tokens are signed with HS256 and the shared ``jwt_secret``. With
+``server.jwt.algorithm`` set to ``EdDSA`` or ``RS256`` they are signed with
+private keys instead:
+
+* ``server.jwt.keys`` lists ``{kid, path}`` PEM files, newest first. The first
+  entry signs new tokens and its ``kid`` goes in the token header. Later
+  entries (private or public PEMs) still verify tokens issued before a
+  rotation until they expire.
+* ``GET /auth/jwks`` publishes the public half of every configured key.
+* Nodes that only verify set ``server.jwt.jwks_url`` instead of holding keys.
+  They fetch that JWKS once, cache it in-process for ``jwks_cache_seconds``,
+  and refetch early when a token names an unknown ``kid``, at most once per
+  ``jwks_cache_seconds`` so forged ``kid`` values cannot flood the issuer.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import jwt
+
+from .config import CONFIG, resolve_jwt_secret
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+    from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+except ImportError:  # pragma: no cover - optional dependency
+    serialization = None
+
+JWT_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("jwt", {}) or {}
+ALGORITHM = os.environ.get("SHAMASH_JWT_ALGORITHM") or JWT_CONFIG.get(
+    "algorithm", "HS256"
+)
+JWKS_URL = os.environ.get("SHAMASH_JWKS_URL") or JWT_CONFIG.get("jwks_url") or None
+JWKS_CACHE_SECONDS = float(JWT_CONFIG.get("jwks_cache_seconds", 300))
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "RS256")
+
+
+def _require_crypto() -> None:
+    if serialization is None:
+        raise RuntimeError(
+            "Asymmetric JWT signing needs the cryptography package; "
+            "run `pip install PyJWT[crypto]`"
+        )
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """One key of the ring; ``private_key`` is ``None`` for verify-only keys."""
+
+    kid: str
+    private_key: Any
+    public_key: Any
+
+
+def load_key(kid: str, path: str | Path) -> SigningKey:
+    """Load a private or public PEM file as the key ``kid``."""
+
+    _require_crypto()
+    pem = Path(path).read_bytes()
+    if b"PRIVATE KEY" in pem:
+        private_key = serialization.load_pem_private_key(pem, password=None)
+        return SigningKey(kid, private_key, private_key.public_key())
+    return SigningKey(kid, None, serialization.load_pem_public_key(pem))
+
+
+def generate_private_key_pem(algorithm: str) -> bytes:
+    """Return a new unencrypted PKCS#8 private key for ``algorithm``."""
+
+    _require_crypto()
+    if algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "RS256":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        raise ValueError(f"Cannot generate keys for {algorithm}")
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+class KeyRing:
+    """Sign and verify tokens with the configured algorithm and keys."""
+
+    def __init__(
+        self,
+        algorithm: str = "HS256",
+        keys: list[SigningKey] | None = None,
+        secret: str | None = None,
+        jwks_url: str | None = None,
+        jwks_cache_seconds: float = JWKS_CACHE_SECONDS,
+    ) -> None:
+        if algorithm != "HS256" and algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        if algorithm != "HS256":
+            _require_crypto()
+        self.algorithm = algorithm
+        self.keys = {key.kid: key for key in keys or ()}
+        self.secret = secret
+        self._signing = next(
+            (key for key in keys or () if key.private_key is not None), None
+        )
+        self._jwks_client = (
+            jwt.PyJWKClient(jwks_url, lifespan=jwks_cache_seconds, timeout=5)
+            if jwks_url
+            else None
+        )
+        self._jwks_cache_seconds = jwks_cache_seconds
+        self._jwks_refetch_after = 0.0
+        self._jwks_lock = threading.Lock()
+
+    @property
+    def symmetric(self) -> bool:
+        """Whether tokens are signed with the shared secret."""
+
+        return self.algorithm == "HS256"
+
+    def encode(self, payload: dict[str, Any]) -> str:
+        """Sign ``payload`` with the current signing key."""
+
+        if self.symmetric:
+            return jwt.encode(payload, self.secret, algorithm=self.algorithm)
+        if self._signing is None:
+            raise RuntimeError(
+                "No private key configured under server.jwt.keys; "
+                "this node can verify tokens but not issue them"
+            )
+        return jwt.encode(
+            payload,
+            self._signing.private_key,
+            algorithm=self.algorithm,
+            headers={"kid": self._signing.kid},
+        )
+
+    def _verification_key(self, token: str) -> Any:
+        """Return the key that should have signed ``token``."""
+
+        if self.symmetric:
+            return self.secret
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.keys.get(kid)
+        if key is not None:
+            return key.public_key
+        if self._jwks_client is not None and kid is not None:
+            key = self._published_key(kid)
+            if key is not None:
+                return key
+        raise jwt.InvalidTokenError(f"Unknown signing key {kid!r}")
+
+    def _published_key(self, kid: str) -> Any | None:
+        """Look ``kid`` up in the JWKS, refetching it early at most once per TTL.
+
+        Unknown ids within that window are rejected from the cached set, so
+        tokens with made-up ``kid`` headers cost no request to the issuer.
+        """
+
+        key = _find_jwk(self._jwks_client.get_jwk_set(), kid)
+        if key is not None:
+            return key
+        with self._jwks_lock:
+            now = time.monotonic()
+            if now < self._jwks_refetch_after:
+                return None
+            self._jwks_refetch_after = now + self._jwks_cache_seconds
+        return _find_jwk(self._jwks_client.get_jwk_set(refresh=True), kid)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        """Verify ``token`` and return its payload.
+
+        Raises :class:`jwt.PyJWTError` for invalid tokens or unknown keys.
+        """
+
+        return jwt.decode(
+            token, self._verification_key(token), algorithms=[self.algorithm]
+        )
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        """Return the public keys as a JWK Set (empty for HS256)."""
+
+        if self.symmetric:
+            return {"keys": []}
+        to_jwk = (OKPAlgorithm if self.algorithm == "EdDSA" else RSAAlgorithm).to_jwk
+        return {
+            "keys": [
+                {
+                    **to_jwk(key.public_key, as_dict=True),
+                    "kid": key.kid,
+                    "alg": self.algorithm,
+                    "use": "sig",
+                }
+                for key in self.keys.values()
+            ]
+        }
+
+
+def _find_jwk(jwk_set: jwt.PyJWKSet, kid: str) -> Any | None:
+    """Return the verification key published as ``kid``, if any."""
+
+    for jwk in jwk_set.keys:
+        if jwk.key_id == kid:
+            return jwk.key
+    return None
+
+
+def load_keyring() -> KeyRing:
+    """Build the key ring described by ``server.jwt`` and the environment."""
+
+    keys = [
+        load_key(str(entry["kid"]), entry["path"])
+        for entry in JWT_CONFIG.get("keys") or ()
+    ]
+    return KeyRing(
+        ALGORITHM,
+        keys,
+        secret=resolve_jwt_secret(),
+        jwks_url=JWKS_URL,
+        jwks_cache_seconds=JWKS_CACHE_SECONDS,
+    )
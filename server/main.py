@@ -1,15 +1,27 @@
 """Entry point for the Shamash FastAPI server."""
 
 import argparse
+import os
+from pathlib import Path
 
 import uvicorn
 
 from .app import app
+from .keys import generate_private_key_pem
+from .migrations import migrate
 
 
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments for server configuration."""
     parser = argparse.ArgumentParser(description="Start the Shamash API server.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["serve", "migrate", "keygen"],
+        default="serve",
+        help="serve the API (default), apply pending schema migrations, "
+        "or write a new JWT signing key to --out",
+    )
     parser.add_argument(
         "--host",
         default="0.0.0.0",
@@ -21,12 +33,34 @@ def parse_args() -> argparse.Namespace:
         default=8000,
         help="Port to listen on (default: 8000)",
     )
+    parser.add_argument(
+        "--algorithm",
+        choices=["EdDSA", "RS256"],
+        default="EdDSA",
+        help="keygen: algorithm of the new signing key (default: EdDSA)",
+    )
+    parser.add_argument("--out", type=Path, help="keygen: PEM file to create")
     return parser.parse_args()
 
 
 def main() -> None:
-    """Run the FastAPI application with uvicorn."""
+    """Run the FastAPI application with uvicorn, or migrate the database."""
     args = parse_args()
+    if args.command == "migrate":
+        applied = migrate()
+        if applied:
+            print(f"Applied migrations: {', '.join(map(str, applied))}")
+        else:
+            print("Database schema is up to date")
+        return
+    if args.command == "keygen":
+        if args.out is None:
+            raise SystemExit("keygen requires --out")
+        fd = os.open(args.out, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(generate_private_key_pem(args.algorithm))
+        print(f"Wrote {args.algorithm} signing key to {args.out}")
+        return
     uvicorn.run(app, host=args.host, port=args.port)
 
 
@@ -0,0 +1,324 @@
+"""Versioned schema migrations for the Shamash database.
+
+Migrations run in order, each in its own transaction, and the applied
+versions are recorded in the ``schema_version`` table. They are applied by the
+explicit ``python -m server.main migrate`` step rather than on import, so
+starting the API (or several uvicorn workers) never touches the schema.
+
+To change the schema, append a :class:`Migration` with the next version
+number. Migration 1 creates the tables as they stood when versioning was
+introduced, frozen in ``BASELINE`` rather than read from the models, so every
+database reaches the current schema through the same steps. Later migrations
+should still tolerate objects that already exist (use ``IF NOT EXISTS`` DDL or
+:func:`_add_column`), since unversioned databases may have created them on
+import.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Engine,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection
+
+from . import db
+from .models import RefreshToken, RevokedToken
+
+LOGGER = logging.getLogger(__name__)
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One schema change identified by a monotonically increasing version."""
+
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """Add ``column`` to ``table`` unless it already exists."""
+
+    existing = {info["name"] for info in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# The schema created by migration 1. Do not edit: change the models and add a
+# migration instead.
+BASELINE = MetaData()
+Table(
+    "users",
+    BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("username", String, unique=True, nullable=False),
+    Column("password_hash", String, nullable=False),
+    Column("role", String, nullable=False),
+)
+Table(
+    "media_items",
+    BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("path", Text, nullable=False),
+    Column("description", Text),
+    Column("tvg_id", String),
+    Column("group_title", String),
+    Column("logo", Text),
+    Column("source", Text),
+)
+Table(
+    "playlist_sources",
+    BASELINE,
+    Column("url", Text, primary_key=True),
+    Column("etag", String),
+    Column("last_modified", String),
+    Column("refreshed_at", DateTime),
+)
+Table(
+    "epg_sources",
+    BASELINE,
+    Column("url", Text, primary_key=True),
+    Column("etag", String),
+    Column("last_modified", String),
+    Column("refreshed_at", DateTime),
+    Column("max_duration", Integer, nullable=False),
+)
+Table(
+    "programmes",
+    BASELINE,
+    Column("id", Integer, primary_key=True),
+    Column("source", Text, nullable=False),
+    Column("channel", String, nullable=False),
+    Column("start", Integer, nullable=False),
+    Column("stop", Integer, nullable=False),
+    Column("title", String, nullable=False),
+    Column("description", Text),
+    Column("category", String),
+    Index("ix_programmes_channel_start", "channel", "start"),
+    Index("ix_programmes_start", "start"),
+)
+Table(
+    "channel_health",
+    BASELINE,
+    Column("media_item_id", Integer, primary_key=True),
+    Column("status", String, nullable=False),
+    Column("http_status", Integer),
+    Column("latency_ms", Integer),
+    Column("checked_at", DateTime, nullable=False),
+)
+
+
+def _baseline(conn: Connection) -> None:
+    """Create missing tables and backfill columns added before versioning."""
+
+    BASELINE.create_all(conn, checkfirst=True)
+    _add_column(conn, "users", "role", "VARCHAR NOT NULL DEFAULT 'user'")
+    for column, ddl in (
+        ("tvg_id", "VARCHAR"),
+        ("group_title", "VARCHAR"),
+        ("logo", "TEXT"),
+        ("source", "TEXT"),
+    ):
+        _add_column(conn, "media_items", column, ddl)
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_media_items_tvg_id ON media_items (tvg_id)")
+    )
+
+
+# External-content FTS5 index over media titles and descriptions. The triggers
+# keep it in step with every write path, including bulk executemany inserts.
+MEDIA_SEARCH_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS media_items_fts USING fts5(
+        title, description,
+        content='media_items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS media_items_fts_insert
+    AFTER INSERT ON media_items BEGIN
+        INSERT INTO media_items_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_items_fts_delete
+    AFTER DELETE ON media_items BEGIN
+        INSERT INTO media_items_fts(media_items_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS media_items_fts_update
+    AFTER UPDATE OF title, description ON media_items BEGIN
+        INSERT INTO media_items_fts(media_items_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO media_items_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+)
+
+
+# PostgreSQL keeps the search document in a generated column, so no triggers
+# are needed; title lexemes carry weight A and description lexemes weight B.
+POSTGRES_SEARCH_DDL = (
+    """ALTER TABLE media_items ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_media_items_search
+    ON media_items USING GIN (search_vector)""",
+)
+
+
+def _media_search(conn: Connection) -> None:
+    """Create the full-text index and its triggers, then index existing rows."""
+
+    if conn.dialect.name == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            conn.execute(text(statement))
+        return
+    for statement in MEDIA_SEARCH_DDL:
+        conn.execute(text(statement))
+    conn.execute(
+        text("INSERT INTO media_items_fts(media_items_fts) VALUES ('rebuild')")
+    )
+
+
+def _media_indexes(conn: Connection) -> None:
+    """Deduplicate media paths, then index ``path`` (unique) and ``title``.
+
+    The oldest row per path is kept; health results of removed rows go with
+    them.
+    """
+
+    duplicates = (
+        "SELECT id FROM media_items WHERE id NOT IN "
+        "(SELECT MIN(id) FROM media_items GROUP BY path)"
+    )
+    conn.execute(
+        text(f"DELETE FROM channel_health WHERE media_item_id IN ({duplicates})")
+    )
+    removed = conn.execute(text(f"DELETE FROM media_items WHERE id IN ({duplicates})"))
+    if removed.rowcount:
+        LOGGER.warning("Removed %d media items with duplicate paths", removed.rowcount)
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_media_items_path "
+            "ON media_items (path)"
+        )
+    )
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_media_items_title ON media_items (title)")
+    )
+
+
+def _refresh_tokens(conn: Connection) -> None:
+    """Create the refresh token store with its username and family indexes."""
+
+    RefreshToken.__table__.create(conn, checkfirst=True)
+
+
+def _revoked_tokens(conn: Connection) -> None:
+    """Create the access token revocation list."""
+
+    RevokedToken.__table__.create(conn, checkfirst=True)
+
+
+def _revoked_tokens_index(conn: Connection) -> None:
+    """Index revocations by time for the workers' incremental reads."""
+
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at "
+            "ON revoked_tokens (revoked_at)"
+        )
+    )
+
+
+def _orphaned_health(conn: Connection) -> None:
+    """Delete health results left behind by deleted media items."""
+
+    removed = conn.execute(
+        text(
+            "DELETE FROM channel_health WHERE media_item_id NOT IN "
+            "(SELECT id FROM media_items)"
+        )
+    )
+    if removed.rowcount:
+        LOGGER.warning("Removed %d orphaned channel health rows", removed.rowcount)
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, "Create base tables and backfill legacy columns", _baseline),
+    Migration(2, "Add full-text search over media items", _media_search),
+    Migration(3, "Index media paths (unique) and titles", _media_indexes),
+    Migration(4, "Store refresh tokens for rotation and revocation", _refresh_tokens),
+    Migration(5, "Record revoked access tokens", _revoked_tokens),
+    Migration(6, "Index revoked tokens by revocation time", _revoked_tokens_index),
+    Migration(7, "Remove health results of deleted media items", _orphaned_health),
+)
+
+
+def current_version(conn: Connection) -> int:
+    """Return the highest applied version, or ``0`` for an unversioned database."""
+
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    version = conn.execute(
+        select(schema_version.c.version).order_by(schema_version.c.version.desc())
+    ).scalar()
+    return version or 0
+
+
+def pending_migrations(engine: Engine | None = None) -> list[Migration]:
+    """Return the migrations that have not been applied yet."""
+
+    with (engine or db.engine).connect() as conn:
+        applied = current_version(conn)
+    return [migration for migration in MIGRATIONS if migration.version > applied]
+
+
+def migrate(engine: Engine | None = None) -> list[int]:
+    """Apply every pending migration and return the versions applied."""
+
+    engine = engine or db.engine
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    with engine.begin() as conn:
+        schema_version.create(conn, checkfirst=True)
+    applied: list[int] = []
+    for migration in pending_migrations(engine):
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(
+                schema_version.insert().values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied_at=now,
+                )
+            )
+        LOGGER.info(
+            "Applied migration %d: %s", migration.version, migration.description
+        )
+        applied.append(migration.version)
+    return applied
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -23,8 +23,106 @@ class MediaItem(Base):
     """Local or remote media item."""
 
     __tablename__ = "media_items"
+    __table_args__ = (
+        Index("ux_media_items_path", "path", unique=True),
+        Index("ix_media_items_title", "title"),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
     path = Column(Text, nullable=False)
     description = Column(Text, nullable=True)
+    tvg_id = Column(String, nullable=True, index=True)
+    group_title = Column(String, nullable=True)
+    logo = Column(Text, nullable=True)
+    source = Column(Text, nullable=True)
+
+
+class PlaylistSource(Base):
+    """HTTP validators remembered for an ingested playlist URL."""
+
+    __tablename__ = "playlist_sources"
+
+    url = Column(Text, primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    refreshed_at = Column(DateTime, nullable=True)
+
+
+class EpgSource(Base):
+    """HTTP validators and guide statistics for an ingested XMLTV URL."""
+
+    __tablename__ = "epg_sources"
+
+    url = Column(Text, primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    refreshed_at = Column(DateTime, nullable=True)
+    max_duration = Column(Integer, nullable=False, default=0)
+
+
+class Programme(Base):
+    """Single XMLTV programme with UTC epoch-second bounds."""
+
+    __tablename__ = "programmes"
+    __table_args__ = (
+        Index("ix_programmes_channel_start", "channel", "start"),
+        Index("ix_programmes_start", "start"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source = Column(Text, nullable=False)
+    channel = Column(String, nullable=False)
+    start = Column(Integer, nullable=False)
+    stop = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    category = Column(String, nullable=True)
+
+
+class ChannelHealth(Base):
+    """Latest reachability probe result for a remote media item."""
+
+    __tablename__ = "channel_health"
+
+    media_item_id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False)
+    http_status = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    checked_at = Column(DateTime, nullable=False)
+
+
+class RefreshToken(Base):
+    """Issued refresh token, stored by digest so the token itself never is.
+
+    Tokens rotate: each use replaces the row's token with a new one of the
+    same ``family``. Presenting a replaced or revoked token revokes the family.
+    """
+
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (Index("ix_refresh_tokens_username", "username"),)
+
+    token_hash = Column(String, primary_key=True)
+    username = Column(String, nullable=False)
+    family = Column(String, nullable=False, index=True)
+    issued_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    replaced_by = Column(String, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class RevokedToken(Base):
+    """Revocation of one access token (``jti:<id>``) or a user's (``sub:<name>``).
+
+    A ``sub`` entry revokes every token of that user issued up to
+    ``revoked_at``. Workers read rows incrementally by ``revoked_at``, with an
+    overlap for late commits. Rows may be purged once ``expires_at`` has
+    passed, since the tokens they cover have expired by then.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,122 @@
+"""Password hashing and verification on a bounded worker pool.
+
+bcrypt is deliberately slow (hundreds of milliseconds per call), so it never
+runs on the event loop or on the database executor. Calls are dispatched to
+:data:`HASH_EXECUTOR` and, once ``workers + max_queue`` calls are in flight,
+further callers are rejected with :class:`HashingPoolBusy` instead of piling
+up behind the pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+import bcrypt
+
+from .config import CONFIG
+
+PASSWORD_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("passwords", {}) or {}
+# bcrypt releases the GIL while hashing, so threads run in parallel.
+HASH_WORKERS = int(PASSWORD_CONFIG.get("workers", min(4, os.cpu_count() or 1)))
+MAX_QUEUE = int(PASSWORD_CONFIG.get("max_queue", 16))
+RETRY_AFTER = int(PASSWORD_CONFIG.get("retry_after", 1))
+
+HASH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=HASH_WORKERS, thread_name_prefix="shamash-bcrypt"
+)
+
+T = TypeVar("T")
+
+
+class HashingPoolBusy(RuntimeError):
+    """Raised when the hashing pool and its queue are full."""
+
+    def __init__(self, retry_after: int = RETRY_AFTER) -> None:
+        super().__init__("password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class _HashingStats:
+    """Counters and recent latencies of the hashing pool."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latencies: collections.deque[float] = collections.deque(maxlen=512)
+
+    def snapshot(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float | None:
+            if not ordered:
+                return None
+            index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+            return round(ordered[index] * 1000, 2)
+
+        return {
+            "workers": HASH_WORKERS,
+            "max_queue": MAX_QUEUE,
+            "in_flight": self.in_flight,
+            "queue_length": max(0, self.in_flight - HASH_WORKERS),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95)},
+        }
+
+
+_stats = _HashingStats()
+
+
+async def _submit(func: Callable[..., T], *args: Any) -> T:
+    """Run ``func`` on the hashing pool unless its queue is full."""
+
+    if _stats.in_flight >= HASH_WORKERS + MAX_QUEUE:
+        _stats.rejected += 1
+        raise HashingPoolBusy()
+    _stats.in_flight += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(HASH_EXECUTOR, functools.partial(func, *args))
+    finally:
+        _stats.in_flight -= 1
+        _stats.completed += 1
+        _stats.latencies.append(time.perf_counter() - started)
+
+
+def hash_password_blocking(password: str) -> str:
+    """Return the bcrypt hash of ``password`` on the calling thread."""
+
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def _check_blocking(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+
+async def hash_password(password: str) -> str:
+    """Hash ``password`` on the pool; raises :class:`HashingPoolBusy`."""
+
+    return await _submit(hash_password_blocking, password)
+
+
+async def check_password(password: str, password_hash: str) -> bool:
+    """Verify ``password`` on the pool; raises :class:`HashingPoolBusy`."""
+
+    return await _submit(_check_blocking, password, password_hash)
+
+
+def hashing_stats() -> dict[str, Any]:
+    """Return pool size, queue length, rejections and latency percentiles.
+
+    Latencies cover queueing plus hashing for the most recent 512 calls.
+    """
+
+    return _stats.snapshot()
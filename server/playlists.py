@@ -0,0 +1,306 @@
+"""Streaming M3U/M3U8 playlist ingestion for IPTV channel lists."""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import tempfile
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from typing import IO, Any
+
+import anyio
+import httpx
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+PLAYLIST_URLS: list[str] = list(CONFIG.get("server", {}).get("playlists", []) or [])
+BATCH_SIZE = 500
+# Bytes buffered from the response before each write to the download file.
+WRITE_SIZE = 1024 * 1024
+
+_ATTRIBUTE_RE = re.compile(r'([A-Za-z0-9_-]+)="([^"]*)"')
+_DIFF_FIELDS = ("title", "path", "tvg_id", "group_title", "logo")
+
+
+@dataclass
+class PlaylistEntry:
+    """Channel parsed from a ``#EXTINF`` line and the URL that follows it."""
+
+    title: str
+    path: str
+    tvg_id: str | None = None
+    group_title: str | None = None
+    logo: str | None = None
+
+
+def parse_extinf(line: str) -> tuple[dict[str, str], str]:
+    """Split an ``#EXTINF`` line into its attributes and display title.
+
+    The title follows the first comma that is not inside a quoted attribute
+    value, e.g. ``#EXTINF:-1 tvg-id="bbc1" group-title="UK",BBC One``.
+    """
+
+    body = line.partition(":")[2]
+    in_quotes = False
+    for index, char in enumerate(body):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == "," and not in_quotes:
+            header, title = body[:index], body[index + 1 :]
+            break
+    else:
+        header, title = body, ""
+    return dict(_ATTRIBUTE_RE.findall(header)), title.strip()
+
+
+def iter_playlist_entries(lines: Iterable[str]) -> Iterator[PlaylistEntry]:
+    """Yield :class:`PlaylistEntry` objects as playlist lines are read.
+
+    Only the current ``#EXTINF`` header is held in memory, so arbitrarily
+    large playlists are parsed in constant space.
+    """
+
+    attributes: dict[str, str] = {}
+    title: str | None = None
+    group: str | None = None
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF"):
+            attributes, title = parse_extinf(line)
+            group = None
+        elif line.startswith("#EXTGRP:"):
+            group = line.partition(":")[2].strip() or None
+        elif line.startswith("#"):
+            continue
+        elif title is not None:
+            yield PlaylistEntry(
+                title=title or attributes.get("tvg-name") or line,
+                path=line,
+                tvg_id=attributes.get("tvg-id") or None,
+                group_title=attributes.get("group-title") or group,
+                logo=attributes.get("tvg-logo") or None,
+            )
+            attributes, title, group = {}, None, None
+
+
+def _claim(row: dict[str, Any], claimed: set[str]) -> str | None:
+    """Return the identity used to diff ``row`` and add it to ``claimed``.
+
+    The ``tvg-id`` survives provider URL rotations, so it is preferred. Entries
+    without one, or whose ``tvg-id`` was already claimed earlier in the same
+    playlist (SD/HD variants), fall back to their stream URL. Returns ``None``
+    for repeated entries whose URL was claimed as well.
+    """
+
+    tvg_id = row.get("tvg_id")
+    key = f"tvg:{tvg_id}" if tvg_id else f"url:{row['path']}"
+    if key in claimed:
+        key = f"url:{row['path']}"
+        if key in claimed:
+            return None
+    claimed.add(key)
+    return key
+
+
+def _keyed(rows: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Index channels by the identity :func:`_claim` assigns them."""
+
+    keyed: dict[str, dict[str, Any]] = {}
+    claimed: set[str] = set()
+    for row in rows:
+        key = _claim(row, claimed)
+        if key is not None:
+            keyed[key] = row
+    return keyed
+
+
+def diff_channels(
+    existing: dict[str, dict[str, Any]],
+    incoming: Iterable[tuple[str, dict[str, Any]]],
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Compute the inserts and updates for a batch of keyed channels.
+
+    ``existing`` maps identities to stored rows carrying their database
+    ``id``; updates only include rows where at least one playlist-managed
+    column differs.
+    """
+
+    inserts = []
+    updates = []
+    for key, row in incoming:
+        old = existing.get(key)
+        if old is None:
+            inserts.append(row)
+        elif any(old[f] != row[f] for f in _DIFF_FIELDS):
+            updates.append({**row, "id": old["id"]})
+    return inserts, updates
+
+
+def _staged_batches(
+    staged: IO[str], size: int
+) -> Iterator[list[tuple[str, dict[str, Any]]]]:
+    """Read ``(key, row)`` pairs back from ``staged`` in lists of ``size``."""
+
+    staged.seek(0)
+    batch: list[tuple[str, dict[str, Any]]] = []
+    for line in staged:
+        key, row = json.loads(line)
+        batch.append((key, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _download(response: httpx.Response, raw: IO[bytes]) -> None:
+    """Copy the response body into ``raw``, writing on worker threads."""
+
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes():
+        buffer += chunk
+        if len(buffer) >= WRITE_SIZE:
+            await anyio.to_thread.run_sync(raw.write, bytes(buffer))
+            buffer.clear()
+    if buffer:
+        await anyio.to_thread.run_sync(raw.write, bytes(buffer))
+
+
+def _stage(raw: IO[bytes], encoding: str, url: str) -> tuple[IO[str], set[str]]:
+    """Parse the downloaded playlist into a file of ``(key, row)`` lines.
+
+    Returns that file and the set of channel identities it holds. Runs on a
+    worker thread and closes ``raw``.
+    """
+
+    staged = tempfile.TemporaryFile("w+", encoding="utf-8")
+    claimed: set[str] = set()
+    try:
+        raw.seek(0)
+        lines = (line.decode(encoding, "replace") for line in raw)
+        for entry in iter_playlist_entries(lines):
+            row = {**asdict(entry), "source": url}
+            key = _claim(row, claimed)
+            if key is not None:
+                staged.write(json.dumps([key, row], separators=(",", ":")))
+                staged.write("\n")
+    except BaseException:
+        staged.close()
+        raise
+    finally:
+        raw.close()
+    return staged, claimed
+
+
+def _apply_staged(
+    url: str, staged: IO[str], claimed: set[str], batch_size: int
+) -> tuple[int, int, int]:
+    """Diff ``staged`` against the rows stored for ``url`` and write the changes.
+
+    Removed channels are deleted first and every update is applied before any
+    insert, so a channel may take over a URL another one just left. Returns
+    the rows actually inserted, updated and deleted, and closes ``staged``.
+    """
+
+    try:
+        existing = _keyed(db.list_source_media_rows(url))
+        deletes = [row["id"] for key, row in existing.items() if key not in claimed]
+        inserted = updated = deleted = 0
+        if deletes:
+            deleted = db.apply_media_diff([], [], deletes)[2]
+        for batch in _staged_batches(staged, batch_size):
+            _, updates = diff_channels(existing, batch)
+            if updates:
+                updated += db.apply_media_diff([], updates, [])[1]
+        for batch in _staged_batches(staged, batch_size):
+            inserts, _ = diff_channels(existing, batch)
+            if inserts:
+                inserted += db.apply_media_diff(inserts, [], [])[0]
+        return inserted, updated, deleted
+    finally:
+        staged.close()
+
+
+async def refresh_playlist(
+    url: str,
+    client: httpx.AsyncClient,
+    force: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> dict[str, int | str]:
+    """Refresh ``url`` incrementally, applying only changed channels.
+
+    The stored ``ETag``/``Last-Modified`` validators are sent as a conditional
+    request so unchanged playlists are answered with ``304`` and skipped.
+    Otherwise the body is downloaded to a temporary file. A worker thread
+    parses it into a second file, keeping only the channel identities in
+    memory, and the database executor diffs that file against the rows
+    previously ingested from ``url`` in batches of ``batch_size``. The event
+    loop only moves bytes. The reported counts are the rows actually written.
+    """
+
+    headers: dict[str, str] = {}
+    source = None if force else await db.run(db.get_playlist_source, url)
+    if source is not None:
+        if source.etag:
+            headers["If-None-Match"] = source.etag
+        if source.last_modified:
+            headers["If-Modified-Since"] = source.last_modified
+
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            LOGGER.info("Playlist %s unchanged", url)
+            return {"status": "unchanged"}
+        response.raise_for_status()
+        raw = await anyio.to_thread.run_sync(tempfile.TemporaryFile)
+        try:
+            await _download(response, raw)
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(raw.close)
+            raise
+        encoding = response.encoding or "utf-8"
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+
+    staged, claimed = await anyio.to_thread.run_sync(_stage, raw, encoding, url)
+    inserted, updated, deleted = await db.run(
+        _apply_staged, url, staged, claimed, batch_size
+    )
+    await db.run(db.save_playlist_source, url, etag, last_modified)
+    LOGGER.info(
+        "Playlist %s: %d inserted, %d updated, %d deleted",
+        url,
+        inserted,
+        updated,
+        deleted,
+    )
+    return {
+        "status": "refreshed",
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+    }
+
+
+async def ingest_configured_playlists(
+    urls: Iterable[str] | None = None, force: bool = False
+) -> dict[str, dict[str, int | str]]:
+    """Refresh every playlist from ``server.playlists`` and report per URL."""
+
+    results: dict[str, dict[str, int | str]] = {}
+    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+        for url in PLAYLIST_URLS if urls is None else urls:
+            try:
+                results[url] = await refresh_playlist(url, client, force=force)
+            except (httpx.HTTPError, SQLAlchemyError) as exc:
+                LOGGER.error("Playlist %s failed: %s", url, exc)
+                results[url] = {"error": str(exc)}
+    return results
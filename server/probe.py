@@ -0,0 +1,174 @@
+"""Background reachability prober for remote media items."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any
+
+import httpx
+
+from . import db
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+PROBE_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("probe", {}) or {}
+CONCURRENCY = int(PROBE_CONFIG.get("concurrency", 200))
+TIMEOUT = float(PROBE_CONFIG.get("timeout", 5))
+PAGE_SIZE = 1000
+FLUSH_SIZE = 500
+
+_sweep_task: asyncio.Task | None = None
+last_sweep: dict[str, Any] = {}
+
+
+async def probe_url(client: httpx.AsyncClient, url: str) -> dict[str, Any]:
+    """Check ``url`` and return its status, HTTP code, and latency.
+
+    A ``HEAD`` request is tried first. Servers that reject it (many IPTV
+    origins answer ``405``) are retried with a ``GET`` limited to the first
+    kilobyte, of which only the first chunk is read. Never raises: URLs
+    that cannot be requested at all are reported as ``error``.
+    """
+
+    started = time.perf_counter()
+    try:
+        response = await client.head(url)
+        if response.status_code in {405, 501}:
+            async with client.stream(
+                "GET", url, headers={"Range": "bytes=0-1023"}
+            ) as response:
+                async for _ in response.aiter_raw():
+                    break
+    except httpx.TimeoutException:
+        status, http_status = "timeout", None
+    except httpx.HTTPError:
+        status, http_status = "unreachable", None
+    except Exception as exc:
+        # Malformed URLs and the like must not kill the sweep worker.
+        LOGGER.warning("Probing %s failed: %s", url, exc)
+        status, http_status = "error", None
+    else:
+        http_status = response.status_code
+        status = "ok" if http_status < 400 else "error"
+    latency = int((time.perf_counter() - started) * 1000)
+    return {"status": status, "http_status": http_status, "latency_ms": latency}
+
+
+async def sweep(
+    client: httpx.AsyncClient | None = None, concurrency: int = CONCURRENCY
+) -> dict[str, int]:
+    """Probe every remote media item with at most ``concurrency`` requests.
+
+    Items are paged out of the database, fanned out to a fixed pool of worker
+    tasks over a bounded queue, and results are written back in batches on a
+    worker thread so the event loop only ever waits on network I/O.
+    """
+
+    owns_client = client is None
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+        )
+    queue: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue(concurrency * 2)
+    pending: list[dict[str, Any]] = []
+    counts: dict[str, int] = {}
+    failures: list[Exception] = []
+
+    async def flush() -> None:
+        batch = pending[:]
+        pending.clear()
+        await db.run(db.save_channel_health, batch)
+
+    async def worker() -> None:
+        while (job := await queue.get()) is not None:
+            item_id, url = job
+            result = await probe_url(client, url)
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            pending.append(
+                {
+                    "media_item_id": item_id,
+                    "checked_at": datetime.datetime.now(datetime.UTC).replace(
+                        tzinfo=None
+                    ),
+                    **result,
+                }
+            )
+            if len(pending) >= FLUSH_SIZE:
+                try:
+                    await flush()
+                except Exception as exc:
+                    # Keep draining the queue so the producer never blocks on
+                    # dead workers; the sweep fails once every job is taken.
+                    failures.append(exc)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        after_id = 0
+        while page := await db.run(db.list_remote_media_page, after_id, PAGE_SIZE):
+            for job in page:
+                await queue.put(job)
+            after_id = page[-1][0]
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        if failures:
+            raise failures[0]
+        await flush()
+    finally:
+        for task in workers:
+            task.cancel()
+        if owns_client:
+            await client.aclose()
+    return counts
+
+
+async def _run_sweep() -> None:
+    """Run one sweep and record its summary for the admin endpoint."""
+
+    started = datetime.datetime.now(datetime.UTC)
+    last_sweep.clear()
+    last_sweep.update({"state": "running", "started_at": started.isoformat()})
+    try:
+        counts = await sweep()
+    except Exception as exc:  # pragma: no cover - defensive logging
+        LOGGER.exception("Channel sweep failed")
+        last_sweep.update({"state": "failed", "detail": str(exc)})
+        return
+    finished = datetime.datetime.now(datetime.UTC)
+    last_sweep.update(
+        {
+            "state": "finished",
+            "finished_at": finished.isoformat(),
+            "duration_s": round((finished - started).total_seconds(), 3),
+            "counts": counts,
+        }
+    )
+
+
+def start_sweep() -> bool:
+    """Launch a background sweep unless one is already running."""
+
+    global _sweep_task
+    if _sweep_task is not None and not _sweep_task.done():
+        return False
+    _sweep_task = asyncio.create_task(_run_sweep())
+    return True
+
+
+async def stop_sweep() -> None:
+    """Cancel a running sweep, e.g. during application shutdown."""
+
+    if _sweep_task is not None and not _sweep_task.done():
+        _sweep_task.cancel()
+        try:
+            await _sweep_task
+        except asyncio.CancelledError:
+            pass
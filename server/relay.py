@@ -0,0 +1,273 @@
+"""Shared-upstream relay that fans one IPTV connection out to many viewers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import mimetypes
+from collections.abc import AsyncIterator
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+
+from .config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+RELAY_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("relay", {}) or {}
+
+# Stream suffixes the system MIME table gets wrong (``.ts``) or lacks.
+STREAM_TYPES = {
+    "ts": "video/mp2t",
+}
+
+# HLS playlists list segment URIs relative to the provider. Relayed unchanged
+# they would resolve against this server, so playlists are always redirected.
+PLAYLIST_SUFFIXES = frozenset({"m3u8", "m3u"})
+PLAYLIST_TYPES = frozenset(
+    {
+        "application/vnd.apple.mpegurl",
+        "application/x-mpegurl",
+        "audio/mpegurl",
+        "audio/x-mpegurl",
+    }
+)
+
+# Sentinel placed on subscriber queues when the upstream ends or the viewer
+# is dropped for falling behind.
+_END = b""
+
+
+class RelayUnavailable(Exception):
+    """Raised when the upstream connection for a channel cannot be opened."""
+
+
+class RelaySubscriber:
+    """Single viewer attached to a :class:`ChannelRelay`."""
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def offer(self, chunk: bytes) -> bool:
+        """Queue ``chunk`` without waiting; return ``False`` when the viewer lags."""
+
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self) -> None:
+        """Discard buffered data and wake the viewer with the end sentinel."""
+
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_END)
+
+
+class ChannelRelay:
+    """Read one upstream URL and broadcast its bytes to every subscriber.
+
+    Each viewer owns a bounded queue. A viewer whose queue is full when a new
+    chunk arrives is disconnected rather than allowed to stall the upstream
+    read for everybody else. The upstream request is cancelled as soon as the
+    last viewer leaves.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: httpx.AsyncClient,
+        queue_size: int,
+        on_idle,
+    ) -> None:
+        self.url = url
+        self.client = client
+        self.queue_size = queue_size
+        self.subscribers: set[RelaySubscriber] = set()
+        self.media_type = "application/octet-stream"
+        self._on_idle = on_idle
+        self._ready = asyncio.Event()
+        self._error: Exception | None = None
+        self._task: asyncio.Task | None = None
+
+    async def subscribe(self) -> RelaySubscriber:
+        """Attach a viewer, starting the upstream reader if necessary."""
+
+        subscriber = RelaySubscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump())
+        try:
+            await self._ready.wait()
+        except asyncio.CancelledError:
+            self.unsubscribe(subscriber)
+            raise
+        if self._error is not None:
+            self.unsubscribe(subscriber)
+            raise RelayUnavailable(str(self._error)) from self._error
+        return subscriber
+
+    def unsubscribe(self, subscriber: RelaySubscriber) -> None:
+        """Detach a viewer and tear down the upstream when nobody is left."""
+
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.close()
+
+    def close(self) -> None:
+        """Cancel the upstream reader and release the channel slot."""
+
+        task = self._task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        self.subscribers.clear()
+        self._on_idle(self)
+
+    def _broadcast(self, chunk: bytes) -> None:
+        """Deliver ``chunk`` to every viewer, dropping the ones that lag."""
+
+        for subscriber in list(self.subscribers):
+            if not subscriber.offer(chunk):
+                LOGGER.warning("Dropping slow relay viewer on %s", self.url)
+                subscriber.dropped = True
+                subscriber.close()
+                self.subscribers.discard(subscriber)
+
+    async def _pump(self) -> None:
+        """Copy upstream bytes into subscriber queues until cancelled."""
+
+        try:
+            async with self.client.stream("GET", self.url) as response:
+                response.raise_for_status()
+                self.media_type = response.headers.get("content-type", self.media_type)
+                self._ready.set()
+                async for chunk in response.aiter_bytes():
+                    if chunk:
+                        self._broadcast(chunk)
+                    if not self.subscribers:
+                        break
+        except asyncio.CancelledError:
+            raise
+        except httpx.HTTPError as exc:
+            LOGGER.error("Relay upstream %s failed: %s", self.url, exc)
+            self._error = exc
+        finally:
+            self._ready.set()
+            # Always release the slot, even when the last viewer was just
+            # dropped as too slow, so the next viewer starts a fresh relay.
+            self.close()
+
+
+class RelayHub:
+    """Registry of active :class:`ChannelRelay` instances keyed by URL."""
+
+    def __init__(self, queue_size: int = 64, timeout: float = 10.0) -> None:
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.channels: dict[str, ChannelRelay] = {}
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared upstream client, creating it on first use."""
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, read=None),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _release(self, relay: ChannelRelay) -> None:
+        """Forget ``relay`` once it no longer has viewers."""
+
+        if self.channels.get(relay.url) is relay:
+            del self.channels[relay.url]
+
+    async def open(self, url: str) -> tuple[ChannelRelay, RelaySubscriber]:
+        """Join the relay for ``url``, creating the upstream on first viewer."""
+
+        relay = self.channels.get(url)
+        if relay is None or (relay._task is not None and relay._task.done()):
+            relay = ChannelRelay(
+                url, self._get_client(), self.queue_size, self._release
+            )
+            self.channels[url] = relay
+        return relay, await relay.subscribe()
+
+    async def iter_chunks(
+        self, relay: ChannelRelay, subscriber: RelaySubscriber
+    ) -> AsyncIterator[bytes]:
+        """Yield relayed bytes for one viewer and detach it when done."""
+
+        try:
+            while True:
+                chunk = await subscriber.queue.get()
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            relay.unsubscribe(subscriber)
+
+    def media_type(self, url: str) -> str:
+        """Return the content type relayed for ``url`` without opening it.
+
+        A live relay reports the upstream's type; otherwise it is guessed
+        from the URL.
+        """
+
+        relay = self.channels.get(url)
+        if relay is not None and relay._ready.is_set() and relay._error is None:
+            return relay.media_type
+        suffix = _suffix(url)
+        if suffix in STREAM_TYPES:
+            return STREAM_TYPES[suffix]
+        guessed, _ = mimetypes.guess_type(urlparse(url).path)
+        if guessed and guessed.startswith(("video/", "audio/")):
+            return guessed
+        return "application/octet-stream"
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of viewers per relayed URL."""
+
+        return {url: len(relay.subscribers) for url, relay in self.channels.items()}
+
+    async def aclose(self) -> None:
+        """Stop every relay and close the shared upstream client."""
+
+        for relay in list(self.channels.values()):
+            relay.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+relay_hub = RelayHub(
+    queue_size=int(RELAY_CONFIG.get("queue_size", 64)),
+    timeout=float(RELAY_CONFIG.get("connect_timeout", 10)),
+)
+
+
+def _suffix(url: str) -> str:
+    """Return the lower-cased file extension of ``url``'s path, if any."""
+
+    path = urlparse(url).path
+    return path.rpartition(".")[2].lower() if "." in path.rpartition("/")[2] else ""
+
+
+def is_playlist(url: str, media_type: str | None = None) -> bool:
+    """Return whether ``url`` (served as ``media_type``) is an HLS playlist."""
+
+    if media_type is not None:
+        return media_type.partition(";")[0].strip().lower() in PLAYLIST_TYPES
+    return _suffix(url) in PLAYLIST_SUFFIXES
+
+
+def relay_enabled() -> bool:
+    """Return ``True`` when remote items should be relayed instead of redirected."""
+
+    return bool(RELAY_CONFIG.get("enabled", False))
@@ -0,0 +1,277 @@
+"""Access token revocation checks fronted by an in-memory Bloom filter.
+
+Revocations are stored in the ``revoked_tokens`` table, either for one token
+(``jti:<id>``) or for every token of a user (``sub:<name>``, written when the
+user is deleted). Every worker mirrors the keys into a :class:`BloomFilter`.
+On each refresh it re-reads only the rows revoked since shortly before the
+newest one it has seen. The overlap catches rows that commit late or carry a
+slightly older timestamp from another node's clock. Checking a token that is
+not revoked, the common case, costs a few hash probes and no I/O. Only a
+filter hit, meaning a revoked token or a rare false positive, is confirmed
+against the database.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .config import CONFIG
+from .models import RevokedToken
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+REVOCATION_CONFIG: dict[str, Any] = CONFIG.get("server", {}).get("revocation", {}) or {}
+CAPACITY = int(REVOCATION_CONFIG.get("capacity", 100000))
+ERROR_RATE = float(REVOCATION_CONFIG.get("error_rate", 0.001))
+# Seconds between incremental reads of revocations made by other workers.
+REFRESH_INTERVAL = float(REVOCATION_CONFIG.get("refresh_interval", 5))
+# Seconds between purging expired rows and rebuilding the filter without them.
+REBUILD_INTERVAL = float(REVOCATION_CONFIG.get("rebuild_interval", 3600))
+# Seconds each refresh re-reads behind the newest revocation already seen.
+OVERLAP = float(REVOCATION_CONFIG.get("overlap", 60))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Sized for ``capacity`` keys at ``error_rate`` false positives. Positions
+    come from one BLAKE2b digest through double hashing.
+    """
+
+    def __init__(self, capacity: int = CAPACITY, error_rate: float = ERROR_RATE):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        """Insert ``key``."""
+
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """This worker's view of the revocation table."""
+
+    def __init__(self, capacity: int = CAPACITY, error_rate: float = ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every loaded revocation; the next check reloads them."""
+
+        with self._lock:
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            self._watermark: datetime.datetime | None = None
+            self._recent: dict[tuple[int, str], datetime.datetime] = {}
+            self._loaded = False
+            self._table_missing = False
+            self.checks = self.filter_hits = self.confirmed = 0
+            self.refreshed_at: float | None = None
+
+    def _since(self) -> datetime.datetime | None:
+        if self._watermark is None:
+            return None
+        return self._watermark - datetime.timedelta(seconds=OVERLAP)
+
+    def _load(self, bloom: BloomFilter, rows: list) -> int:
+        """Add rows not seen before to ``bloom``; return how many were new.
+
+        Rows are remembered by ``(id, key)`` while they are inside the overlap
+        window. That copes with ids committed out of order (PostgreSQL) and
+        ids reused after a purge (SQLite).
+        """
+
+        added = 0
+        for row_id, key, revoked_at in rows:
+            if (row_id, key) in self._recent:
+                continue
+            bloom.add(key)
+            self._recent[(row_id, key)] = revoked_at
+            if self._watermark is None or revoked_at > self._watermark:
+                self._watermark = revoked_at
+            added += 1
+        since = self._since()
+        if since is not None:
+            self._recent = {
+                seen: revoked_at
+                for seen, revoked_at in self._recent.items()
+                if revoked_at >= since
+            }
+        return added
+
+    def _read(self, func: Callable[..., T], missing: T, *args: Any) -> T:
+        """Call ``func``, returning ``missing`` while the table does not exist.
+
+        With ``server.storage.allow_pending_migrations`` the server may run
+        before migration 5 created ``revoked_tokens``. Until then nothing can
+        have been revoked, so tokens keep verifying and the refresher retries
+        on every pass.
+        """
+
+        try:
+            result = func(*args)
+        except SQLAlchemyError:
+            if db.has_table(RevokedToken.__tablename__):
+                raise
+            if not self._table_missing:
+                LOGGER.warning(
+                    "Table %s is missing; treating no tokens as revoked until "
+                    "`python -m server.main migrate` creates it",
+                    RevokedToken.__tablename__,
+                )
+            self._table_missing = True
+            return missing
+        self._table_missing = False
+        return result
+
+    def refresh(self) -> int:
+        """Add revocations recorded since the last refresh; return how many."""
+
+        with self._lock:
+            rows = self._read(db.revocations_since, [], self._since())
+            added = self._load(self._bloom, rows)
+            self._loaded = True
+            self.refreshed_at = time.time()
+            if self._bloom.count > self.capacity:
+                LOGGER.warning(
+                    "Revocation filter holds %d keys, above its capacity of %d; "
+                    "false positives will rise until the next rebuild",
+                    self._bloom.count,
+                    self.capacity,
+                )
+            return added
+
+    def rebuild(self) -> None:
+        """Purge expired revocations and reload the filter from scratch."""
+
+        purged = self._read(db.purge_revocations, 0)
+        with self._lock:
+            rows = self._read(db.revocations_since, [])
+            self._watermark = None
+            self._recent = {}
+            self._bloom = BloomFilter(self.capacity, self.error_rate)
+            self._load(self._bloom, rows)
+            self._loaded = True
+            self.refreshed_at = time.time()
+        LOGGER.info("Rebuilt revocation filter: %d live, %d purged", len(rows), purged)
+
+    def revoke(self, jti: str, expires: float) -> None:
+        """Revoke the token ``jti`` that expires at Unix time ``expires``."""
+
+        expires_at = datetime.datetime.fromtimestamp(expires, datetime.UTC)
+        db.add_revocation(f"jti:{jti}", expires_at.replace(tzinfo=None))
+        self.refresh()
+
+    def is_revoked(
+        self, jti: str | None, username: str, issued_at: float | None
+    ) -> bool:
+        """Return whether the token is revoked.
+
+        Without a filter hit no I/O happens; a hit is confirmed in the
+        database.
+        """
+
+        if not self._loaded:
+            self.refresh()
+        self.checks += 1
+        bloom = self._bloom
+        if f"sub:{username}" not in bloom and (
+            jti is None or f"jti:{jti}" not in bloom
+        ):
+            return False
+        self.filter_hits += 1
+        issued = (
+            datetime.datetime.fromtimestamp(issued_at, datetime.UTC).replace(
+                tzinfo=None
+            )
+            if issued_at is not None
+            else None
+        )
+        revoked = db.is_token_revoked(jti, username, issued)
+        self.confirmed += revoked
+        return revoked
+
+    def stats(self) -> dict[str, Any]:
+        """Return filter size and check counters."""
+
+        return {
+            "keys": self._bloom.count,
+            "capacity": self.capacity,
+            "bits": self._bloom.size,
+            "hashes": self._bloom.hashes,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "confirmed": self.confirmed,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+REVOCATIONS = RevocationList()
+
+_refresher: asyncio.Task | None = None
+
+
+async def _refresh_forever() -> None:
+    rebuilt: float | None = None
+    while True:
+        try:
+            if rebuilt is None or time.monotonic() - rebuilt >= REBUILD_INTERVAL:
+                await db.run(REVOCATIONS.rebuild)
+                rebuilt = time.monotonic()
+            else:
+                await db.run(REVOCATIONS.refresh)
+        except Exception:
+            # Keep going: the first rebuild is retried until it succeeds.
+            LOGGER.exception("Refreshing the revocation list failed")
+        await asyncio.sleep(REFRESH_INTERVAL)
+
+
+def start_refresher() -> None:
+    """Load the revocation list and keep it current in the background."""
+
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _refresher = asyncio.create_task(_refresh_forever())
+
+
+async def stop_refresher() -> None:
+    """Stop the background refresh task."""
+
+    global _refresher
+    if _refresher is not None and not _refresher.done():
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+    _refresher = None
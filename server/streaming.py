@@ -0,0 +1,316 @@
+"""Byte-range aware file responses used by the streaming router."""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+import secrets
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# ``mimetypes`` does not know several container formats common in media
+# libraries, so they are registered explicitly instead of falling back to
+# ``application/octet-stream``.
+MEDIA_TYPES = {
+    ".mkv": "video/x-matroska",
+    ".mka": "audio/x-matroska",
+    ".webm": "video/webm",
+    ".mp4": "video/mp4",
+    ".m4v": "video/x-m4v",
+    ".m4a": "audio/mp4",
+    ".mov": "video/quicktime",
+    ".avi": "video/x-msvideo",
+    ".ts": "video/mp2t",
+    ".m2ts": "video/mp2t",
+    ".flv": "video/x-flv",
+    ".ogv": "video/ogg",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/opus",
+    ".flac": "audio/flac",
+    ".mp3": "audio/mpeg",
+    ".m3u": "audio/x-mpegurl",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".srt": "application/x-subrip",
+    ".vtt": "text/vtt",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested byte ranges overlap the file."""
+
+
+def guess_media_type(path: str | os.PathLike[str]) -> str:
+    """Return the MIME type for ``path``, preferring the media table above."""
+
+    suffix = Path(path).suffix.lower()
+    if suffix in MEDIA_TYPES:
+        return MEDIA_TYPES[suffix]
+    return mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """Return a strong validator derived from the file's mtime and size."""
+
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range_header(header: str, size: int) -> list[tuple[int, int]]:
+    """Parse a ``Range`` header into sorted, merged ``[start, end)`` pairs.
+
+    An empty list means the header should be ignored and the full file served,
+    which is what RFC 9110 requires for syntactically invalid values. Requests
+    containing more than :data:`MAX_RANGES` ranges are ignored the same way so a
+    client cannot force thousands of tiny multipart segments.
+    """
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return []
+    if spec.count(",") >= MAX_RANGES:
+        return []
+
+    ranges: list[tuple[int, int]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return []
+        first, last = first.strip(), last.strip()
+        try:
+            if first:
+                start = int(first)
+                end = int(last) + 1 if last else max(size, start + 1)
+                if start < 0 or end <= start:
+                    return []
+            else:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size
+        except ValueError:
+            return []
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_matches(value: str, etag: str, stat_result: os.stat_result) -> bool:
+    """Return ``True`` when an ``If-Range`` validator still matches the file."""
+
+    value = value.strip()
+    if value.startswith('"') or value.startswith("W/"):
+        return value == etag
+    try:
+        since = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) == int(since)
+
+
+class RangeFileResponse(Response):
+    """Serve a local file honouring ``Range`` and ``If-Range`` requests.
+
+    Single ranges are answered with ``206 Partial Content`` and multiple ranges
+    with a ``multipart/byteranges`` body. The file is opened, read and closed
+    on worker threads in large chunks, so a slow disk never blocks the event
+    loop. That is the path uvicorn takes. Only an ASGI server that advertises
+    the ``http.response.zerocopysend`` extension is handed the file descriptor
+    instead, so the kernel copies bytes with ``sendfile``.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        media_type: str | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.stat_result = stat_result
+        self.status_code = 200
+        self.media_type = media_type or guess_media_type(path)
+        self.background = None
+        self.etag = make_etag(stat_result)
+        self.init_headers(
+            {
+                "accept-ranges": "bytes",
+                "etag": self.etag,
+                "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            }
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+        header_only = scope["method"].upper() == "HEAD"
+        zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+
+        ranges: list[tuple[int, int]] = []
+        range_header = headers.get("range")
+        if_range = headers.get("if-range")
+        if range_header and (
+            if_range is None or _if_range_matches(if_range, self.etag, self.stat_result)
+        ):
+            try:
+                ranges = parse_range_header(range_header, size)
+            except RangeNotSatisfiable:
+                response = Response(
+                    status_code=416, headers={"content-range": f"bytes */{size}"}
+                )
+                await response(scope, receive, send)
+                return
+
+        if not ranges:
+            self.headers["content-type"] = self.media_type
+            self.headers["content-length"] = str(size)
+            await self._start(send, 200)
+            await self._send_parts(send, [(None, 0, size)], header_only, zerocopy)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-type"] = self.media_type
+            self.headers["content-length"] = str(end - start)
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            await self._start(send, 206)
+            await self._send_parts(send, [(None, start, end)], header_only, zerocopy)
+        else:
+            boundary = secrets.token_hex(12)
+            parts = [
+                (
+                    (
+                        f"--{boundary}\r\n"
+                        f"Content-Type: {self.media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                    ).encode("latin-1"),
+                    start,
+                    end,
+                )
+                for start, end in ranges
+            ]
+            trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            length = sum(len(prefix) + end - start for prefix, start, end in parts)
+            length += 2 * (len(parts) - 1) + len(trailer)
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            self.headers["content-length"] = str(length)
+            await self._start(send, 206)
+            await self._send_parts(send, parts, header_only, zerocopy, trailer)
+
+    async def _start(self, send: Send, status: int) -> None:
+        """Emit the response start message with the accumulated headers."""
+
+        self.status_code = status
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": self.raw_headers,
+            }
+        )
+
+    async def _send_parts(
+        self,
+        send: Send,
+        parts: list[tuple[bytes | None, int, int]],
+        header_only: bool,
+        zerocopy: bool,
+        trailer: bytes = b"",
+    ) -> None:
+        """Send each ``(prefix, start, end)`` slice of the file in order."""
+
+        if header_only:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for index, (prefix, start, end) in enumerate(parts):
+                if index:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": b"\r\n",
+                            "more_body": True,
+                        }
+                    )
+                if prefix:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": prefix,
+                            "more_body": True,
+                        }
+                    )
+                if zerocopy:
+                    await send(
+                        {
+                            "type": ZEROCOPY_EXTENSION,
+                            "file": file,
+                            "offset": start,
+                            "count": end - start,
+                            "more_body": True,
+                        }
+                    )
+                    continue
+                position = start
+                while position < end:
+                    count = min(self.chunk_size, end - position)
+                    chunk = await anyio.to_thread.run_sync(
+                        _read_at, file, position, count
+                    )
+                    if not chunk:
+                        break
+                    position += len(chunk)
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        finally:
+            # Shielded so a client disconnect cannot leak the descriptor.
+            with anyio.CancelScope(shield=True):
+                await anyio.to_thread.run_sync(file.close)
+        await send({"type": "http.response.body", "body": trailer, "more_body": False})
+
+
+def _read_at(file, offset: int, count: int) -> bytes:
+    """Read ``count`` bytes at ``offset`` using ``pread`` when available."""
+
+    if hasattr(os, "pread"):
+        return os.pread(file.fileno(), count, offset)
+    file.seek(offset)
+    return file.read(count)
+
+
+def stat_regular_file(path: Path) -> os.stat_result | None:
+    """Return ``os.stat`` for ``path`` or ``None`` when it is not a regular file."""
+
+    try:
+        result = path.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(result.st_mode):
+        return None
+    return result
@@ -52,3 +52,135 @@ def test_require_role_rejects_mismatched_role():
     with pytest.raises(HTTPException) as exc_info:
         checker(auth.verify_token(token))
     assert exc_info.value.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_login_returns_503_when_hashing_pool_is_saturated(temp_db, monkeypatch):
+    from server import passwords
+
+    db.add_user("bob", "secret")
+    client = TestClient(create_app())
+    monkeypatch.setattr(passwords, "HASH_WORKERS", 0)
+    monkeypatch.setattr(passwords, "MAX_QUEUE", 0)
+    rejected = passwords.hashing_stats()["rejected"]
+    response = client.post(
+        "/auth/login", json={"username": "bob", "password": "secret"}
+    )
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(passwords.RETRY_AFTER)
+    assert passwords.hashing_stats()["rejected"] == rejected + 1
+
+
+def test_password_operations_report_pool_metrics(temp_db):
+    from server import passwords
+
+    db.add_user("admin", "pw", role="admin")
+    client = TestClient(create_app())
+    token = client.post(
+        "/auth/login", json={"username": "admin", "password": "pw"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    updated = client.put("/users/admin", json={"password": "new"}, headers=headers)
+    assert updated.status_code == 200
+    relogin = client.post("/auth/login", json={"username": "admin", "password": "new"})
+    assert relogin.status_code == 200
+
+    metrics = client.get("/health/metrics", headers=headers).json()["passwords"]
+    assert metrics["workers"] == passwords.HASH_WORKERS
+    assert metrics["in_flight"] == metrics["queue_length"] == 0
+    assert metrics["completed"] >= 3
+    assert metrics["latency_ms"]["p50"] > 0
+
+
+def test_verify_token_caches_claims_until_expiry(monkeypatch):
+    from server import cache
+
+    token = auth.create_token("fay", "user")
+    hits = cache.verified_tokens.stats()["hits"]
+    assert auth.verify_token(token).username == "fay"
+
+    def _no_decode(*args, **kwargs):  # pragma: no cover - must not be called
+        raise AssertionError("cached token decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", _no_decode)
+    assert auth.verify_token(token) == auth.TokenClaims("fay", "user")
+    assert cache.verified_tokens.stats()["hits"] == hits + 1
+
+    def _expired(*args, **kwargs):
+        raise auth.jwt.ExpiredSignatureError("expired")
+
+    monkeypatch.setattr(auth.jwt, "decode", _expired)
+    monkeypatch.setattr(auth.time, "time", lambda: 2**40)
+    with pytest.raises(HTTPException) as exc_info:
+        auth.verify_token(token)
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def _login(client, username="bob", password="secret") -> dict:
+    response = client.post(
+        "/auth/login", json={"username": username, "password": password}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_refresh_rotates_tokens_without_password_check(temp_db, monkeypatch):
+    from server import passwords
+
+    db.add_user("bob", "secret")
+    client = TestClient(create_app())
+    tokens = _login(client)
+    assert tokens["token_type"] == "bearer"
+
+    async def _no_bcrypt(*args):  # pragma: no cover - must not be called
+        raise AssertionError("refresh must not check the password")
+
+    monkeypatch.setattr(passwords, "check_password", _no_bcrypt)
+    refreshed = client.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert refreshed.status_code == 200
+    renewed = refreshed.json()
+    assert renewed["refresh_token"] != tokens["refresh_token"]
+    assert auth.verify_token(renewed["access_token"]).username == "bob"
+    assert (
+        client.post(
+            "/auth/refresh", json={"refresh_token": renewed["refresh_token"]}
+        ).status_code
+        == 200
+    )
+
+
+def test_refresh_token_reuse_revokes_the_family(temp_db):
+    db.add_user("bob", "secret")
+    client = TestClient(create_app())
+    original = _login(client)["refresh_token"]
+    rotated = client.post("/auth/refresh", json={"refresh_token": original}).json()
+
+    replayed = client.post("/auth/refresh", json={"refresh_token": original})
+    assert replayed.status_code == 401
+    descendant = client.post(
+        "/auth/refresh", json={"refresh_token": rotated["refresh_token"]}
+    )
+    assert descendant.status_code == 401
+
+
+def test_logout_and_user_deletion_revoke_refresh_tokens(temp_db):
+    db.add_user("bob", "secret")
+    client = TestClient(create_app())
+    first, second = _login(client), _login(client)
+    logout = client.post("/auth/logout", json={"refresh_token": first["refresh_token"]})
+    assert logout.status_code == 200
+    assert (
+        client.post(
+            "/auth/refresh", json={"refresh_token": first["refresh_token"]}
+        ).status_code
+        == 401
+    )
+
+    assert db.delete_user("bob")
+    assert (
+        client.post(
+            "/auth/refresh", json={"refresh_token": second["refresh_token"]}
+        ).status_code
+        == 401
+    )
@@ -0,0 +1,227 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from server import cache, db
+from server.app import create_app
+from server.auth import create_token
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = cache.LRUCache("test", max_entries=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    stats = lru.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = cache.LRUCache("test", max_entries=10, ttl=5)
+    lru.set("a", 1)
+    now[0] += 4
+    assert lru.get("a") == 1
+    now[0] += 2
+    assert lru.get("a") is None
+    assert lru.stats()["expirations"] == 1
+
+
+def test_lru_cache_discards_values_loaded_before_invalidation():
+    lru = cache.LRUCache("test")
+    generation = lru.generation
+    lru.invalidate("a")
+    lru.set("a", "stale", generation)
+    assert lru.get("a") is None
+
+
+def _count_queries(temp_db) -> list[str]:
+    statements: list[str] = []
+
+    @event.listens_for(temp_db.engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    return statements
+
+
+def test_hot_media_rows_skip_the_database(temp_db):
+    item = temp_db.create_media_item("Live", "http://example.com/live.ts")
+    statements = _count_queries(temp_db)
+    assert temp_db.get_media_row(item.id).title == "Live"
+    queried = len(statements)
+    for _ in range(5):
+        assert temp_db.get_media_row(item.id).title == "Live"
+    assert len(statements) == queried
+
+    temp_db.update_media_item(item.id, title="Renamed")
+    assert temp_db.get_media_row(item.id).title == "Renamed"
+    temp_db.delete_media_item(item.id)
+    assert temp_db.get_media_row(item.id) is None
+
+
+def test_listing_pages_are_cleared_by_writes(temp_db):
+    temp_db.create_media_item("One", "http://example.com/1.ts")
+    hits = cache.media_pages.stats()["hits"]
+    assert len(temp_db.list_media_page()) == 1
+    assert len(temp_db.list_media_page()) == 1
+    assert cache.media_pages.stats()["hits"] == hits + 1
+    temp_db.insert_media_items([{"title": "Two", "path": "http://example.com/2.ts"}])
+    assert len(temp_db.list_media_page()) == 2
+
+
+def test_metrics_endpoint_reports_cache_counters(temp_db):
+    item = db.create_media_item("Live", "http://example.com/live.ts")
+    before = cache.media_rows.stats()
+    client = TestClient(create_app())
+    user = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+    for _ in range(3):
+        client.get(f"/stream/{item.id}", headers=user, follow_redirects=False)
+    admin = {"Authorization": f"Bearer {create_token('root', 'admin')}"}
+    metrics = client.get("/health/metrics", headers=admin).json()
+    rows = metrics["cache"]["media_rows"]
+    assert rows["hits"] - before["hits"] == 2
+    assert rows["misses"] - before["misses"] == 1
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the shared cache uses."""
+
+    def __init__(self):
+        self.store: dict[str, str] = {}
+        self.buses: list = []
+        self.down = False
+        self.subscribed = 0
+
+    def _check(self):
+        if self.down:
+            raise cache.redis.ConnectionError("down")
+
+    def get(self, key):
+        self._check()
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.store[key] = value
+
+    def delete(self, key):
+        self._check()
+        self.store.pop(key, None)
+
+    def incr(self, key):
+        self._check()
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+    def publish(self, channel, message):
+        self._check()
+        for bus in self.buses:
+            bus.handle(message)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        server = self
+
+        class _PubSub:
+            def subscribe(self, **handlers):
+                server._check()
+                server.subscribed += 1
+
+            def run_in_thread(self, **kwargs):
+                return self
+
+            def stop(self):
+                pass
+
+            def close(self):
+                pass
+
+        return _PubSub()
+
+
+def _workers(count: int) -> tuple[FakeRedis, list]:
+    server = FakeRedis()
+    workers = []
+    for _ in range(count):
+        bus = cache.InvalidationBus(server)
+        server.buses.append(bus)
+        workers.append(cache.RedisCache("rows", bus, ttl=60, local_ttl=60))
+    return server, workers
+
+
+def test_redis_cache_shares_values_between_workers():
+    _, (first, second) = _workers(2)
+    first.set(7, [7, "Live", "http://example.com/live.ts", None])
+    assert second.get(7) == [7, "Live", "http://example.com/live.ts", None]
+    assert second.stats()["shared_hits"] == 1
+    assert second.get(7) is not None
+    assert second.stats()["hits"] == 1
+
+
+def test_redis_cache_propagates_invalidation_to_local_copies():
+    _, (first, second) = _workers(2)
+    first.set((("id",), 0), [[1]])
+    assert second.get((("id",), 0)) == [[1]]
+    first.invalidate((("id",), 0))
+    assert second.get((("id",), 0)) is None
+
+    first.set("a", 1)
+    assert second.get("a") == 1
+    second.clear()
+    assert first.get("a") is None
+    first.set("a", 2)
+    assert second.get("a") == 2
+
+
+def test_redis_cache_degrades_to_local_when_unavailable():
+    server, (worker,) = _workers(1)
+    server.down = True
+    worker.set("a", 1)
+    assert worker.get("a") == 1
+    assert worker.get("b") is None
+    worker.clear()
+    assert worker.stats()["errors"] == 3
+    server.down = False
+    worker.set("a", 2)
+    assert worker.get("a") == 2
+
+
+def test_invalidation_listener_retries_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(cache, "RECONNECT_INTERVAL", 0.01)
+    server, (worker,) = _workers(1)
+    worker.set("a", 1)
+    server.down = True
+    worker.bus.start()
+    assert server.subscribed == 0
+
+    server.down = False
+    worker.bus._retry.join(timeout=1)
+    assert server.subscribed == 1
+    # Invalidations may have been missed while offline.
+    assert worker.local.get("a") is None
+    worker.bus.stop()
+
+
+def test_lost_version_broadcast_is_picked_up_after_local_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    server, (first, second) = _workers(2)
+    second.set("a", 1)
+    assert second.version() == "shared.0"
+
+    server.buses.remove(second.bus)
+    first.clear()
+    assert second.version() == "shared.0"
+    now[0] += 61
+    assert second.version() == "shared.1"
+    assert second.get("a") is None
+
+
+def test_media_row_accepts_json_decoded_cache_values(temp_db):
+    cache.media_rows.set(42, [42, "Shared", "http://example.com/s.ts", None])
+    assert temp_db.get_media_row(42) == temp_db.MediaRow(
+        42, "Shared", "http://example.com/s.ts", None
+    )
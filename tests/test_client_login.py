@@ -1,7 +1,10 @@
 import json
+import sys
 from pathlib import Path
 import urllib.request
 
+import pytest
+
 from client import main
 
 
@@ -41,3 +44,83 @@ def test_login_saves_token(tmp_path, monkeypatch):
     assert token_file.exists()
     assert token_file.read_text(encoding="utf-8") == "testtoken"
     assert responses == ["http://localhost:8000/auth/login"]
+
+
+def _jwt(exp: float) -> str:
+    import base64
+
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode()
+    return f"e30.{payload.rstrip('=')}.sig"
+
+
+def test_login_saves_refresh_token(tmp_path, monkeypatch):
+    def fake_urlopen(req, *args, **kwargs):
+        return FakeResponse(b'{"access_token": "access", "refresh_token": "refresh"}')
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+
+    main.login_user("http://localhost:8000", "bob", "secret", save_token=True)
+
+    refresh_file = tmp_path / ".shamash_refresh_token"
+    assert refresh_file.read_text(encoding="utf-8") == "refresh"
+    # Windows only maps chmod onto the read-only flag.
+    if sys.platform != "win32":
+        assert refresh_file.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions only")
+def test_save_tokens_tightens_existing_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    token_file = tmp_path / ".shamash_token"
+    token_file.write_text("old-token-that-is-longer")
+    token_file.chmod(0o644)
+
+    main.save_tokens("new", "refresh")
+
+    assert token_file.read_text(encoding="utf-8") == "new"
+    for name in (".shamash_token", ".shamash_refresh_token"):
+        assert (tmp_path / name).stat().st_mode & 0o777 == 0o600
+
+
+def test_current_token_refreshes_expiring_token(tmp_path, monkeypatch):
+    import time
+
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    (tmp_path / ".shamash_token").write_text(_jwt(time.time() + 10))
+    (tmp_path / ".shamash_refresh_token").write_text("old-refresh")
+    fresh = _jwt(time.time() + 3600)
+    requests = []
+
+    def fake_urlopen(req, *args, **kwargs):
+        requests.append((req.full_url, json.loads(req.data.decode())))
+        body = {"access_token": fresh, "refresh_token": "new-refresh"}
+        return FakeResponse(json.dumps(body).encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+
+    assert main.current_token("http://localhost:8000") == fresh
+    assert requests == [
+        ("http://localhost:8000/auth/refresh", {"refresh_token": "old-refresh"})
+    ]
+    assert (tmp_path / ".shamash_refresh_token").read_text() == "new-refresh"
+    assert main.current_token("http://localhost:8000") == fresh
+    assert len(requests) == 1
+
+
+def test_play_media_passes_signed_url_to_player(monkeypatch):
+    signed = "http://localhost:8000/stream/3?exp=1&sig=abc"
+    launched = []
+
+    def fake_urlopen(req, *args, **kwargs):
+        assert req.full_url == "http://localhost:8000/stream/3/url"
+        assert req.headers["Authorization"] == "Bearer tok"
+        return FakeResponse(json.dumps({"url": signed}).encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    monkeypatch.setattr(main.shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(main.subprocess, "run", lambda cmd, check: launched.append(cmd))
+
+    main.play_media("http://localhost:8000", 3, "tok", "vlc")
+
+    assert launched == [["/usr/bin/vlc", signed]]
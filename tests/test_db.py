@@ -68,3 +68,61 @@ def test_get_user_closes_session_on_failure(monkeypatch):
         db.get_user("carol")
 
     assert session.closed
+
+
+def test_storage_pragmas_applied_to_connections(temp_db, sqlite_only):
+    report = temp_db.storage_report()
+    pragmas = report["settings"]
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["synchronous"] == 1  # NORMAL
+    assert pragmas["cache_size"] == -65536
+    assert pragmas["temp_store"] == 2  # MEMORY
+    assert pragmas["busy_timeout"] == 5000
+    assert report["pool_size"] == 8
+
+
+def test_database_url_prefers_explicit_url(temp_db, monkeypatch):
+    monkeypatch.setenv("SHAMASH_DATABASE_URL", "postgresql://u:p@db/shamash")
+    assert temp_db._database_url() == "postgresql://u:p@db/shamash"
+    monkeypatch.delenv("SHAMASH_DATABASE_URL")
+    assert temp_db._database_url() == f"sqlite:///{temp_db.DB_PATH}"
+
+
+def test_postgres_engine_options_ping_and_bound_statements(temp_db, monkeypatch):
+    monkeypatch.setattr(temp_db, "DIALECT", "postgresql")
+    monkeypatch.setattr(temp_db, "POSTGRES_CONFIG", {"statement_timeout_ms": 1500})
+    options = temp_db._engine_options()
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == 1800
+    assert options["connect_args"] == {"options": "-c statement_timeout=1500"}
+
+    monkeypatch.setattr(temp_db, "DIALECT", "sqlite")
+    options = temp_db._engine_options()
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"check_same_thread": False}
+
+
+def test_upsert_media_items_uses_path_conflicts(temp_db):
+    row = {"title": "One", "path": "http://example.com/1.ts", "tvg_id": "one"}
+    assert temp_db.upsert_media_items([row]) == (1, 0)
+    assert temp_db.upsert_media_items([{**row, "title": "Uno"}]) == (0, 1)
+    items = temp_db.list_media_items()
+    assert [(item.title, item.tvg_id) for item in items] == [("Uno", "one")]
+
+
+def test_row_helpers_return_named_tuples_on_shared_session(temp_db):
+    temp_db.add_user("grace", "pw", role="admin")
+    item = temp_db.create_media_item("Film", "http://example.com/film.mp4")
+    session = temp_db.get_session()
+    try:
+        media = temp_db.get_media_row(item.id, session)
+        user = temp_db.get_user_row("grace", session)
+        assert isinstance(media, temp_db.MediaRow)
+        assert media == (item.id, "Film", "http://example.com/film.mp4", None)
+        assert (user.username, user.role) == ("grace", "admin")
+        assert bcrypt.checkpw(b"pw", user.password_hash.encode())
+        assert temp_db.get_media_row(item.id + 1, session) is None
+        assert len(session.identity_map) == 0
+    finally:
+        session.close()
+    assert temp_db.get_user_row("nobody") is None
@@ -0,0 +1,183 @@
+import datetime
+import gzip
+
+import httpx
+from fastapi.testclient import TestClient
+
+from server import db, epg
+from server.app import create_app
+from server.auth import create_token
+
+GUIDE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+  <channel id="bbc1.uk"><display-name>BBC One</display-name></channel>
+  <programme start="20240101110000 +0000" stop="20240101120000 +0000" channel="bbc1.uk">
+    <title>Morning News</title>
+  </programme>
+  <programme start="20240101130000 +0100" stop="20240101133000 +0100" channel="bbc1.uk">
+    <title>Lunchtime</title><desc>Midday bulletin</desc><category>News</category>
+  </programme>
+  <programme start="20240101120000 +0000" stop="20240101140000 +0000" channel="arte.fr">
+    <title>Documentary</title>
+  </programme>
+  <programme start="bogus" stop="20240101140000 +0000" channel="arte.fr">
+    <title>Broken</title>
+  </programme>
+</tv>
+"""
+
+
+def _chunks(data: bytes, size: int = 37):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def _at(hour: int, minute: int = 0) -> datetime.datetime:
+    return datetime.datetime(2024, 1, 1, hour, minute, tzinfo=datetime.UTC)
+
+
+def test_parse_xmltv_time_applies_offsets():
+    assert epg.parse_xmltv_time("20240101130000 +0100") == int(_at(12).timestamp())
+    assert epg.parse_xmltv_time("202401011200") == int(_at(12).timestamp())
+
+
+def test_iter_programmes_streams_gzip_chunks():
+    rows = list(epg.iter_programmes(_chunks(gzip.compress(GUIDE)), "guide"))
+
+    assert [row["title"] for row in rows] == [
+        "Morning News",
+        "Lunchtime",
+        "Documentary",
+    ]
+    assert rows[1]["description"] == "Midday bulletin"
+    assert rows[1]["category"] == "News"
+    assert rows[1]["start"] == int(_at(12).timestamp())
+
+
+def _ingest(url: str, body: bytes, etag: str = '"g1"') -> list[dict[str, str]]:
+    seen: list[dict[str, str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(dict(request.headers))
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, content=body, headers={"ETag": etag})
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert epg.ingest_guide(url, client) == {"status": "refreshed", "programmes": 3}
+        assert epg.ingest_guide(url, client) == {"status": "unchanged"}
+    return seen
+
+
+def test_ingest_guide_replaces_programmes_and_links_items(temp_db):
+    url = "http://guide.test/epg.xml.gz"
+    _ingest(url, gzip.compress(GUIDE))
+    db.upsert_media_items(
+        [{"title": "BBC One", "path": "http://iptv.test/bbc1.ts", "tvg_id": "bbc1.uk"}]
+    )
+    item_id = db.list_media_items()[0].id
+
+    now = epg.programmes_now(_at(12, 15))
+    assert [(row["channel"], row["title"]) for row in now] == [
+        ("arte.fr", "Documentary"),
+        ("bbc1.uk", "Lunchtime"),
+    ]
+    assert now[1]["item_ids"] == [item_id]
+    assert now[1]["start"] == "2024-01-01T12:00:00+00:00"
+
+    window = epg.channel_programmes("bbc1.uk", _at(11, 30), _at(12, 10))
+    assert [row["title"] for row in window] == ["Morning News", "Lunchtime"]
+
+
+def test_epg_endpoints_require_token_and_filter_window(temp_db):
+    url = "http://guide.test/epg.xml"
+    _ingest(url, GUIDE)
+    client = TestClient(create_app())
+    headers = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+
+    assert client.get("/epg/now").status_code == 403
+
+    response = client.get(
+        "/epg/bbc1.uk",
+        params={"from": "2024-01-01T11:45:00", "to": "2024-01-01T13:00:00"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert [row["title"] for row in response.json()] == ["Morning News", "Lunchtime"]
+
+    response = client.get(
+        "/epg/bbc1.uk",
+        params={"from": "2024-01-01T13:00:00", "to": "2024-01-01T12:00:00"},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+
+OPEN_ENDED = b"""<tv>
+  <programme start="20240101100000 +0000" channel="bbc1.uk">
+    <title>One</title>
+  </programme>
+  <programme start="20240101103000 +0000" channel="arte.fr">
+    <title>Other</title>
+  </programme>
+  <programme start="20240101110000 +0000" stop="20240101113000 +0000"
+             channel="bbc1.uk">
+    <title>Two</title>
+  </programme>
+  <programme start="20240101120000 +0000" channel="bbc1.uk">
+    <title>Last</title>
+  </programme>
+</tv>
+"""
+
+
+def test_programmes_without_stop_end_at_the_next_start():
+    rows = list(epg.iter_programmes([OPEN_ENDED], "guide"))
+
+    assert [(row["title"], row["start"], row["stop"]) for row in rows] == [
+        ("One", int(_at(10).timestamp()), int(_at(11).timestamp())),
+        ("Two", int(_at(11).timestamp()), int(_at(11, 30).timestamp())),
+    ]
+
+
+def test_guide_is_staged_before_the_programmes_are_replaced(temp_db, monkeypatch):
+    downloaded = []
+    replace = db.replace_programmes
+
+    def body():
+        yield from _chunks(GUIDE)
+        downloaded.append(True)
+
+    def checked_replace(source, batches):
+        assert downloaded, "transaction opened before the download finished"
+        return replace(source, batches)
+
+    monkeypatch.setattr(db, "replace_programmes", checked_replace)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+    with httpx.Client(transport=transport) as client:
+        result = epg.ingest_guide("http://guide.test/staged.xml", client)
+    assert result == {"status": "refreshed", "programmes": 3}
+
+
+def test_corrupt_gzip_is_reported_and_keeps_the_old_guide(temp_db, monkeypatch):
+    url = "http://guide.test/epg.xml.gz"
+    _ingest(url, gzip.compress(GUIDE))
+    payload = gzip.compress(GUIDE)
+    bodies = {
+        "http://guide.test/corrupt.gz": payload[:20] + b"\x00" * 40 + payload[60:],
+        url: payload[: len(payload) // 2],
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=bodies[str(request.url)])
+
+    real_client = httpx.Client
+    monkeypatch.setattr(
+        epg.httpx,
+        "Client",
+        lambda **kwargs: real_client(transport=httpx.MockTransport(handler)),
+    )
+    results = epg.refresh_configured_guides(list(bodies), force=True)
+
+    assert all("error" in result for result in results.values())
+    assert len(epg.channel_programmes("bbc1.uk", _at(11), _at(13))) == 2
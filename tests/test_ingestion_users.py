@@ -1,3 +1,5 @@
+import json
+
 from fastapi.testclient import TestClient
 from server.app import create_app
 from server import db
@@ -161,3 +163,78 @@ def test_user_crud_endpoints(temp_db):
     resp = client.delete("/users/dave", headers=admin_headers)
     assert resp.status_code == 200
     assert db.get_user("dave") is None
+
+
+def test_ingest_batch_json_array_reports_ids_and_errors(temp_db):
+    client, admin_headers = _create_admin_client()
+    payload = [
+        {"title": "one", "path": "http://example.com/1.mp4"},
+        {"title": "bad", "path": "ftp://example.com/2.mp4"},
+        {"path": "http://example.com/3.mp4"},
+        {"title": "four", "path": "http://example.com/4.mp4"},
+    ]
+    response = client.post("/ingestion/batch", json=payload, headers=admin_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert body["failed"] == 2
+    items = body["items"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+    assert "id" in items[0] and "id" in items[3]
+    assert "path" in items[1]["error"]
+    assert "title" in items[2]["error"]
+    stored = {item.id: item.title for item in db.list_media_items()}
+    assert stored == {items[0]["id"]: "one", items[3]["id"]: "four"}
+
+
+def test_ingest_batch_ndjson_spans_multiple_chunks(temp_db, monkeypatch):
+    import server.app as app_module
+
+    monkeypatch.setattr(app_module, "BATCH_CHUNK_SIZE", 3)
+    client, admin_headers = _create_admin_client()
+    lines = [
+        json.dumps({"title": f"item {i}", "path": f"http://example.com/{i}.ts"})
+        for i in range(7)
+    ]
+    lines.insert(4, "{not json")
+    response = client.post(
+        "/ingestion/batch",
+        content="\n".join(lines) + "\n",
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 7
+    assert body["failed"] == 1
+    assert "error" in body["items"][4]
+    ids = [item["id"] for item in body["items"] if "id" in item]
+    assert ids == sorted(ids)
+    assert len(db.list_media_items()) == 7
+
+
+def test_ingest_batch_rejects_non_array(temp_db):
+    client, admin_headers = _create_admin_client()
+    response = client.post(
+        "/ingestion/batch", json={"title": "x"}, headers=admin_headers
+    )
+    assert response.status_code == 422
+
+
+def test_ingest_duplicate_path_conflicts(temp_db):
+    client, admin_headers = _create_admin_client()
+    payload = {"title": "one", "path": "http://example.com/same.ts"}
+    assert (
+        client.post("/ingestion/", json=payload, headers=admin_headers).status_code
+        == 200
+    )
+    again = client.post("/ingestion/", json=payload, headers=admin_headers)
+    assert again.status_code == 409
+
+    batch = client.post(
+        "/ingestion/batch",
+        json=[payload, {"title": "two", "path": "http://example.com/new.ts"}],
+        headers=admin_headers,
+    )
+    items = batch.json()["items"]
+    assert items[0] == {"index": 0, "error": "path already exists"}
+    assert "id" in items[1]
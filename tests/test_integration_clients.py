@@ -0,0 +1,74 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server import db
+from server.app import create_app
+from server.auth import create_token
+from server.integrations import clients, sonarr
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b"{}"
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sonarr_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(sonarr, "SONARR_URL", f"http://127.0.0.1:{server.server_port}")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_shared_client_reuses_connections(sonarr_server, monkeypatch):
+    monkeypatch.delitem(clients.STATS, "sonarr", raising=False)
+    client = clients.create_client("sonarr")
+    monkeypatch.setitem(clients.CLIENTS, "sonarr", client)
+    try:
+        for _ in range(3):
+            await sonarr.async_refresh_series()
+    finally:
+        await client.aclose()
+
+    stats = clients.client_stats()["sonarr"]
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["reused"] == 2
+    assert stats["reuse_rate"] == pytest.approx(0.667)
+
+
+def test_lifespan_opens_and_closes_clients():
+    db.add_user("root", "pw", role="admin")
+    headers = {"Authorization": f"Bearer {create_token('root', 'admin')}"}
+    with TestClient(create_app()) as client:
+        assert set(clients.CLIENTS) == {"sonarr", "radarr"}
+        shared = clients.CLIENTS["sonarr"]
+        metrics = client.get("/health/metrics", headers=headers).json()
+        assert {"sonarr", "radarr"} <= set(metrics["integrations"])
+    assert clients.CLIENTS == {}
+    assert shared.is_closed
+
+
+def test_http2_requires_h2(monkeypatch):
+    monkeypatch.setattr(clients, "h2", None)
+    with pytest.raises(RuntimeError, match="httpx\\[http2\\]"):
+        clients.create_client("sonarr", http2=True)
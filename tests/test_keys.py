@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from server import auth, keys
+from server.app import create_app
+
+
+def _key(tmp_path, kid: str, algorithm: str = "EdDSA") -> keys.SigningKey:
+    path = tmp_path / f"{kid}.pem"
+    path.write_bytes(keys.generate_private_key_pem(algorithm))
+    return keys.load_key(kid, path)
+
+
+@pytest.mark.parametrize("algorithm", ["EdDSA", "RS256"])
+def test_keyring_signs_with_kid_and_verifies(tmp_path, algorithm):
+    ring = keys.KeyRing(algorithm, [_key(tmp_path, "k1", algorithm)])
+    token = ring.encode({"sub": "amy", "role": "user"})
+    assert jwt.get_unverified_header(token) == {
+        "alg": algorithm,
+        "kid": "k1",
+        "typ": "JWT",
+    }
+    assert ring.decode(token)["sub"] == "amy"
+
+    (jwk,) = ring.jwks()["keys"]
+    assert (jwk["kid"], jwk["alg"], jwk["use"]) == ("k1", algorithm, "sig")
+    assert "d" not in jwk
+
+
+def test_rotation_keeps_old_tokens_valid(tmp_path):
+    old, new = _key(tmp_path, "old"), _key(tmp_path, "new")
+    issued_before = keys.KeyRing("EdDSA", [old]).encode({"sub": "amy"})
+    public_old = keys.SigningKey("old", None, old.public_key)
+    ring = keys.KeyRing("EdDSA", [new, public_old])
+    assert jwt.get_unverified_header(ring.encode({"sub": "amy"}))["kid"] == "new"
+    assert ring.decode(issued_before)["sub"] == "amy"
+
+    stranger = keys.KeyRing("EdDSA", [_key(tmp_path, "other")])
+    with pytest.raises(jwt.InvalidTokenError):
+        ring.decode(stranger.encode({"sub": "eve"}))
+
+
+def test_verifier_uses_cached_jwks_without_private_keys(tmp_path, monkeypatch):
+    issuer = keys.KeyRing("EdDSA", [_key(tmp_path, "k1")])
+    fetches = []
+
+    def fake_fetch(self):
+        fetches.append(self.uri)
+        return issuer.jwks()
+
+    monkeypatch.setattr(jwt.PyJWKClient, "fetch_data", fake_fetch)
+    verifier = keys.KeyRing("EdDSA", jwks_url="http://auth.test/auth/jwks")
+    for name in ("amy", "bob"):
+        assert verifier.decode(issuer.encode({"sub": name}))["sub"] == name
+    assert fetches == ["http://auth.test/auth/jwks"]
+    with pytest.raises(RuntimeError):
+        verifier.encode({"sub": "amy"})
+
+
+def test_unknown_kids_refetch_the_jwks_at_most_once_per_ttl(tmp_path, monkeypatch):
+    issuer = keys.KeyRing("EdDSA", [_key(tmp_path, "k1")])
+    forger = keys.KeyRing("EdDSA", [_key(tmp_path, "forged")])
+    fetches = []
+    clock = [1000.0]
+
+    def fake_fetch(self):
+        fetches.append(self.uri)
+        return issuer.jwks()
+
+    monkeypatch.setattr(jwt.PyJWKClient, "fetch_data", fake_fetch)
+    monkeypatch.setattr(keys, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    verifier = keys.KeyRing(
+        "EdDSA", jwks_url="http://auth.test/auth/jwks", jwks_cache_seconds=300
+    )
+    assert verifier.decode(issuer.encode({"sub": "amy"}))["sub"] == "amy"
+    for _ in range(5):
+        with pytest.raises(jwt.InvalidTokenError, match="Unknown signing key"):
+            verifier.decode(forger.encode({"sub": "eve"}))
+    assert len(fetches) == 2
+
+    issuer = keys.KeyRing("EdDSA", [_key(tmp_path, "k2"), *issuer.keys.values()])
+    clock[0] += 301
+    assert verifier.decode(issuer.encode({"sub": "bob"}))["sub"] == "bob"
+    assert len(fetches) == 3
+
+
+def test_jwks_endpoint_and_login_use_the_keyring(temp_db, tmp_path, monkeypatch):
+    from server import db
+
+    monkeypatch.setattr(auth, "KEYRING", keys.KeyRing("EdDSA", [_key(tmp_path, "k1")]))
+    client = TestClient(create_app())
+    assert [key["kid"] for key in client.get("/auth/jwks").json()["keys"]] == ["k1"]
+
+    db.add_user("amy", "pw")
+    token = client.post(
+        "/auth/login", json={"username": "amy", "password": "pw"}
+    ).json()["access_token"]
+    assert jwt.get_unverified_header(token)["alg"] == "EdDSA"
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/stream/ping", headers=headers).status_code == 200
+
+
+def test_jwks_is_empty_for_shared_secret():
+    assert keys.KeyRing("HS256", secret="s").jwks() == {"keys": []}
@@ -1,3 +1,10 @@
+import asyncio
+import json
+import threading
+
+import anyio
+import httpx
+import pytest
 from fastapi.testclient import TestClient
 from server.app import create_app
 from server import db
@@ -17,6 +24,117 @@ def test_media_list_endpoint(temp_db, tmp_path):
     assert data[0]["title"] == "demo"
 
 
+def _seed_media(count: int) -> dict[str, str]:
+    db.insert_media_items(
+        [
+            {
+                "title": f"ch{i}",
+                "path": f"http://example.com/{i}.ts",
+                "tvg_id": f"tvg{i}",
+            }
+            for i in range(count)
+        ]
+    )
+    return {"Authorization": f"Bearer {create_token('alice', 'user')}"}
+
+
+def test_media_list_keyset_pagination(temp_db):
+    headers = _seed_media(5)
+    client = TestClient(create_app())
+    first = client.get("/media/", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert [row["title"] for row in first.json()] == ["ch0", "ch1"]
+    next_url = first.links["next"]["url"]
+    assert "after=2" in next_url
+
+    second = client.get(next_url, headers=headers)
+    assert [row["title"] for row in second.json()] == ["ch2", "ch3"]
+    last = client.get(second.links["next"]["url"], headers=headers)
+    assert [row["title"] for row in last.json()] == ["ch4"]
+    assert "link" not in last.headers
+
+
+def test_media_list_field_projection(temp_db):
+    headers = _seed_media(2)
+    client = TestClient(create_app())
+    response = client.get("/media/", params={"fields": "tvg_id,title"}, headers=headers)
+    assert response.json() == [
+        {"id": 1, "tvg_id": "tvg0", "title": "ch0"},
+        {"id": 2, "tvg_id": "tvg1", "title": "ch1"},
+    ]
+    rejected = client.get("/media/", params={"fields": "path"}, headers=headers)
+    assert rejected.status_code == 422
+
+
+def test_media_list_streams_whole_catalog(temp_db, monkeypatch):
+    import server.app as app_module
+
+    monkeypatch.setattr(app_module, "MEDIA_PAGE_SIZE", 3)
+    headers = _seed_media(7)
+    client = TestClient(create_app())
+    listing = client.get("/media/", params={"after": 1}, headers=headers)
+    assert [row["id"] for row in listing.json()] == [2, 3, 4, 5, 6, 7]
+
+    ndjson = client.get(
+        "/media/",
+        params={"fields": "title"},
+        headers={**headers, "Accept": "application/x-ndjson"},
+    )
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [line["title"] for line in lines] == [f"ch{i}" for i in range(7)]
+
+
+def test_media_list_empty_catalog_streams_empty_array(temp_db):
+    headers = {"Authorization": f"Bearer {create_token('alice', 'user')}"}
+    client = TestClient(create_app())
+    assert client.get("/media/", headers=headers).json() == []
+
+
+def test_media_list_etag_revalidation(temp_db):
+    headers = _seed_media(3)
+    client = TestClient(create_app())
+    first = client.get("/media/", headers=headers)
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and first.headers["vary"] == "Accept-Encoding"
+
+    revalidated = client.get("/media/", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    other = client.get("/media/", params={"limit": 2}, headers=headers)
+    assert other.headers["etag"] != etag
+
+    db.create_media_item("new", "http://example.com/new.ts")
+    changed = client.get("/media/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()) == 4
+
+
+def test_media_list_serves_cached_gzip_bytes(temp_db, monkeypatch):
+    import server.app as app_module
+
+    headers = _seed_media(50)
+    client = TestClient(create_app())
+    first = client.get("/media/", headers=headers)
+    assert "content-encoding" not in first.headers
+
+    def fail(*args):
+        raise AssertionError("listing should be served from cached bytes")
+
+    monkeypatch.setattr(app_module.db, "list_media_page", fail)
+    cached = client.get("/media/", headers={**headers, "Accept-Encoding": "gzip"})
+    assert cached.headers["content-encoding"] == "gzip"
+    assert cached.headers["etag"] == first.headers["etag"][:-1] + '-gz"'
+    assert cached.json() == first.json()
+    identity = client.get("/media/", headers={**headers, "Accept-Encoding": "identity"})
+    assert identity.content == first.content
+    revalidated = client.get(
+        "/media/", headers={**headers, "If-None-Match": cached.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+
 def test_stream_endpoint_serves_file(temp_db, tmp_path):
     media_file = tmp_path / "sample.txt"
     media_file.write_text("hello")
@@ -30,3 +148,252 @@ def test_stream_endpoint_serves_file(temp_db, tmp_path):
     )
     assert response.status_code == 200
     assert response.content == b"hello"
+
+
+def _stream_client(tmp_path, name: str, payload: bytes):
+    media_file = tmp_path / name
+    media_file.write_bytes(payload)
+    item = db.create_media_item(name, str(media_file))
+    client = TestClient(create_app())
+    headers = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+    return client, headers, item
+
+
+def test_signed_stream_url_works_without_token(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "clip.ts", b"signed")
+    minted = client.get(f"/stream/{item.id}/url", headers=headers)
+    assert minted.status_code == 200
+    url = minted.json()["url"]
+    assert f"/stream/{item.id}?exp=" in url
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == b"signed"
+    assert response.headers["cache-control"].startswith("public, max-age=")
+
+    assert client.get(url.replace("sig=", "sig=x")).status_code == 403
+    assert client.get(url.replace("sig=", "sig=%C3%A9")).status_code == 403
+    assert (
+        client.get(url.replace(f"/stream/{item.id}?", "/stream/999?")).status_code
+        == 403
+    )
+    assert client.get(f"/stream/{item.id}").status_code == 403
+    assert client.get("/stream/999/url", headers=headers).status_code == 404
+
+
+def test_signed_stream_url_expiry_and_ip_binding(temp_db, tmp_path):
+    from server import stream_urls
+
+    client, headers, item = _stream_client(tmp_path, "clip.ts", b"bound")
+    bound = client.get(
+        f"/stream/{item.id}/url", params={"bind_ip": True}, headers=headers
+    ).json()["url"]
+    assert "ip=1" in bound
+    response = client.get(bound)
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("private, max-age=")
+
+    elsewhere = stream_urls.sign(item.id, "bob", client_ip="203.0.113.9")
+    assert client.get(f"/stream/{item.id}", params=elsewhere).status_code == 403
+    expired = stream_urls.sign(item.id, "bob", ttl=-10)
+    assert client.get(f"/stream/{item.id}", params=expired).status_code == 403
+
+
+def test_signed_stream_urls_stop_working_for_deleted_users(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "clip.ts", b"revoked")
+    db.add_user("bob", "pw")
+    url = client.get(f"/stream/{item.id}/url", headers=headers).json()["url"]
+    assert "u=bob" in url
+    assert client.get(url).status_code == 200
+    forged = url.replace("u=bob", "u=root")
+    assert client.get(forged).status_code == 403
+
+    admin = {"Authorization": f"Bearer {create_token('root', 'admin')}"}
+    assert client.delete("/users/bob", headers=admin).status_code == 200
+
+    response = client.get(url)
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Stream URL revoked"
+
+
+def test_stream_endpoint_serves_single_range(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "movie.mkv", b"0123456789")
+
+    response = client.get(
+        f"/stream/{item.id}", headers={**headers, "Range": "bytes=2-5"}
+    )
+
+    assert response.status_code == 206
+    assert response.content == b"2345"
+    assert response.headers["content-range"] == "bytes 2-5/10"
+    assert response.headers["content-type"] == "video/x-matroska"
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_stream_endpoint_serves_multiple_ranges(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "movie.mp4", b"0123456789")
+
+    response = client.get(
+        f"/stream/{item.id}", headers={**headers, "Range": "bytes=0-1,-2"}
+    )
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert b"Content-Range: bytes 0-1/10\r\n\r\n01\r\n" in response.content
+    assert b"Content-Range: bytes 8-9/10\r\n\r\n89\r\n" in response.content
+    assert response.content.endswith(f"--{boundary}--\r\n".encode())
+
+
+def test_stream_endpoint_rejects_unsatisfiable_range(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "clip.ts", b"abc")
+
+    response = client.get(
+        f"/stream/{item.id}", headers={**headers, "Range": "bytes=9-"}
+    )
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */3"
+
+
+def test_stream_endpoint_ignores_stale_if_range(temp_db, tmp_path):
+    client, headers, item = _stream_client(tmp_path, "clip.ts", b"abcdef")
+
+    response = client.get(
+        f"/stream/{item.id}",
+        headers={**headers, "Range": "bytes=1-2", "If-Range": '"stale"'},
+    )
+    assert response.status_code == 200
+    assert response.content == b"abcdef"
+
+    etag = response.headers["etag"]
+    response = client.get(
+        f"/stream/{item.id}",
+        headers={**headers, "Range": "bytes=1-2", "If-Range": etag},
+    )
+    assert response.status_code == 206
+    assert response.content == b"bc"
+
+
+def test_stream_endpoint_redirects_remote_items_by_default(temp_db):
+    item = db.create_media_item("live", "http://iptv.test/live.ts")
+    client = TestClient(create_app())
+    token = create_token("bob", "user")
+
+    response = client.get(
+        f"/stream/{item.id}",
+        headers={"Authorization": f"Bearer {token}"},
+        follow_redirects=False,
+    )
+
+    assert response.status_code == 307
+    assert response.headers["location"] == "http://iptv.test/live.ts"
+
+
+def test_stream_endpoint_relays_remote_items_when_enabled(temp_db, monkeypatch):
+    item = db.create_media_item("live", "http://iptv.test/live.ts")
+    opened = []
+
+    class StubRelay:
+        media_type = "video/mp2t"
+
+    async def fake_open(url):
+        opened.append(url)
+        return StubRelay(), object()
+
+    async def fake_iter_chunks(_relay, _subscriber):
+        yield b"ts-packet"
+
+    monkeypatch.setattr("server.app.relay_enabled", lambda: True)
+    monkeypatch.setattr("server.app.relay_hub.open", fake_open)
+    monkeypatch.setattr("server.app.relay_hub.iter_chunks", fake_iter_chunks)
+    client = TestClient(create_app())
+    token = create_token("bob", "user")
+
+    response = client.get(
+        f"/stream/{item.id}", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert response.content == b"ts-packet"
+    assert response.headers["content-type"] == "video/mp2t"
+    assert opened == ["http://iptv.test/live.ts"]
+
+
+def test_stream_head_in_relay_mode_reports_content_type(temp_db, monkeypatch):
+    item = db.create_media_item("live", "http://iptv.test/live.ts")
+    monkeypatch.setattr("server.app.relay_enabled", lambda: True)
+    client = TestClient(create_app())
+    token = create_token("bob", "user")
+
+    response = client.head(
+        f"/stream/{item.id}", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "video/mp2t"
+    assert response.content == b""
+
+
+def test_relay_mode_redirects_hls_playlists(temp_db, monkeypatch):
+    by_suffix = db.create_media_item("hls", "http://iptv.test/live/index.m3u8")
+    by_type = db.create_media_item("hls2", "http://iptv.test/play?id=7")
+    opened = []
+    released = []
+
+    class StubRelay:
+        media_type = "application/vnd.apple.mpegurl; charset=utf-8"
+
+        def unsubscribe(self, subscriber):
+            released.append(subscriber)
+
+    async def fake_open(url):
+        opened.append(url)
+        return StubRelay(), "viewer"
+
+    monkeypatch.setattr("server.app.relay_enabled", lambda: True)
+    monkeypatch.setattr("server.app.relay_hub.open", fake_open)
+    client = TestClient(create_app(), follow_redirects=False)
+    headers = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+
+    for method in ("get", "head"):
+        response = getattr(client, method)(f"/stream/{by_suffix.id}", headers=headers)
+        assert response.status_code == 307
+        assert response.headers["location"] == "http://iptv.test/live/index.m3u8"
+    assert opened == []
+
+    response = client.get(f"/stream/{by_type.id}", headers=headers)
+    assert response.status_code == 307
+    assert response.headers["location"] == "http://iptv.test/play?id=7"
+    assert released == ["viewer"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_stream_ping_stays_responsive_during_slow_listing(temp_db, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_list_media_page(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return []
+
+    monkeypatch.setattr(db, "list_media_page", slow_list_media_page)
+    headers = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver"
+    ) as client:
+        listing = asyncio.create_task(client.get("/media/", headers=headers))
+        await anyio.to_thread.run_sync(started.wait, 1)
+
+        with anyio.fail_after(1):
+            ping = await client.get("/stream/ping", headers=headers)
+
+        assert ping.status_code == 200
+        assert not listing.done()
+        release.set()
+        assert (await listing).status_code == 200
@@ -7,6 +7,7 @@ from fastapi.testclient import TestClient
 
 from server import db
 from server.app import create_app
+from server.integrations.base import REGISTRY, Integration
 
 
 def _stub_metadata_client(monkeypatch, status_by_host, header_log):
@@ -20,7 +21,7 @@ def _stub_metadata_client(monkeypatch, status_by_host, header_log):
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        async def get(self, url, headers=None):
+        async def get(self, url, headers=None, timeout=None):
             for host, status in status_by_host.items():
                 if host in url:
                     header_log[host] = dict(headers or {})
@@ -52,14 +53,25 @@ def _create_authenticated_client(
     return client, headers
 
 
+def _register(monkeypatch, name, refresh, timeout=None):
+    monkeypatch.setitem(REGISTRY, name, Integration(name, refresh, timeout))
+
+
 def test_metadata_sync_handles_sonarr_error(monkeypatch):
     async def fail_series():
         raise httpx.RequestError("boom")
 
-    monkeypatch.setattr("server.app.async_refresh_series", fail_series)
+    async def succeed_movies():
+        return None
+
+    _register(monkeypatch, "sonarr", fail_series)
+    _register(monkeypatch, "radarr", succeed_movies)
     client, admin_headers = _create_authenticated_client()
-    resp = client.post("/metadata/sync", headers=admin_headers)
-    assert resp.json()["status"] == "sonarr_error"
+    payload = client.post("/metadata/sync", headers=admin_headers).json()
+    assert payload["status"] == "partial"
+    assert payload["services"]["sonarr"]["status"] == "error"
+    assert payload["services"]["sonarr"]["detail"] == "boom"
+    assert payload["services"]["radarr"]["status"] == "ok"
 
 
 def test_metadata_sync_handles_radarr_error(monkeypatch):
@@ -69,11 +81,59 @@ def test_metadata_sync_handles_radarr_error(monkeypatch):
     async def fail_movies():
         raise httpx.RequestError("nope")
 
-    monkeypatch.setattr("server.app.async_refresh_series", succeed_series)
-    monkeypatch.setattr("server.app.async_refresh_movies", fail_movies)
+    _register(monkeypatch, "sonarr", succeed_series)
+    _register(monkeypatch, "radarr", fail_movies)
+    client, admin_headers = _create_authenticated_client()
+    payload = client.post("/metadata/sync", headers=admin_headers).json()
+    assert payload["status"] == "partial"
+    assert payload["services"]["radarr"] == {
+        "status": "error",
+        "detail": "nope",
+        "duration_ms": payload["services"]["radarr"]["duration_ms"],
+    }
+    assert payload["services"]["sonarr"]["status"] == "ok"
+
+
+def test_metadata_sync_runs_services_concurrently_with_timeouts(monkeypatch):
+    async def slow_series():
+        await asyncio.sleep(5)
+
+    async def movies():
+        await asyncio.sleep(0.2)
+
+    async def other():
+        await asyncio.sleep(0.2)
+        raise RuntimeError("down")
+
+    _register(monkeypatch, "sonarr", slow_series, timeout=0.3)
+    _register(monkeypatch, "radarr", movies)
+    _register(monkeypatch, "lidarr", other)
+    client, admin_headers = _create_authenticated_client()
+    payload = client.post("/metadata/sync", headers=admin_headers).json()
+
+    services = payload["services"]
+    assert payload["status"] == "partial"
+    assert services["sonarr"]["status"] == "timeout"
+    assert services["radarr"]["status"] == "ok"
+    assert services["lidarr"] == {
+        "status": "error",
+        "detail": "down",
+        "duration_ms": services["lidarr"]["duration_ms"],
+    }
+    # The sync waits for the 0.3s deadline, never for the 5s refresh.
+    assert 300 <= payload["duration_ms"] < 5000
+
+
+def test_metadata_sync_reports_total_failure(monkeypatch):
+    async def fail():
+        raise httpx.ConnectError("refused")
+
+    _register(monkeypatch, "sonarr", fail)
+    _register(monkeypatch, "radarr", fail)
     client, admin_headers = _create_authenticated_client()
-    resp = client.post("/metadata/sync", headers=admin_headers)
-    assert resp.json()["status"] == "radarr_error"
+    payload = client.post("/metadata/sync", headers=admin_headers).json()
+    assert payload["status"] == "failed"
+    assert {s["status"] for s in payload["services"].values()} == {"error"}
 
 
 def test_metadata_ping_reports_invalid_sonarr_key(monkeypatch):
@@ -173,8 +233,8 @@ async def test_metadata_sync_allows_concurrent_ping(monkeypatch):
     async def quick_movies() -> None:
         order.append("movies_called")
 
-    monkeypatch.setattr("server.app.async_refresh_series", slow_series)
-    monkeypatch.setattr("server.app.async_refresh_movies", quick_movies)
+    _register(monkeypatch, "sonarr", slow_series)
+    _register(monkeypatch, "radarr", quick_movies)
 
     db.add_user("admin", "pw", role="admin")
     app = create_app()
@@ -209,5 +269,5 @@ async def test_metadata_sync_allows_concurrent_ping(monkeypatch):
 
     assert ping_response.status_code == 200
     assert sync_response.json()["status"] == "synchronized"
-    assert order[0] == "ping_complete"
-    assert order[-1] == "sync_complete"
+    # Radarr no longer waits for the slow Sonarr refresh to finish.
+    assert order == ["movies_called", "ping_complete", "sync_complete"]
@@ -0,0 +1,119 @@
+import datetime
+import importlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from server import migrations
+from server.app import create_app
+from server.models import Base
+
+
+def test_fresh_database_reaches_latest_version(temp_db):
+    latest = migrations.MIGRATIONS[-1].version
+    with temp_db.engine.connect() as conn:
+        assert migrations.current_version(conn) == latest
+    assert migrations.pending_migrations(temp_db.engine) == []
+    assert migrations.migrate(temp_db.engine) == []
+
+
+def test_importing_db_does_not_touch_the_database(temp_db, sqlite_only, tmp_path):
+    untouched = tmp_path / "untouched.db"
+    os.environ["SHAMASH_DB_PATH"] = str(untouched)
+    importlib.reload(temp_db)
+    assert not untouched.exists()
+
+
+def test_legacy_database_is_upgraded_and_deduplicated(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                "username VARCHAR UNIQUE NOT NULL, password_hash VARCHAR NOT NULL)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TABLE media_items (id INTEGER PRIMARY KEY, "
+                "title VARCHAR NOT NULL, path TEXT NOT NULL, description TEXT)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO media_items (title, path) VALUES "
+                "('first', '/a.mp4'), ('copy', '/a.mp4'), ('other', '/b.mp4')"
+            )
+        )
+
+    assert migrations.migrate(engine) == [m.version for m in migrations.MIGRATIONS]
+
+    inspector = inspect(engine)
+    assert "role" in {c["name"] for c in inspector.get_columns("users")}
+    assert "tvg_id" in {c["name"] for c in inspector.get_columns("media_items")}
+    indexes = {i["name"]: i for i in inspector.get_indexes("media_items")}
+    assert indexes["ux_media_items_path"]["unique"]
+    assert "ix_media_items_title" in indexes
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, title FROM media_items")).all()
+        assert rows == [(1, "first"), (3, "other")]
+        hits = conn.execute(
+            text("SELECT rowid FROM media_items_fts WHERE media_items_fts MATCH 'oth*'")
+        ).all()
+        assert hits == [(3,)]
+    engine.dispose()
+
+
+def test_baseline_is_frozen_and_later_migrations_reach_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.begin() as conn:
+        migrations.MIGRATIONS[0].apply(conn)
+    assert set(inspect(engine).get_table_names()) == set(migrations.BASELINE.tables)
+
+    migrations.migrate(engine)
+
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert set(table.columns.keys()) <= columns, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+    engine.dispose()
+
+
+def test_startup_refuses_pending_migrations(temp_db, monkeypatch):
+    monkeypatch.setattr(
+        migrations, "pending_migrations", lambda: migrations.MIGRATIONS[-1:]
+    )
+    with pytest.raises(RuntimeError, match="1 migration"):
+        with TestClient(create_app()):
+            pass
+
+    monkeypatch.setitem(temp_db.STORAGE_CONFIG, "allow_pending_migrations", True)
+    with TestClient(create_app()) as client:
+        assert client.get("/auth/jwks").status_code == 200
+
+
+def test_pending_revocation_table_still_serves_authenticated_requests(
+    temp_db, monkeypatch
+):
+    from server.auth import create_token
+    from server.revocation import REVOCATIONS
+
+    with temp_db.engine.begin() as conn:
+        conn.execute(text("DROP TABLE revoked_tokens"))
+        conn.execute(text("DELETE FROM schema_version WHERE version >= 5"))
+    REVOCATIONS.reset()
+    monkeypatch.setitem(temp_db.STORAGE_CONFIG, "allow_pending_migrations", True)
+    headers = {"Authorization": f"Bearer {create_token('amy', 'user')}"}
+
+    with TestClient(create_app()) as client:
+        assert client.get("/stream/ping", headers=headers).status_code == 200
+        assert REVOCATIONS.stats()["keys"] == 0
+
+        assert migrations.migrate(temp_db.engine)[:2] == [5, 6]
+        temp_db.add_revocation("sub:amy", datetime.datetime(2100, 1, 1))
+        assert REVOCATIONS.refresh() == 1
+        assert client.get("/stream/ping", headers=headers).status_code == 401
@@ -0,0 +1,277 @@
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from server import db, playlists
+from server.app import create_app
+from server.auth import create_token
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="bbc1.uk" tvg-logo="http://logo.test/bbc1.png" \
+group-title="UK, News",BBC One
+http://iptv.test/bbc1.ts
+
+#EXTINF:-1 tvg-name="Arte",
+#EXTGRP:Culture
+http://iptv.test/arte.ts
+#EXTINF:-1,Orphan header without URL
+"""
+
+
+def _mock_client(body: str, requests: list[str]) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        return httpx.Response(200, text=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_parse_extinf_keeps_commas_inside_attributes():
+    attributes, title = playlists.parse_extinf(
+        '#EXTINF:-1 tvg-id="a" group-title="UK, News",Channel, HD'
+    )
+    assert attributes == {"tvg-id": "a", "group-title": "UK, News"}
+    assert title == "Channel, HD"
+
+
+def test_iter_playlist_entries_parses_attributes():
+    entries = list(playlists.iter_playlist_entries(PLAYLIST.splitlines()))
+
+    assert entries == [
+        playlists.PlaylistEntry(
+            title="BBC One",
+            path="http://iptv.test/bbc1.ts",
+            tvg_id="bbc1.uk",
+            group_title="UK, News",
+            logo="http://logo.test/bbc1.png",
+        ),
+        playlists.PlaylistEntry(
+            title="Arte", path="http://iptv.test/arte.ts", group_title="Culture"
+        ),
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_refresh_playlist_writes_in_streamed_batches(temp_db, monkeypatch):
+    calls = []
+    original = db.apply_media_diff
+
+    def tracking_apply(inserts, updates, deletes):
+        calls.append((len(inserts), len(updates), len(deletes)))
+        return original(inserts, updates, deletes)
+
+    monkeypatch.setattr(db, "apply_media_diff", tracking_apply)
+    url = "http://provider.test/list.m3u"
+    requests: list[str] = []
+
+    async with _mock_client(PLAYLIST, requests) as client:
+        first = await playlists.refresh_playlist(url, client, batch_size=1)
+        second = await playlists.refresh_playlist(url, client, batch_size=1)
+
+    assert requests == [url, url]
+    assert calls == [(1, 0, 0), (1, 0, 0)]
+    assert first == {"status": "refreshed", "inserted": 2, "updated": 0, "deleted": 0}
+    assert second == {"status": "refreshed", "inserted": 0, "updated": 0, "deleted": 0}
+    items = sorted(db.list_media_items(), key=lambda item: item.title)
+    assert [item.title for item in items] == ["Arte", "BBC One"]
+    assert items[1].tvg_id == "bbc1.uk"
+    assert items[1].source == url
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_refresh_playlist_counts_only_rows_written(temp_db):
+    db.upsert_media_items(
+        [
+            {
+                "title": "Shared",
+                "path": "http://iptv.test/arte.ts",
+                "source": "http://other.test/list.m3u",
+            }
+        ]
+    )
+    url = "http://provider.test/list.m3u"
+
+    async with _mock_client(PLAYLIST, []) as client:
+        result = await playlists.refresh_playlist(url, client)
+
+    assert result == {"status": "refreshed", "inserted": 1, "updated": 0, "deleted": 0}
+    titles = {item.title: item.source for item in db.list_media_items()}
+    assert titles == {"Shared": "http://other.test/list.m3u", "BBC One": url}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_refresh_playlist_parses_off_the_event_loop(temp_db, monkeypatch):
+    threads = []
+    original = playlists.iter_playlist_entries
+
+    def tracking_parse(lines):
+        threads.append(threading.current_thread())
+        return original(lines)
+
+    monkeypatch.setattr(playlists, "iter_playlist_entries", tracking_parse)
+    url = "http://provider.test/list.m3u"
+
+    async with _mock_client(PLAYLIST, []) as client:
+        result = await playlists.refresh_playlist(url, client)
+
+    assert result["inserted"] == 2
+    assert threads and threading.main_thread() not in threads
+
+
+def test_ingest_playlists_endpoint_reports_per_url(temp_db, monkeypatch):
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        if "broken" in str(request.url):
+            return httpx.Response(404)
+        return httpx.Response(200, text=PLAYLIST)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        playlists.httpx,
+        "AsyncClient",
+        lambda **kwargs: real_client(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(
+        playlists,
+        "PLAYLIST_URLS",
+        ["http://provider.test/good.m3u", "http://provider.test/broken.m3u"],
+    )
+    client = TestClient(create_app())
+    headers = {"Authorization": f"Bearer {create_token('admin', 'admin')}"}
+
+    response = client.post("/ingestion/playlists", headers=headers)
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["http://provider.test/good.m3u"] == {
+        "status": "refreshed",
+        "inserted": 2,
+        "updated": 0,
+        "deleted": 0,
+    }
+    assert "error" in payload["http://provider.test/broken.m3u"]
+    assert len(db.list_media_items()) == 2
+
+
+def test_diff_channels_keys_on_tvg_id_and_reports_changes():
+    current = [
+        {
+            "id": 1,
+            "title": "One",
+            "path": "http://a/1?token=old",
+            "tvg_id": "one",
+            "group_title": None,
+            "logo": None,
+        },
+        {
+            "id": 2,
+            "title": "Two",
+            "path": "http://a/2",
+            "tvg_id": None,
+            "group_title": None,
+            "logo": None,
+        },
+        {
+            "id": 3,
+            "title": "Gone",
+            "path": "http://a/3",
+            "tvg_id": "gone",
+            "group_title": None,
+            "logo": None,
+        },
+    ]
+    incoming = [
+        {
+            "title": "One",
+            "path": "http://a/1?token=new",
+            "tvg_id": "one",
+            "group_title": None,
+            "logo": None,
+        },
+        {
+            "title": "Two",
+            "path": "http://a/2",
+            "tvg_id": None,
+            "group_title": None,
+            "logo": None,
+        },
+        {
+            "title": "New",
+            "path": "http://a/4",
+            "tvg_id": "new",
+            "group_title": None,
+            "logo": None,
+        },
+    ]
+
+    existing = playlists._keyed(current)
+    keyed = playlists._keyed(incoming)
+    inserts, updates = playlists.diff_channels(existing, keyed.items())
+
+    assert [row["title"] for row in inserts] == ["New"]
+    assert updates == [{**incoming[0], "id": 1}]
+    assert [row["id"] for key, row in existing.items() if key not in keyed] == [3]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_refresh_playlist_skips_unchanged_and_applies_diff(temp_db):
+    url = "http://provider.test/list.m3u"
+    bodies = [PLAYLIST, None, PLAYLIST.replace("BBC One", "BBC One HD")]
+    seen_headers: list[dict[str, str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_headers.append(dict(request.headers))
+        body = bodies.pop(0)
+        if body is None:
+            return httpx.Response(304)
+        return httpx.Response(200, text=body, headers={"ETag": '"v1"'})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await playlists.refresh_playlist(url, client)
+        arte_id = {item.title: item.id for item in db.list_media_items()}["Arte"]
+        second = await playlists.refresh_playlist(url, client)
+        third = await playlists.refresh_playlist(url, client)
+
+    assert first == {"status": "refreshed", "inserted": 2, "updated": 0, "deleted": 0}
+    assert second == {"status": "unchanged"}
+    assert third == {"status": "refreshed", "inserted": 0, "updated": 1, "deleted": 0}
+    assert "if-none-match" not in seen_headers[0]
+    assert seen_headers[1]["if-none-match"] == '"v1"'
+    titles = {item.title: item.id for item in db.list_media_items()}
+    assert set(titles) == {"BBC One HD", "Arte"}
+    assert titles["Arte"] == arte_id
+    assert db.get_playlist_source(url).etag == '"v1"'
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_ingest_playlists_reports_database_errors(temp_db, monkeypatch):
+    def locked(*args):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        playlists.httpx,
+        "AsyncClient",
+        lambda **kwargs: real_client(
+            transport=httpx.MockTransport(lambda _: httpx.Response(200, text=PLAYLIST))
+        ),
+    )
+    monkeypatch.setattr(db, "apply_media_diff", locked)
+
+    results = await playlists.ingest_configured_playlists(
+        ["http://provider.test/a.m3u", "http://provider.test/b.m3u"]
+    )
+
+    assert set(results) == {"http://provider.test/a.m3u", "http://provider.test/b.m3u"}
+    assert all("database is locked" in result["error"] for result in results.values())
+    assert db.get_playlist_source("http://provider.test/a.m3u") is None
@@ -0,0 +1,192 @@
+import anyio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from server import db, probe
+from server.app import create_app
+from server.auth import create_token
+
+
+async def _body():
+    yield b"x" * 2048
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    host = request.url.host
+    if host == "down.test":
+        raise httpx.ConnectError("refused", request=request)
+    if host == "broken.test":
+        raise ValueError("cannot route")
+    if host == "gone.test":
+        return httpx.Response(404)
+    if host == "nohead.test" and request.method == "HEAD":
+        return httpx.Response(405)
+    return httpx.Response(200, content=_body())
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_probe_url_classifies_responses():
+    async with _client() as client:
+        ok = await probe.probe_url(client, "http://live.test/a.ts")
+        fallback = await probe.probe_url(client, "http://nohead.test/a.ts")
+        gone = await probe.probe_url(client, "http://gone.test/a.ts")
+        down = await probe.probe_url(client, "http://down.test/a.ts")
+
+    assert (ok["status"], ok["http_status"]) == ("ok", 200)
+    assert (fallback["status"], fallback["http_status"]) == ("ok", 200)
+    assert (gone["status"], gone["http_status"]) == ("error", 404)
+    assert (down["status"], down["http_status"]) == ("unreachable", None)
+    assert ok["latency_ms"] >= 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_sweep_records_results_for_remote_items(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(probe, "PAGE_SIZE", 2)
+    monkeypatch.setattr(probe, "FLUSH_SIZE", 1)
+    live = db.create_media_item("live", "http://live.test/a.ts")
+    gone = db.create_media_item("gone", "http://gone.test/a.ts")
+    down = db.create_media_item("down", "https://down.test/a.ts")
+    local = tmp_path / "local.mp4"
+    local.write_bytes(b"x")
+    db.create_media_item("local", str(local))
+
+    async with _client() as client:
+        counts = await probe.sweep(client, concurrency=2)
+
+    assert counts == {"ok": 1, "error": 1, "unreachable": 1}
+    results = {row["media_item_id"]: row for row in db.list_channel_health()}
+    assert set(results) == {live.id, gone.id, down.id}
+    assert results[gone.id]["http_status"] == 404
+    assert [row["title"] for row in db.list_channel_health("ok")] == ["live"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_probe_url_reports_unexpected_errors():
+    async with _client() as client:
+        broken = await probe.probe_url(client, "http://broken.test/a.ts")
+        malformed = await probe.probe_url(client, "http://[::1/a.ts")
+
+    assert (broken["status"], broken["http_status"]) == ("error", None)
+    assert malformed["status"] == "error"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_sweep_survives_unprobeable_urls(temp_db, monkeypatch):
+    monkeypatch.setattr(probe, "PAGE_SIZE", 1)
+    for index in range(4):
+        db.create_media_item(f"broken {index}", f"http://broken.test/{index}.ts")
+
+    async with _client() as client:
+        with anyio.fail_after(5):
+            counts = await probe.sweep(client, concurrency=1)
+
+    assert counts == {"error": 4}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_finished_sweep_drops_stale_failure_detail(monkeypatch):
+    async def fake_sweep():
+        return {"ok": 1}
+
+    monkeypatch.setattr(probe, "sweep", fake_sweep)
+    monkeypatch.setitem(probe.last_sweep, "detail", "database is locked")
+    await probe._run_sweep()
+    assert probe.last_sweep["state"] == "finished"
+    assert "detail" not in probe.last_sweep
+
+
+def test_media_listing_can_hide_dead_items(temp_db):
+    live = db.create_media_item("live", "http://live.test/a.ts")
+    dead = db.create_media_item("dead", "http://gone.test/a.ts")
+    db.create_media_item("unprobed", "http://new.test/a.ts")
+    now = probe.datetime.datetime(2024, 1, 1)
+    db.save_channel_health(
+        [
+            {
+                "media_item_id": live.id,
+                "status": "ok",
+                "http_status": 200,
+                "latency_ms": 5,
+                "checked_at": now,
+            },
+            {
+                "media_item_id": dead.id,
+                "status": "error",
+                "http_status": 404,
+                "latency_ms": 5,
+                "checked_at": now,
+            },
+        ]
+    )
+    client = TestClient(create_app())
+    user = {"Authorization": f"Bearer {create_token('bob', 'user')}"}
+    admin = {"Authorization": f"Bearer {create_token('root', 'admin')}"}
+
+    everything = client.get("/media/", headers=user).json()
+    alive = client.get("/media/", params={"hide_dead": True}, headers=user).json()
+    assert len(everything) == 3
+    assert sorted(item["title"] for item in alive) == ["live", "unprobed"]
+
+    assert client.get("/health/channels", headers=user).status_code == 403
+    report = client.get(
+        "/health/channels", params={"status": "error"}, headers=admin
+    ).json()
+    assert [row["title"] for row in report["channels"]] == ["dead"]
+
+
+@pytest.mark.parametrize("remove", ["delete_media_item", "apply_media_diff"])
+def test_deleted_items_take_their_health_with_them(temp_db, remove):
+    dead = db.create_media_item("dead", "http://gone.test/a.ts")
+    db.save_channel_health(
+        [
+            {
+                "media_item_id": dead.id,
+                "status": "error",
+                "http_status": 404,
+                "latency_ms": 5,
+                "checked_at": probe.datetime.datetime(2024, 1, 1),
+            }
+        ]
+    )
+    if remove == "delete_media_item":
+        db.delete_media_item(dead.id)
+    else:
+        db.apply_media_diff([], [], [dead.id])
+
+    fresh = db.create_media_item("fresh", "http://new.test/a.ts")
+
+    assert db.list_channel_health() == []
+    assert [item.id for item in db.list_media_items(hide_dead=True)] == [fresh.id]
+
+
+def test_migration_removes_orphaned_health(temp_db):
+    from sqlalchemy import text
+
+    from server import migrations
+
+    item = db.create_media_item("kept", "http://live.test/a.ts")
+    rows = [
+        {
+            "media_item_id": media_item_id,
+            "status": "error",
+            "http_status": 404,
+            "latency_ms": 5,
+            "checked_at": probe.datetime.datetime(2024, 1, 1),
+        }
+        for media_item_id in (item.id, item.id + 100)
+    ]
+    db.save_channel_health(rows)
+    with temp_db.engine.begin() as conn:
+        migrations._orphaned_health(conn)
+        remaining = conn.execute(text("SELECT media_item_id FROM channel_health"))
+        assert [row[0] for row in remaining] == [item.id]
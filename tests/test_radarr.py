@@ -1,7 +1,7 @@
 import httpx
 import pytest
 
-from server.integrations import radarr
+from server.integrations import clients, radarr
 
 
 def test_headers_include_api_key(monkeypatch):
@@ -147,7 +147,8 @@ async def test_async_refresh_movies_uses_async_client(monkeypatch):
     assert call_log["url"] == "http://radarr.test/api/v3/command"
     assert call_log["json"] == {"name": "RefreshMovie"}
     assert call_log["headers"] == {"X-Api-Key": "async-key"}
-    assert call_log["timeout"] == 10
+    assert call_log["timeout"] is None
+    assert call_log["client_kwargs"]["timeout"] is clients.TIMEOUT
     assert call_log["entered"] is True
     assert call_log["exited"] is True
     assert call_log["raised"] is True
@@ -160,6 +161,9 @@ async def test_async_refresh_movies_propagates_request_error(monkeypatch):
     monkeypatch.setattr(radarr, "RADARR_API_KEY", "")
 
     class DummyAsyncClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
         async def __aenter__(self):
             return self
 
@@ -170,7 +174,7 @@ async def test_async_refresh_movies_propagates_request_error(monkeypatch):
             assert url == "http://radarr.test/api/v3/command"
             assert json == {"name": "RefreshMovie"}
             assert headers == {}
-            assert timeout == 10
+            assert timeout is None
             raise httpx.RequestError("boom", request=httpx.Request("POST", url))
 
     monkeypatch.setattr(radarr.httpx, "AsyncClient", DummyAsyncClient)
@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+
+from server import relay
+
+
+class FakeUpstream:
+    """Stand-in for ``httpx.AsyncClient`` that streams queued chunks."""
+
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+        self.opened = 0
+        self.closed = 0
+        self.chunks: asyncio.Queue[bytes | None] = asyncio.Queue()
+
+    def stream(self, method, url):
+        upstream = self
+
+        class _Context:
+            async def __aenter__(self):
+                upstream.opened += 1
+                request = httpx.Request(method, url)
+                response = httpx.Response(
+                    upstream.status_code,
+                    headers={"content-type": "video/mp2t"},
+                    request=request,
+                )
+
+                async def aiter_bytes():
+                    while True:
+                        chunk = await upstream.chunks.get()
+                        if chunk is None:
+                            return
+                        yield chunk
+
+                response.aiter_bytes = aiter_bytes
+                return response
+
+            async def __aexit__(self, exc_type, exc, tb):
+                upstream.closed += 1
+                return False
+
+        return _Context()
+
+    async def aclose(self):
+        pass
+
+
+def _hub(upstream: FakeUpstream, queue_size: int = 8) -> relay.RelayHub:
+    hub = relay.RelayHub(queue_size=queue_size)
+    hub._client = upstream
+    return hub
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_viewers_share_one_upstream_connection():
+    upstream = FakeUpstream()
+    hub = _hub(upstream)
+    url = "http://iptv.test/channel/1"
+
+    first_relay, first = await hub.open(url)
+    second_relay, second = await hub.open(url)
+
+    assert first_relay is second_relay
+    assert first_relay.media_type == "video/mp2t"
+    assert upstream.opened == 1
+    assert hub.stats() == {url: 2}
+
+    await upstream.chunks.put(b"packet")
+    assert await first.queue.get() == b"packet"
+    assert await second.queue.get() == b"packet"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_upstream_closes_when_last_viewer_leaves():
+    upstream = FakeUpstream()
+    hub = _hub(upstream)
+    url = "http://iptv.test/channel/2"
+
+    channel, subscriber = await hub.open(url)
+    chunks = hub.iter_chunks(channel, subscriber)
+    await upstream.chunks.put(b"a")
+    assert await chunks.__anext__() == b"a"
+    await chunks.aclose()
+    await asyncio.sleep(0)
+
+    assert hub.stats() == {}
+    assert upstream.closed == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_slow_viewer_is_dropped_without_stalling_others():
+    upstream = FakeUpstream()
+    hub = _hub(upstream, queue_size=2)
+    url = "http://iptv.test/channel/3"
+
+    channel, slow = await hub.open(url)
+    _, fast = await hub.open(url)
+    received = []
+
+    async def drain():
+        async for chunk in hub.iter_chunks(channel, fast):
+            received.append(chunk)
+
+    reader = asyncio.create_task(drain())
+    for index in range(5):
+        await upstream.chunks.put(bytes([index]))
+        await asyncio.sleep(0.01)
+
+    assert slow.dropped
+    assert slow not in channel.subscribers
+    assert received == [bytes([index]) for index in range(5)]
+    reader.cancel()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_upstream_failure_raises_relay_unavailable():
+    upstream = FakeUpstream(status_code=503)
+    hub = _hub(upstream)
+
+    with pytest.raises(relay.RelayUnavailable):
+        await hub.open("http://iptv.test/down")
+
+    assert hub.stats() == {}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_relay_is_released_when_last_viewer_is_dropped():
+    upstream = FakeUpstream()
+    hub = _hub(upstream, queue_size=1)
+    url = "http://iptv.test/channel/4"
+
+    channel, slow = await hub.open(url)
+    await upstream.chunks.put(b"a")
+    await upstream.chunks.put(b"b")
+    await asyncio.sleep(0.01)
+
+    assert slow.dropped
+    assert hub.stats() == {}
+    assert channel._task.done()
+
+    fresh, viewer = await hub.open(url)
+    assert fresh is not channel
+    assert upstream.opened == 2
+    await upstream.chunks.put(b"c")
+    assert await asyncio.wait_for(viewer.queue.get(), 1) == b"c"
+
+
+def test_media_type_is_guessed_without_a_live_relay():
+    hub = relay.RelayHub()
+    assert hub.media_type("http://iptv.test/live.ts?token=1") == "video/mp2t"
+    assert hub.media_type("http://iptv.test/live") == "application/octet-stream"
+
+
+def test_is_playlist_checks_suffix_and_content_type():
+    assert relay.is_playlist("http://iptv.test/live/index.M3U8?token=1")
+    assert relay.is_playlist("http://iptv.test/list.m3u")
+    assert not relay.is_playlist("http://iptv.test/live.ts")
+    assert not relay.is_playlist("http://iptv.m3u8.test/live")
+    assert relay.is_playlist("http://iptv.test/live", "application/x-mpegURL")
+    assert not relay.is_playlist("http://iptv.test/live.m3u8", "video/mp2t")
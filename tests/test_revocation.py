@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server import auth, db, revocation
+from server.app import create_app
+from server.revocation import REVOCATIONS, BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"jti:{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_live_tokens_are_checked_without_database_lookups(temp_db, monkeypatch):
+    token = auth.create_token("amy", "user")
+    REVOCATIONS.refresh()
+
+    def _no_lookup(*args):  # pragma: no cover - must not be called
+        raise AssertionError("revocation confirmed in the database")
+
+    monkeypatch.setattr(db, "is_token_revoked", _no_lookup)
+    for _ in range(3):
+        assert auth.verify_token(token).username == "amy"
+    assert REVOCATIONS.stats()["filter_hits"] == 0
+
+
+def test_deleting_a_user_revokes_their_tokens(temp_db):
+    db.add_user("root", "pw", role="admin")
+    db.add_user("amy", "pw")
+    client = TestClient(create_app())
+    admin = {"Authorization": f"Bearer {auth.create_token('root', 'admin')}"}
+    amy = {"Authorization": f"Bearer {auth.create_token('amy', 'user')}"}
+    assert client.get("/stream/ping", headers=amy).status_code == 200
+
+    assert client.delete("/users/amy", headers=admin).status_code == 200
+    rejected = client.get("/stream/ping", headers=amy)
+    assert rejected.status_code == 401
+    assert rejected.json()["detail"] == "Token revoked"
+    assert client.get("/stream/ping", headers=admin).status_code == 200
+
+
+def test_logout_revokes_the_access_token(temp_db):
+    db.add_user("amy", "pw")
+    client = TestClient(create_app())
+    tokens = client.post(
+        "/auth/login", json={"username": "amy", "password": "pw"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/stream/ping", headers=headers).status_code == 200
+    client.post(
+        "/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers=headers,
+    )
+    assert client.get("/stream/ping", headers=headers).status_code == 401
+
+
+def test_refresh_picks_up_revocations_from_other_workers(temp_db):
+    token = auth.create_token("amy", "user")
+    assert auth.verify_token(token).username == "amy"
+    jti = auth.jwt.decode(token, options={"verify_signature": False})["jti"]
+    expires = datetime.datetime.now(datetime.UTC) + datetime.timedelta(hours=1)
+    db.add_revocation(f"jti:{jti}", expires.replace(tzinfo=None))
+    assert REVOCATIONS.refresh() == 1
+    assert REVOCATIONS.refresh() == 0
+    assert REVOCATIONS.is_revoked(jti, "amy", None)
+    assert not REVOCATIONS.is_revoked("other", "bob", None)
+
+
+def test_refresh_catches_late_commits_and_reused_ids(temp_db):
+    from server.models import RevokedToken
+
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    expires = now + datetime.timedelta(hours=1)
+    first = db.add_revocation("jti:first", expires)
+    assert REVOCATIONS.refresh() == 1
+
+    session = db.get_session()
+    session.query(RevokedToken).filter_by(id=first).delete()
+    session.commit()
+    session.close()
+    # On SQLite the next revocation reuses the purged row's id.
+    db.add_revocation("jti:reused", expires)
+    session = db.get_session()
+    # Committed after the refresh but stamped earlier, as from a slow
+    # transaction or a node whose clock lags.
+    session.add(
+        RevokedToken(
+            key="jti:late",
+            revoked_at=now - datetime.timedelta(seconds=30),
+            expires_at=expires,
+        )
+    )
+    session.commit()
+    session.close()
+
+    assert REVOCATIONS.refresh() == 2
+    assert REVOCATIONS.is_revoked("late", "amy", None)
+    assert REVOCATIONS.is_revoked("reused", "amy", None)
+    assert REVOCATIONS.refresh() == 0
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_refresher_survives_a_failed_first_rebuild(monkeypatch):
+    calls = []
+
+    def flaky_rebuild():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(revocation, "REFRESH_INTERVAL", 0.01)
+    monkeypatch.setattr(REVOCATIONS, "rebuild", flaky_rebuild)
+    monkeypatch.setattr(REVOCATIONS, "refresh", lambda: 0)
+    revocation.start_refresher()
+    try:
+        for _ in range(100):
+            if len(calls) >= 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await revocation.stop_refresher()
+    assert len(calls) == 2
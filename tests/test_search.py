@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from server import db
+from server.app import create_app
+from server.auth import create_token
+
+
+def _headers(role: str = "user") -> dict[str, str]:
+    return {"Authorization": f"Bearer {create_token('alice', role)}"}
+
+
+def test_search_ranks_title_matches_and_supports_prefixes(temp_db):
+    db.insert_media_items(
+        [
+            {"title": "Nature Walk", "path": "a", "description": "BBC documentary"},
+            {"title": "BBC One HD", "path": "b"},
+            {"title": "Weather", "path": "c"},
+        ]
+    )
+    client = TestClient(create_app())
+    response = client.get("/media/search", params={"q": "bb"}, headers=_headers())
+    assert response.status_code == 200
+    assert [row["title"] for row in response.json()] == ["BBC One HD", "Nature Walk"]
+
+    both = client.get("/media/search", params={"q": "bbc on"}, headers=_headers())
+    assert [row["title"] for row in both.json()] == ["BBC One HD"]
+
+
+def test_search_index_follows_updates_and_deletes(temp_db):
+    item = db.create_media_item("Old Name", "a")
+    db.update_media_item(item.id, title="Fresh Name")
+    assert db.search_media_items("old") == []
+    assert [row["id"] for row in db.search_media_items("fresh")] == [item.id]
+    db.delete_media_item(item.id)
+    assert db.search_media_items("fresh") == []
+
+
+def test_search_treats_operators_as_text(temp_db, sqlite_only):
+    db.create_media_item("Sport AND News", "a")
+    assert db.build_search_query('news" OR -x') == '"news"* "OR"* "x"*'
+    assert len(db.search_media_items("sport AND (news")) == 1
+    with pytest.raises(ValueError):
+        db.search_media_items("!!")
+
+
+def test_search_rejects_query_without_words(temp_db):
+    client = TestClient(create_app())
+    response = client.get("/media/search", params={"q": "--"}, headers=_headers())
+    assert response.status_code == 422
+
+
+def test_rebuild_indexes_rows_written_behind_the_triggers(temp_db, sqlite_only):
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DROP TRIGGER media_items_fts_insert")
+        conn.exec_driver_sql(
+            "INSERT INTO media_items (title, path) VALUES ('Hidden Gem', 'x')"
+        )
+    assert db.search_media_items("gem") == []
+    db.rebuild_media_search()
+    assert [row["title"] for row in db.search_media_items("gem")] == ["Hidden Gem"]
+
+
+def test_rebuild_endpoint_requires_admin(temp_db):
+    client = TestClient(create_app())
+    denied = client.post("/media/search/rebuild", headers=_headers())
+    assert denied.status_code == 403
+    accepted = client.post("/media/search/rebuild", headers=_headers("admin"))
+    assert accepted.status_code == 202
+    assert accepted.json()["status"] in {"started", "running"}
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from server import streaming
+
+
+def test_parse_range_header_merges_overlapping_ranges():
+    ranges = streaming.parse_range_header("bytes=5-9, 0-3, 2-6", 100)
+    assert ranges == [(0, 10)]
+
+
+def test_parse_range_header_handles_open_and_suffix_ranges():
+    assert streaming.parse_range_header("bytes=90-", 100) == [(90, 100)]
+    assert streaming.parse_range_header("bytes=-500", 100) == [(0, 100)]
+    assert streaming.parse_range_header("bytes=10-2000", 100) == [(10, 100)]
+
+
+def test_parse_range_header_ignores_invalid_syntax():
+    assert streaming.parse_range_header("items=0-1", 100) == []
+    assert streaming.parse_range_header("bytes=abc", 100) == []
+    assert streaming.parse_range_header("bytes=5-1", 100) == []
+    too_many = ",".join(f"{i}-{i}" for i in range(streaming.MAX_RANGES + 1))
+    assert streaming.parse_range_header(f"bytes={too_many}", 100) == []
+
+
+def test_parse_range_header_raises_when_unsatisfiable():
+    with pytest.raises(streaming.RangeNotSatisfiable):
+        streaming.parse_range_header("bytes=100-", 100)
+
+
+def test_guess_media_type_covers_media_containers():
+    assert streaming.guess_media_type("show.MKV") == "video/x-matroska"
+    assert streaming.guess_media_type("live.m3u8") == "application/vnd.apple.mpegurl"
+    assert streaming.guess_media_type("unknown.blob") == "application/octet-stream"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_range_response_uses_zerocopy_extension(tmp_path):
+    media_file = tmp_path / "movie.mp4"
+    media_file.write_bytes(b"0123456789")
+    response = streaming.RangeFileResponse(media_file, media_file.stat())
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"range", b"bytes=3-")],
+        "extensions": {streaming.ZEROCOPY_EXTENSION: {}},
+    }
+    messages = []
+
+    async def receive():  # pragma: no cover - never awaited
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, receive, send)
+
+    assert messages[0]["status"] == 206
+    zerocopy = [m for m in messages if m["type"] == streaming.ZEROCOPY_EXTENSION]
+    assert len(zerocopy) == 1
+    assert zerocopy[0]["offset"] == 3
+    assert zerocopy[0]["count"] == 7
+    assert messages[-1] == {
+        "type": "http.response.body",
+        "body": b"",
+        "more_body": False,
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"], indirect=True)
+async def test_range_response_opens_files_off_the_event_loop(tmp_path, monkeypatch):
+    media_file = tmp_path / "movie.mp4"
+    media_file.write_bytes(b"0123456789")
+    opened = []
+
+    def tracking_open(*args):
+        file = open(*args)
+        opened.append((threading.current_thread(), file))
+        return file
+
+    monkeypatch.setattr(streaming, "open", tracking_open, raising=False)
+    response = streaming.RangeFileResponse(media_file, media_file.stat())
+    scope = {"type": "http", "method": "GET", "headers": [(b"range", b"bytes=3-")]}
+    messages = []
+
+    async def receive():  # pragma: no cover - never awaited
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await response(scope, receive, send)
+
+    assert b"".join(m.get("body", b"") for m in messages[1:]) == b"3456789"
+    ((thread, file),) = opened
+    assert thread is not threading.main_thread()
+    assert file.closed